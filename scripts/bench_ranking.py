@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Benchmark: per-candidate ranking.score() loop vs. the batch ranking API.
+
+Builds a synthetic candidate pool the shape /api/go sees (a single origin's
+reachable catalog, ~100 destinations) and times, for the same queries: the
+score() loop (what rank() runs), the batch path with columns built per query,
+and rank_columns() over columns built once (how a cached candidate pool is
+scored). Checks that all three agree exactly on every query before timing, so
+a speedup can never come from a scoring drift.
+
+Usage:
+    python -m scripts.bench_ranking [--candidates N] [--queries N] [--seed N]
+"""
+import argparse
+import random
+import time
+
+from server import ranking
+
+VIBES = ["beach", "city", "food", "history", "nature", "nightlife", "off-grid"]
+
+
+def _pool(rng, n):
+    return [
+        ranking.Candidate(
+            iata=f"D{i:03d}",
+            price_usd=rng.randint(80, 1200),
+            vibes=rng.sample(VIBES, rng.randint(1, 4)),
+            novelty_score=rng.randint(1, 5),
+            cheapest_date_in_best_months=rng.random() < 0.5,
+        )
+        for i in range(n)
+    ]
+
+
+def _queries(rng, n):
+    return [
+        ranking.UserQuery(origin_iata="BNA", budget_usd=rng.choice([300, 500, 750, 1000]),
+                          trip_nights=7, vibes=rng.sample(VIBES, rng.randint(0, 2)))
+        for _ in range(n)
+    ]
+
+
+def columns_per_query(cands, query, session, k):
+    """The batch path for a one-off list: build columns, then rank them."""
+    return ranking.rank_columns(ranking.CandidateColumns.from_candidates(cands),
+                                query, session, k, require_vibe_overlap=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--candidates", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cands = _pool(rng, args.candidates)
+    queries = _queries(rng, args.queries)
+    session = ranking.SessionState(
+        seen_count={c.iata: rng.randint(1, 3) for c in rng.sample(cands, len(cands) // 5)})
+
+    cols = ranking.CandidateColumns.from_candidates(cands)
+    for q in queries:
+        expected = ranking.rank(cands, q, session, 8, require_vibe_overlap=True)
+        if (columns_per_query(cands, q, session, 8) != expected
+                or ranking.rank_columns(cols, q, session, 8,
+                                        require_vibe_overlap=True) != expected):
+            print(f"MISMATCH for {q}")
+            return 1
+
+    t0 = time.perf_counter()
+    for q in queries:
+        ranking.rank(cands, q, session, 8, require_vibe_overlap=True)
+    loop_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for q in queries:
+        columns_per_query(cands, q, session, 8)
+    batch_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for q in queries:
+        ranking.rank_columns(cols, q, session, 8, require_vibe_overlap=True)
+    cols_s = time.perf_counter() - t0
+
+    n = len(queries)
+    print(f"{args.candidates} candidates x {n} queries (results identical)")
+    print(f"  rank() loop  : {loop_s * 1e6 / n:8.1f} us/query")
+    print(f"  cols/query   : {batch_s * 1e6 / n:8.1f} us/query (columns built per query)")
+    print(f"  rank_columns : {cols_s * 1e6 / n:8.1f} us/query (columns prebuilt)")
+    print(f"  speedup      : {loop_s / batch_s:8.2f}x / {loop_s / cols_s:.2f}x prebuilt")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Benchmark: scan strategies end to end against the local fli stand-in.
+
+Seeds a throwaway DB with a synthetic route grid, then runs each strategy
+against a fresh scripts/fli_standin.StandInFli (same seed, so the same fares,
+latencies and faults) on compressed time, and reports per strategy:
+
+- requests and throughput (requests/s, simulated seconds);
+- time until every origin has at least one fare (what /go needs first);
+- time to full coverage: until every route x nights the strategy set out to
+  scan has a non-empty answer ("-" when it never gets there: a budget that
+  skips routes, a night aborted on a 429, or a route lost to a soft-block);
+- 429s and soft-blocked (empty) answers the stand-in served.
+
+Strategies: serial (refresh_all, 1 worker), concurrent (refresh_all,
+SCAN_WORKERS), scheduled (concurrent + a scan_scheduler budget of
+--budget-fraction of the routes), async (AsyncFliClient.search_many; fetch
+only, nothing is written) and watches (watch_runner.run, one watch per route
+at 7 nights, paced by the same kind of bucket).
+
+Usage:
+    python -m scripts.bench_scan [--origins N] [--dests N] [--nights 5,7,10]
+        [--strategies serial,concurrent,...] [--scale 0.02] [--rate 0.5]
+        [--google-rps 1.0] [--latency 1.2] [--p429 0] [--p-soft 0] [--seed N]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
+
+from server import connections, price_refresh, watch_runner, watches
+from server.fli_client import AsyncFliClient
+from scripts.fli_standin import LatencyModel, ScaledClock, StandInFli
+from server.migrations import init_schema
+from server.scan_engine import TokenBucket
+
+STRATEGIES = ("serial", "concurrent", "scheduled", "async", "watches")
+
+# Real IATA codes: watches.create_watch validates them against fli's Airport.
+ORIGINS = "BNA ATL ORD DFW DEN LAX JFK SEA MIA BOS PHX MSP DTW CLT IAH SFO".split()
+DESTS = ("MEX LIS BOG LIM CUN SJO PTY SCL EZE GRU MAD BCN FCO CDG LHR DUB AMS ATH "
+         "IST KEF NRT ICN BKK SGN HAN MNL SYD AKL CPT NBO").split()
+
+
+def _seed_db(db_path: str, origins: list, dests: list) -> None:
+    init_schema(db_path)
+    conn = connections.connect(db_path)
+    try:
+        for i, o in enumerate(origins):
+            conn.execute("INSERT INTO airports VALUES (?,?,'TN','SE',36.1,-86.7,?)",
+                         (o, f"Origin {o}", i + 1))
+        for d in dests:
+            conn.execute("INSERT INTO destinations VALUES "
+                         "(?,?,'C','CC','LA','[]',1,0,'[]',60,2,'USD',0,0,NULL,3)",
+                         (d, f"City {d}"))
+        conn.executemany("INSERT INTO routes VALUES (?,?,NULL)",
+                         [(o, d) for d in dests for o in origins])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _refresh(workers, budget_fraction=None):
+    def run(db_path, fli, clock, tasks, args):
+        budget = int(len(tasks) * budget_fraction) if budget_fraction else None
+        price_refresh.refresh_all(db_path, fli, trip_lengths=args.nights,
+                                  sleep_seconds=1.0 / args.rate, workers=workers,
+                                  clock=clock, max_requests=budget, use_cache=False)
+        return tasks if budget is None else None
+    return run
+
+
+def _async(db_path, fli, clock, tasks, args):
+    today = date.today()
+    end = today + timedelta(days=price_refresh.WINDOW_DAYS)
+    limiter = TokenBucket(rate=args.rate, clock=clock,
+                          cooldown_s=price_refresh.RATE_LIMIT_BACKOFF_SECONDS)
+
+    async def _go():
+        async with AsyncFliClient(client=fli, concurrency=price_refresh.SCAN_WORKERS * 2,
+                                  limiter=limiter,
+                                  is_rate_limit=price_refresh._is_rate_limit_error) as client:
+            return await client.search_many((o, d, today, end, n) for o, d, n in tasks)
+
+    asyncio.run(_go())
+    return tasks
+
+
+def _watches(db_path, fli, clock, tasks, args):
+    today = date.today()
+    routes = sorted({(o, d) for o, d, _ in tasks})
+    conn = connections.connect(db_path)
+    try:
+        for i, (o, d) in enumerate(routes):
+            w = watches.create_watch(conn, f"bench{i}@example.com", o, d,
+                                     (today + timedelta(days=30)).isoformat(),
+                                     (today + timedelta(days=90)).isoformat(), 7,
+                                     today=today)
+            watches.confirm_watch(conn, w["manage_token"])
+        limiter = TokenBucket(rate=args.rate, clock=clock)
+        with mock.patch.object(watch_runner.email_client, "send_digest_email"):
+            watch_runner.run(conn, fli=fli, today=today, base_url="http://bench",
+                             limiter=limiter)
+    finally:
+        conn.close()
+    return [(o, d, 7) for o, d in routes]
+
+
+def _runners(budget_fraction: float) -> dict:
+    return {
+        "serial": _refresh(workers=1),
+        "concurrent": _refresh(workers=price_refresh.SCAN_WORKERS),
+        "scheduled": _refresh(workers=price_refresh.SCAN_WORKERS,
+                              budget_fraction=budget_fraction),
+        "async": _async,
+        "watches": _watches,
+    }
+
+
+def _report(name, fli, t0, t_end, planned, origins) -> dict:
+    first_ok = {}
+    for t, o, d, n, outcome in fli.calls:
+        if outcome == "ok":
+            first_ok.setdefault((o, d, n), t - t0)
+    origin_first = {}
+    for (o, _, _), t in first_ok.items():
+        origin_first[o] = min(t, origin_first.get(o, t))
+    full = None
+    if planned is not None and all(t in first_ok for t in planned):
+        full = max(first_ok[t] for t in planned)
+    elapsed = t_end - t0
+    st = fli.stats()
+    return {
+        "strategy": name,
+        "requests": st["requests"],
+        "sim_s": elapsed,
+        "req_per_s": st["requests"] / elapsed if elapsed else 0.0,
+        "origins_s": (max(origin_first.values())
+                      if len(origin_first) == len(origins) else None),
+        "full_s": full,
+        "routes_ok": len(first_ok),
+        "rate_limited": st["rate_limited"],
+        "soft_blocked": st["soft_blocked"],
+    }
+
+
+def _fmt(v) -> str:
+    return "-" if v is None else f"{v:,.0f}"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--origins", type=int, default=4, help=f"max {len(ORIGINS)}")
+    parser.add_argument("--dests", type=int, default=12, help=f"max {len(DESTS)}")
+    parser.add_argument("--nights", default="5,7,10")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES))
+    parser.add_argument("--budget-fraction", type=float, default=0.5)
+    parser.add_argument("--scale", type=float, default=0.02,
+                        help="wall seconds per simulated second")
+    parser.add_argument("--rate", type=float, default=1.0 / price_refresh.SLEEP_BETWEEN_CALLS,
+                        help="our aggregate pacing, requests/s")
+    parser.add_argument("--google-rps", type=float, default=1.0,
+                        help="sustained rate the stand-in tolerates before a 429")
+    parser.add_argument("--latency", type=float, default=1.2, help="median call seconds")
+    parser.add_argument("--p429", type=float, default=0.0)
+    parser.add_argument("--p-soft", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    args.nights = [int(n) for n in args.nights.split(",")]
+    logging.basicConfig(level=logging.WARNING)
+    for key in ("RESEND_API_KEY", "OPS_EMAIL", "RESEND_REPLY_TO"):
+        os.environ.pop(key, None)
+    runners = _runners(args.budget_fraction)
+
+    origins, dests = ORIGINS[:args.origins], DESTS[:args.dests]
+    tasks = [(o, d, n) for d in dests for o in origins for n in args.nights]
+    print(f"{len(origins)} origins x {len(dests)} dests x {len(args.nights)} nights = "
+          f"{len(tasks)} routes; pacing {args.rate:g} req/s, stand-in tolerates "
+          f"{args.google_rps:g} req/s, median latency {args.latency:g}s")
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.strategies.split(","):
+            db_path = os.path.join(tmp, f"{name}.sqlite")
+            _seed_db(db_path, origins, dests)
+            clock = ScaledClock(args.scale)
+            fli = StandInFli(seed=args.seed, latency=LatencyModel(median_s=args.latency),
+                             google_rps=args.google_rps, p_429=args.p429,
+                             p_soft_block=args.p_soft, clock=clock)
+            t0 = clock.monotonic()
+            planned = runners[name](db_path, fli, clock, tasks, args)
+            rows.append(_report(name, fli, t0, clock.monotonic(), planned, origins))
+            connections.close_all()
+
+    print(f"{'strategy':<11}{'reqs':>6}{'sim s':>8}{'req/s':>7}{'origins s':>11}"
+          f"{'full s':>8}{'ok':>6}{'429':>5}{'soft':>6}")
+    for r in rows:
+        print(f"{r['strategy']:<11}{r['requests']:>6}{_fmt(r['sim_s']):>8}"
+              f"{r['req_per_s']:>7.2f}{_fmt(r['origins_s']):>11}{_fmt(r['full_s']):>8}"
+              f"{r['routes_ok']:>6}{r['rate_limited']:>5}{r['soft_blocked']:>6}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
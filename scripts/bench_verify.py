@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Benchmark: per-pairing verify loop vs. the set-based pairings.verify_all.
+
+Seeds a throwaway DB with N synthetic pairings (one per origin, the
+city_pairings key), each leg with a few days of price_history, then times the
+old loop — two total_cost() calls and one UPDATE per pairing — against
+verify_all's single bulk read + executemany. The two must write identical
+city_pairings rows before anything is timed.
+
+Usage:
+    python -m scripts.bench_verify [--pairings N] [--dests N] [--days N]
+        [--repeat N] [--seed N]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from server import pairings
+from server.migrations import init_schema
+
+_PAIRING_ROWS = ("SELECT origin_iata, cheap_total_usd, anchor_total_usd, margin_usd, "
+                 "verified, last_checked FROM city_pairings ORDER BY origin_iata")
+
+
+def loop_verify(conn, now=None) -> dict:
+    """What verify_all did before: total_cost() per leg, one UPDATE per row."""
+    rows = conn.execute(
+        "SELECT origin_iata, cheap_iata, anchor_iata, trip_nights FROM city_pairings"
+    ).fetchall()
+    counts = {"verified": 0, "broken": 0, "unknown": 0}
+    for origin, cheap, anchor, nights in rows:
+        cheap_total = pairings.total_cost(conn, origin, cheap, nights)
+        anchor_total = pairings.total_cost(conn, origin, anchor, nights)
+        if cheap_total is None or anchor_total is None:
+            ok, margin = 0, None
+            counts["unknown"] += 1
+        else:
+            margin = anchor_total - cheap_total
+            ok = 1 if cheap_total < anchor_total else 0
+            counts["verified" if ok else "broken"] += 1
+        conn.execute(
+            "UPDATE city_pairings SET cheap_total_usd=?, anchor_total_usd=?, "
+            "margin_usd=?, verified=?, last_checked=? WHERE origin_iata=?",
+            (cheap_total, anchor_total, margin, ok, now, origin),
+        )
+    conn.commit()
+    return counts
+
+
+def _seed(path, rng, n_pairings, n_dests, days) -> None:
+    init_schema(path)
+    conn = sqlite3.connect(path)
+    dests = [f"D{i:03d}" for i in range(n_dests)]
+    conn.executemany(
+        "INSERT INTO destinations (iata, city, country, country_code, region, vibes, "
+        "passport_required, visa_required_us, best_months, avg_daily_cost_usd, "
+        "safety_tier, currency, lat, lng, base_catch, novelty_score) "
+        "VALUES (?, ?, 'C', 'CC', 'LA', '[]', 1, 0, '[1]', ?, 2, 'USD', 0, 0, NULL, 3)",
+        [(d, f"City {d}", rng.randint(35, 220)) for d in dests])
+    history, rows = [], []
+    for i in range(n_pairings):
+        origin = f"O{i:04d}"
+        cheap, anchor = rng.sample(dests, 2)
+        rows.append((origin, cheap, anchor))
+        # ~5% of pairings lack the anchor's fares entirely (unknown).
+        legs = (cheap,) if rng.random() < 0.05 else (cheap, anchor)
+        for dest in legs:
+            base = rng.randint(150, 1100)
+            history += [(origin, dest, base + rng.randint(-60, 60), f"2026-06-{d + 1:02d}")
+                        for d in range(days)]
+    conn.executemany(
+        "INSERT INTO price_history (origin_iata, dest_iata, trip_nights, "
+        "cheapest_price_usd, observed_date, source) VALUES (?, ?, 7, ?, ?, 'fli')", history)
+    conn.executemany(
+        "INSERT INTO city_pairings (origin_iata, cheap_iata, anchor_iata, trip_nights, "
+        "verified) VALUES (?, ?, ?, 7, 0)", rows)
+    conn.commit()
+    conn.close()
+
+
+def _time(fn, conn, repeat) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(conn, now="2026-06-30T00:00:00Z")
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pairings", type=int, default=1000)
+    parser.add_argument("--dests", type=int, default=150)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite")
+        _seed(path, random.Random(args.seed), args.pairings, args.dests, args.days)
+        conn = sqlite3.connect(path)
+        try:
+            looped = loop_verify(conn, now="x")
+            loop_rows = conn.execute(_PAIRING_ROWS).fetchall()
+            conn.execute("UPDATE city_pairings SET cheap_total_usd=NULL, "
+                         "anchor_total_usd=NULL, margin_usd=NULL, verified=0")
+            if pairings.verify_all(conn, now="x") != looped or \
+                    conn.execute(_PAIRING_ROWS).fetchall() != loop_rows:
+                print("MISMATCH between loop and set-based verification")
+                return 1
+            loop_s = _time(loop_verify, conn, args.repeat)
+            set_s = _time(pairings.verify_all, conn, args.repeat)
+        finally:
+            conn.close()
+
+    print(f"{args.pairings} pairings x 2 legs x {args.days} days of history "
+          f"(results identical: {looped})")
+    print(f"  per-pairing loop : {loop_s * 1e3:8.1f} ms")
+    print(f"  verify_all       : {set_s * 1e3:8.1f} ms")
+    print(f"  speedup          : {loop_s / set_s:8.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
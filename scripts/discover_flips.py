@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""List robust total-cost flips across every destination pair, for editors.
+
+CURATED_COMPARISONS only covers pairs someone thought of. This runs
+comparisons.discover_flips over the whole catalog — every ordered pair, every
+origin, one vectorized pass — and prints the pairs that pass the comparison
+gate (typical flip + MIN_ROBUST origins) AND are the "cheap flight, expensive
+week" surprise, best first. Read-only: nothing is published from here; an
+editor promotes a find by adding it (with an angle) to CURATED_COMPARISONS.
+
+Usage:
+    python -m scripts.discover_flips [--db PATH] [--nights 7] [--min-robust N]
+        [--limit 50] [--new-only] [--json]
+
+--db defaults to $DATABASE_PATH, then /var/lib/promptiv/teaser.sqlite.
+"""
+import argparse
+import json
+import os
+import time
+
+from server import comparisons, connections
+from server.cost_matrix import CostMatrix
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--db", default=os.environ.get("DATABASE_PATH", "/var/lib/promptiv/teaser.sqlite"))
+    ap.add_argument("--nights", type=int, default=comparisons.NIGHTS)
+    ap.add_argument("--min-robust", type=int, default=comparisons.MIN_ROBUST)
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--new-only", action="store_true",
+                    help="skip pairs already in CURATED_COMPARISONS")
+    ap.add_argument("--json", action="store_true", help="print the list as JSON")
+    args = ap.parse_args()
+
+    conn = connections.connect(args.db)
+    try:
+        t0 = time.perf_counter()
+        matrix = CostMatrix.load(conn)
+        flips = comparisons.discover_flips(conn, nights=args.nights,
+                                           min_robust=args.min_robust, matrix=matrix)
+        elapsed = time.perf_counter() - t0
+    finally:
+        conn.close()
+    if args.new_only:
+        flips = [f for f in flips if not f["curated"]]
+    flips = flips[:args.limit]
+
+    if args.json:
+        print(json.dumps(flips, indent=2))
+        return 0
+    d = len(matrix.dests)
+    print(f"{d * (d - 1):,} pairs x {len(matrix.origins)} origins in {elapsed:.2f}s; "
+          f"showing {len(flips)}")
+    print(f"{'cheap':<6}{'anchor':<7}{'air':>6}{'vs':>6}{'week':>7}{'vs':>7}"
+          f"{'margin':>8}{'wins':>7}  curated")
+    for f in flips:
+        print(f"{f['cheap_iata']:<6}{f['anchor_iata']:<7}{f['cheap_airfare']:>6}"
+              f"{f['anchor_airfare']:>6}{f['cheap_total']:>7}{f['anchor_total']:>7}"
+              f"{f['margin']:>8}{f['wins']:>4}/{f['origins']:<2}  "
+              f"{'yes' if f['curated'] else ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,158 @@
+"""Local stand-in for Google behind fli, for benchmarking the scan path.
+
+FliClient(mock=True) answers instantly and never fails, so it can show that a
+scan is correct but not how it behaves against the real thing: 1-2s calls,
+a sliding-window rate limiter that answers 429 and then blocks for a while,
+and the quieter soft-block where a route comes back with zero dates (the
+"EMPTY (possible soft-block)" case watch_runner warns about). StandInFli has
+FliClient's search_dates signature and models all three, deterministically
+from a seed:
+
+- price surfaces: one fare per departure day across the window, from a
+  per-route base, a seasonal swing, a day-of-week effect and seeded noise
+  (`day` shifts the noise, for scan-to-scan drift);
+- latency: lognormal around `latency.median_s`, capped at `latency.max_s`;
+- faults: more than `google_rps` sustained over `window_s` trips a 429 and a
+  `block_s` block (every call in it is a 429), followed by `soft_block_s` of
+  empty answers; `p_429` and `p_soft_block` add background noise.
+
+Time runs on an injectable clock (scan_engine's monotonic()/sleep() pair).
+ScaledClock runs real threads on compressed time so a multi-hour night can be
+replayed in seconds; see scripts/bench_scan.py.
+"""
+import math
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from server.fli_client import FliError, FliResult
+from server.scan_engine import SystemClock
+
+
+@dataclass(frozen=True)
+class LatencyModel:
+    median_s: float = 1.2
+    sigma: float = 0.45
+    max_s: float = 10.0
+
+    def sample(self, rng: random.Random) -> float:
+        return min(self.max_s, self.median_s * math.exp(rng.gauss(0.0, self.sigma)))
+
+
+class ScaledClock:
+    """Real time compressed by `scale`: sleep(10) takes 10 * scale seconds of
+    wall time and monotonic() reports simulated seconds. Anything that is NOT
+    a clock sleep (SQLite writes, Python overhead) is magnified by 1 / scale
+    in simulated time, so keep the scale modest."""
+
+    def __init__(self, scale: float = 0.02):
+        if scale <= 0:
+            raise ValueError("scale must be > 0")
+        self.scale = scale
+        self._t0 = time.monotonic()
+
+    def monotonic(self) -> float:
+        return (time.monotonic() - self._t0) / self.scale
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds * self.scale)
+
+
+class StandInFli:
+    """Drop-in for FliClient.search_dates against a simulated Google."""
+
+    def __init__(self, seed: int = 0, latency: LatencyModel = LatencyModel(),
+                 google_rps: float = 1.0, window_s: float = 10.0,
+                 block_s: float = 120.0, soft_block_s: float = 60.0,
+                 p_429: float = 0.0, p_soft_block: float = 0.0,
+                 day: int = 0, clock=None):
+        self.seed = seed
+        self.latency = latency
+        self.google_rps = google_rps
+        self.window_s = window_s
+        self.block_s = block_s
+        self.soft_block_s = soft_block_s
+        self.p_429 = p_429
+        self.p_soft_block = p_soft_block
+        self.day = day
+        self.clock = clock or SystemClock()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent = deque()            # request start times inside window_s
+        self._blocked_until = float("-inf")
+        self._soft_until = float("-inf")
+        self.calls = []                   # (t_done, origin, dest, nights, outcome)
+
+    # ---- the surface -------------------------------------------------------
+
+    def price(self, origin: str, dest: str, nights: int, departure: date) -> int:
+        route = random.Random(f"{self.seed}-{origin}-{dest}-{nights}")
+        base = 150 + route.randint(0, 900) + 12 * nights
+        amp = route.uniform(0.05, 0.25)
+        phase = route.uniform(0, 2 * math.pi)
+        season = 1 + amp * math.sin(2 * math.pi * departure.timetuple().tm_yday / 365 + phase)
+        weekday = (1.08 if departure.weekday() >= 4
+                   else 0.94 if departure.weekday() in (1, 2) else 1.0)
+        noise = random.Random(
+            f"{self.seed}-{origin}-{dest}-{nights}-{departure}-{self.day}").uniform(-0.06, 0.06)
+        return max(60, int(round(base * season * weekday * (1 + noise))))
+
+    def surface(self, origin, dest, start_date, end_date, trip_nights) -> list[FliResult]:
+        out = []
+        cursor = start_date
+        while cursor + timedelta(days=trip_nights) <= end_date:
+            out.append(FliResult(
+                origin_iata=origin, dest_iata=dest,
+                departure_date=cursor.isoformat(),
+                return_date=(cursor + timedelta(days=trip_nights)).isoformat(),
+                trip_nights=trip_nights,
+                total_price_usd=self.price(origin, dest, trip_nights, cursor)))
+            cursor += timedelta(days=1)
+        out.sort(key=lambda r: r.total_price_usd)
+        return out
+
+    # ---- the call ----------------------------------------------------------
+
+    def _admit(self, now: float) -> str:
+        """Decide this request's fate at its start time: ok / 429 / soft."""
+        while self._recent and self._recent[0] <= now - self.window_s:
+            self._recent.popleft()
+        self._recent.append(now)
+        if now < self._blocked_until:
+            return "429"
+        if len(self._recent) > self.google_rps * self.window_s or self._rng.random() < self.p_429:
+            self._blocked_until = now + self.block_s
+            self._soft_until = self._blocked_until + self.soft_block_s
+            return "429"
+        if now < self._soft_until or self._rng.random() < self.p_soft_block:
+            return "soft"
+        return "ok"
+
+    def search_dates(self, origin, destination, start_date, end_date, trip_nights):
+        with self._lock:
+            outcome = self._admit(self.clock.monotonic())
+            wait = self.latency.sample(self._rng)
+        self.clock.sleep(wait)
+        with self._lock:
+            self.calls.append((self.clock.monotonic(), origin, destination,
+                               trip_nights, outcome))
+        if outcome == "429":
+            raise FliError(f"fli call failed for {origin}->{destination}: "
+                           "HTTP 429 Too Many Requests (rate-limited)")
+        if outcome == "soft":
+            return []
+        return self.surface(origin, destination, start_date, end_date, trip_nights)
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls = list(self.calls)
+        return {
+            "requests": len(calls),
+            "ok": sum(1 for c in calls if c[4] == "ok"),
+            "rate_limited": sum(1 for c in calls if c[4] == "429"),
+            "soft_blocked": sum(1 for c in calls if c[4] == "soft"),
+        }
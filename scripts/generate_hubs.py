@@ -6,8 +6,11 @@ One page per origin in pairings.CURATED_PAIRINGS, written to
 alongside the core pages. Idempotent: re-seeds + re-verifies pairings first so
 heroes reflect current fares, then renders.
 
+Incremental: a page is re-rendered only when its inputs changed and written only
+when its bytes changed (see server/static_manifest.py); --force re-renders all.
+
 Usage:
-    python -m scripts.generate_hubs [--db PATH] [--public DIR]
+    python -m scripts.generate_hubs [--db PATH] [--public DIR] [--force]
 
 --db defaults to $DATABASE_PATH, then /var/lib/promptiv/teaser.sqlite.
 --public defaults to the repo's public/ directory.
@@ -15,12 +18,11 @@ Usage:
 import argparse
 import json
 import os
-import sqlite3
-from datetime import date, datetime, timezone
+from datetime import datetime, timezone
 from pathlib import Path
 
 from server import pairings, hubs, hub_render, budget_pages, budget_render
-from server import comparisons, comparison_render
+from server import comparisons, comparison_render, connections, schema_ld, static_manifest
 from server.migrations import init_schema
 
 CANONICAL_BASE = "https://dashaway.io"
@@ -29,6 +31,11 @@ CANONICAL_BASE = "https://dashaway.io"
 # fuller catalog names). Applied on top of hubs.DISPLAY_NAMES by IATA.
 SHORT_NAMES = {"LAS": "Vegas", "SJD": "Cabo"}
 
+# Everything that shapes rendered bytes beyond the page's own inputs; a change to
+# any of these files re-renders every page once.
+RENDER_FINGERPRINT = static_manifest.source_fingerprint(
+    [hub_render, budget_render, comparison_render, schema_ld])
+
 # Core pages and their sitemap hints, kept in sync with the original sitemap.
 CORE_PAGES = [
     ("/", "weekly", "1.0"),
@@ -44,74 +51,81 @@ BLOG_POSTS = [
 ]
 
 
-def generate(db_path: str, public_dir: Path) -> list:
+def generate(db_path: str, public_dir: Path, force: bool = False) -> list:
     init_schema(db_path)
-    conn = sqlite3.connect(db_path)
+    conn = connections.connect(db_path)
     try:
         pairings.seed_pairings(conn)
         pairings.verify_all(conn, now=datetime.now(timezone.utc).isoformat())
 
-        today = date.today().isoformat()
+        manifest = static_manifest.Manifest(conn, public_dir, fingerprint=RENDER_FINGERPRINT,
+                                            force=force)
+        # One hub build per origin for the whole run: the hub page, every
+        # budget band, pairings.js and the comparisons all read it from here.
+        ctx = hubs.HubContext(conn)
         origins = [o for o, _, _ in pairings.CURATED_PAIRINGS]
         written = []
         budget_paths = []
         for origin in origins:
-            hub = hubs.build_hub(conn, origin)
+            hub = ctx.hub(origin)
             if not hub["trips"]:
                 print(f"  SKIP {origin}: no trip data")
                 continue
             slug = hub_render.slugify(hub["origin_city"])
-            (public_dir / slug).mkdir(parents=True, exist_ok=True)
-            (public_dir / slug / "index.html").write_text(hub_render.render_hub(hub), encoding="utf-8")
+            manifest.page(f"{slug}/index.html", hub,
+                          lambda _fresh, hub=hub: hub_render.render_hub(hub))
             hero = "hero" if hub["hero"] else "NO HERO"
             print(f"  {origin} -> /{slug}  ({len(hub['trips'])} trips, {hero})")
             written.append(slug)
 
             # Budget pages (origin x band), gated. build once per band, keep the ones
             # that pass; sibling links use the published set so they cross-link.
-            pages = [p for p in (budget_pages.build_budget_page(conn, origin, b)
+            pages = [p for p in (budget_pages.build_budget_page(conn, origin, b, ctx=ctx)
                                  for b in budget_pages.BUDGET_BANDS) if p]
             bands = [p["budget"] for p in pages]
             for p in pages:
-                bdir = public_dir / slug / f"under-{p['budget']}"
-                bdir.mkdir(parents=True, exist_ok=True)
-                bdir.joinpath("index.html").write_text(
-                    budget_render.render_budget_page(p, sibling_bands=bands, freshness=today),
-                    encoding="utf-8")
+                manifest.page(
+                    f"{slug}/under-{p['budget']}/index.html", {"page": p, "bands": bands},
+                    lambda fresh, p=p: budget_render.render_budget_page(
+                        p, sibling_bands=bands, freshness=fresh))
                 budget_paths.append(f"{slug}/under-{p['budget']}")
             if bands:
                 print(f"       budget pages: {', '.join('under-' + str(b) for b in bands)}")
         # Comparison pages (/vs/<cheap>-vs-<anchor>), curated + robust-flip gated.
-        comps = comparisons.published_comparisons(conn)
+        comps = comparisons.published_comparisons(conn, matrix=ctx.matrix)
         labels = [{"slug": c["slug"], "label": f"{c['cheap']['city']} vs {c['anchor']['city']}"} for c in comps]
         vs_paths = []
         for i, c in enumerate(comps):
             others = [labels[j] for j in range(len(labels)) if j != i][:3]
-            vdir = public_dir / "vs" / c["slug"]
-            vdir.mkdir(parents=True, exist_ok=True)
-            vdir.joinpath("index.html").write_text(
-                comparison_render.render_comparison(c, others=others, freshness=today),
-                encoding="utf-8")
+            manifest.page(
+                f"vs/{c['slug']}/index.html", {"comparison": c, "others": others},
+                lambda fresh, c=c, others=others: comparison_render.render_comparison(
+                    c, others=others, freshness=fresh))
             vs_paths.append(f"vs/{c['slug']}")
         print(f"  comparison pages: {len(vs_paths)} (gated from {len(comparisons.CURATED_COMPARISONS)})")
 
-        _write_pairings_js(conn, public_dir)
+        _write_pairings_js(conn, ctx, manifest)
+        _write_sitemap(manifest, written, budget_paths, vs_paths)
+        conn.commit()
     finally:
         conn.close()
 
-    _write_sitemap(public_dir, written, budget_paths, vs_paths)
     print(f"  budget pages total: {len(budget_paths)}")
+    st = manifest.stats()
+    print(f"  regen: {st['rendered']} rendered, {st['skipped']} skipped (inputs unchanged); "
+          f"{st['written']} files written, {st['unchanged']} byte-identical")
     return written
 
 
-def _write_pairings_js(conn, public_dir: Path) -> None:
+def _write_pairings_js(conn, ctx: hubs.HubContext,
+                       manifest: static_manifest.Manifest) -> None:
     """Emit public/pairings.js (window.PROMPTIV_PAIRINGS) from the VERIFIED
     pairings so the homepage rotation + geo headlines track the fact monitor and
     never show an unverified claim. app.js falls back to its built-in copy if
-    this file is missing."""
+    this file is missing. Headlines are the hubs' verified heroes."""
     entries = []
     for origin, _, _ in pairings.CURATED_PAIRINGS:
-        hl = pairings.get_headline(conn, origin, display_names=hubs.DISPLAY_NAMES)
+        hl = ctx.hub(origin)["hero"]
         if not hl:
             print(f"  pairings.js: skip {origin} (unverified)")
             continue
@@ -132,15 +146,22 @@ def _write_pairings_js(conn, public_dir: Path) -> None:
     js = ("// Generated by scripts/generate_hubs.py from verified city_pairings.\n"
           "// Do not edit by hand. app.js reads window.PROMPTIV_PAIRINGS.\n"
           "window.PROMPTIV_PAIRINGS = " + json.dumps(entries, ensure_ascii=False, indent=2) + ";\n")
-    (public_dir / "pairings.js").write_text(js, encoding="utf-8")
+    manifest.file("pairings.js", js)
     print(f"  pairings.js: {len(entries)} verified pairings")
 
 
-def _write_sitemap(public_dir: Path, hub_slugs: list, budget_paths: list = None,
-                   vs_paths: list = None) -> None:
+def _write_sitemap(manifest: static_manifest.Manifest, hub_slugs: list,
+                   budget_paths: list = None, vs_paths: list = None) -> None:
+    """Rebuild sitemap.xml. Each generated page's lastmod is the date its
+    content last changed (from the manifest); core pages and blog posts take the
+    newest of those, so an unchanged site produces a byte-identical sitemap."""
     budget_paths = budget_paths or []
     vs_paths = vs_paths or []
-    today = date.today().isoformat()
+    latest = manifest.latest_change()
+
+    def lastmod(path):
+        return manifest.changed_on.get(f"{path}/index.html", latest)
+
     parts = [
         '<?xml version="1.0" encoding="UTF-8"?>',
         "<!-- Generated by scripts/generate_hubs.py. Do not edit by hand: the hub",
@@ -148,17 +169,17 @@ def _write_sitemap(public_dir: Path, hub_slugs: list, budget_paths: list = None,
         '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
     ]
     for loc, changefreq, priority in CORE_PAGES:
-        parts += _url(f"{CANONICAL_BASE}{loc}", today, changefreq, priority)
+        parts += _url(f"{CANONICAL_BASE}{loc}", latest, changefreq, priority)
     for slug in hub_slugs:
-        parts += _url(f"{CANONICAL_BASE}/{slug}", today, "weekly", "0.7")
+        parts += _url(f"{CANONICAL_BASE}/{slug}", lastmod(slug), "weekly", "0.7")
     for path in budget_paths:
-        parts += _url(f"{CANONICAL_BASE}/{path}", today, "weekly", "0.6")
+        parts += _url(f"{CANONICAL_BASE}/{path}", lastmod(path), "weekly", "0.6")
     for path in vs_paths:
-        parts += _url(f"{CANONICAL_BASE}/{path}", today, "weekly", "0.6")
+        parts += _url(f"{CANONICAL_BASE}/{path}", lastmod(path), "weekly", "0.6")
     for path in BLOG_POSTS:
-        parts += _url(f"{CANONICAL_BASE}/{path}", today, "monthly", "0.7")
+        parts += _url(f"{CANONICAL_BASE}/{path}", latest, "monthly", "0.7")
     parts.append("</urlset>")
-    (public_dir / "sitemap.xml").write_text("\n".join(parts) + "\n", encoding="utf-8")
+    manifest.file("sitemap.xml", "\n".join(parts) + "\n")
     print(f"  sitemap.xml: {len(CORE_PAGES)} core + {len(hub_slugs)} hubs + "
           f"{len(budget_paths)} budget + {len(vs_paths)} vs + {len(BLOG_POSTS)} blog")
 
@@ -179,9 +200,11 @@ def main() -> int:
     ap = argparse.ArgumentParser()
     ap.add_argument("--db", default=os.environ.get("DATABASE_PATH", "/var/lib/promptiv/teaser.sqlite"))
     ap.add_argument("--public", default=str(repo_root / "public"))
+    ap.add_argument("--force", action="store_true",
+                    help="re-render every page even if its inputs are unchanged")
     args = ap.parse_args()
     print(f"generating hubs from {args.db} into {args.public}")
-    written = generate(args.db, Path(args.public))
+    written = generate(args.db, Path(args.public), force=args.force)
     print(f"done: {len(written)} hubs")
     return 0
 
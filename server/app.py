@@ -12,10 +12,11 @@ from typing import Optional
 from flask import Flask, jsonify, make_response, redirect, request, send_from_directory
 
 from server import catch as catchmod
-from server import db, email_client
+from server import connections, db, email_client
 from server import watches as watches_mod
 from server import watch_emails
 from server import ranking as rankmod
+from server.go_cache import GoCache
 from server.migrations import init_schema
 
 
@@ -109,6 +110,8 @@ def create_app() -> Flask:
     db_path = os.environ.get("DATABASE_PATH")
     if db_path:
         init_schema(db_path)
+    go_cache = GoCache()
+    app.extensions["go_cache"] = go_cache
 
     @app.route("/")
     def index():
@@ -147,9 +150,7 @@ def create_app() -> Flask:
         ip_hash = _hash_ip(ip.split(",")[0].strip()) if ip else None
         if not db_path:
             return jsonify({"error": "database not configured"}), 500
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        try:
+        with connections.connection(db_path) as conn:
             try:
                 w = watches_mod.create_watch(
                     conn,
@@ -170,19 +171,13 @@ def create_app() -> Flask:
             watch_emails.send_watch_confirm(row["email"], row, confirm_url)
             return jsonify({"status": "pending",
                             "message": "check your email to confirm"})
-        finally:
-            conn.close()
 
     @app.route("/watch/confirm")
     def watch_confirm():
         if not db_path:
             return jsonify({"error": "database not configured"}), 500
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        try:
+        with connections.connection(db_path) as conn:
             ok = watches_mod.confirm_watch(conn, request.args.get("token", ""))
-        finally:
-            conn.close()
         if ok:
             page = _watch_page(
                 "You&rsquo;re watching.",
@@ -198,9 +193,7 @@ def create_app() -> Flask:
         if not db_path:
             return jsonify({"error": "database not configured"}), 500
         token = (request.args.get("token") or request.form.get("token") or "").strip()
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        try:
+        with connections.connection(db_path) as conn:
             row = watches_mod.get_by_token(conn, token)
             if not row or row["status"] == "deleted":
                 return _watch_page("Not found.",
@@ -213,8 +206,6 @@ def create_app() -> Flask:
                     return _watch_page("Unknown action.", ""), 400
                 watches_mod.set_status(conn, token, new)
                 row = watches_mod.get_by_token(conn, token)
-        finally:
-            conn.close()
         status = row["status"]
         if status == "deleted":
             return _watch_page("Watch deleted.",
@@ -233,21 +224,21 @@ def create_app() -> Flask:
 
     @app.route("/api/healthz")
     def healthz():
-        import sqlite3
         snapshot_count = 0
         last_refresh_at = None
         db_status = "ok"
         if db_path:
             try:
-                conn = sqlite3.connect(db_path)
-                try:
+                with connections.connection(db_path) as conn:
                     row = conn.execute(
                         "SELECT COUNT(*), MAX(fetched_at) FROM price_snapshots"
                     ).fetchone()
                     snapshot_count = row[0] or 0
-                    last_refresh_at = row[1]
-                finally:
-                    conn.close()
+                    # Unchanged snapshots keep their old fetched_at, so a night
+                    # that moved no fares is only visible in the run ledger.
+                    run = conn.execute(
+                        "SELECT MAX(finished_at) FROM refresh_runs").fetchone()
+                    last_refresh_at = max((t for t in (row[1], run[0]) if t), default=None)
             except sqlite3.Error as e:
                 db_status = f"error: {e}"
         return jsonify({
@@ -341,41 +332,19 @@ def create_app() -> Flask:
 
         if not db_path:
             return jsonify({"error": "database not configured"}), 500
-        conn = sqlite3.connect(db_path)
-        conn.execute("PRAGMA foreign_keys = ON")
-        try:
-            candidates = db.find_candidates(conn, origin, int(budget), int(nights))
+        with connections.connection(db_path) as conn:
             seen = db.session_seen_counts(conn, session_id)
-
-            scored = []
-            for c in candidates:
-                cand = rankmod.Candidate(
-                    iata=c["iata"],
-                    price_usd=c["price_usd"],
-                    vibes=c["vibes"],
-                    novelty_score=c["novelty_score"],
-                    cheapest_date_in_best_months=c["cheapest_date_in_best_months"],
-                )
-                query = rankmod.UserQuery(
-                    origin_iata=origin, budget_usd=int(budget),
-                    trip_nights=int(nights), vibes=vibes,
-                )
-                session = rankmod.SessionState(seen_count=seen)
-                s = rankmod.score(cand, query, session)
-                if s is None:
-                    continue
-                if vibes:
-                    overlap = len(set(vibes) & set(c["vibes"]))
-                    if overlap == 0:
-                        continue
-                scored.append((s, c))
-
-            # High score first; tie-break novelty desc then price asc
-            scored.sort(key=lambda x: (-x[0], -x[1]["novelty_score"], x[1]["price_usd"]))
-            top = scored[:8]
+            query = rankmod.UserQuery(
+                origin_iata=origin, budget_usd=int(budget),
+                trip_nights=int(nights), vibes=vibes,
+            )
+            # High score first; tie-break novelty desc then price asc. The
+            # shared candidate pool comes from the go cache; only the session's
+            # novelty re-rank runs per request.
+            top = go_cache.rank(conn, query, rankmod.SessionState(seen_count=seen), k=8)
 
             cards = []
-            for _score, c in top:
+            for c in top:
                 cards.append({
                     "iata": c["iata"],
                     "city": c["city"],
@@ -401,8 +370,6 @@ def create_app() -> Flask:
                 result_iatas=[card["iata"] for card in cards],
             )
             conn.commit()
-        finally:
-            conn.close()
 
         body = {"results": cards}
         resp.data = jsonify(body).get_data()
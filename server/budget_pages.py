@@ -16,7 +16,7 @@ real data). It's the seam where a richer LLM / content-pipeline pass plugs in.
 import datetime
 from typing import Optional
 
-from server import hubs
+from server import hubs, pairings
 from server.hub_render import slugify
 
 # Candidate bands. The gate decides which actually publish per origin.
@@ -26,16 +26,19 @@ MAX_FRACTION = 0.75    # above this the band ~= the whole catalog -> suppress
 
 
 
-def build_budget_page(conn, origin: str, budget: int) -> Optional[dict]:
+def build_budget_page(conn, origin: str, budget: int,
+                      ctx: Optional[hubs.HubContext] = None) -> Optional[dict]:
     """Assemble one origin x budget page, or None if the band is gated out
-    (too thin or too broad to add value)."""
-    hub = hubs.build_hub(conn, origin)
+    (too thin or too broad to add value). Pass the run's HubContext so every
+    band reuses the one hub build; without one, the hub is read straight from
+    the origin's route_floor rows (no cost matrix for a single page)."""
+    hub = ctx.hub(origin) if ctx else hubs.build_hub(conn, origin)
     trips = hub["trips"]
     total = len(trips)
     if total == 0:
         return None
     under = [t for t in trips if t["total_usd"] <= budget]
-    if len(under) < MIN_RESULTS or len(under) > MAX_FRACTION * total:
+    if not _selective(len(under), total):
         return None  # selectivity gate: not a useful filter
 
     origin_city = hub["origin_city"]
@@ -53,13 +56,24 @@ def build_budget_page(conn, origin: str, budget: int) -> Optional[dict]:
     }
 
 
-def published_bands(conn, origin: str) -> list:
-    """The bands that actually publish for an origin (after gating)."""
-    out = []
-    for b in BUDGET_BANDS:
-        if build_budget_page(conn, origin, b) is not None:
-            out.append(b)
-    return out
+def published_bands(conn, origin: str, ctx: Optional[hubs.HubContext] = None) -> list:
+    """The bands that actually publish for an origin (after gating). With the
+    run's HubContext, counts every band in one pass over its cost matrix;
+    without one, from the origin's route_floor rows. No page is built."""
+    if ctx is None:
+        totals = [t["total_usd"] for t in hubs.build_hub(conn, origin)["trips"]]
+        total = len(totals)
+        counts = [sum(1 for t in totals if t <= b) for b in BUDGET_BANDS]
+    else:
+        total = ctx.matrix.priced_count(origin, pairings.DEFAULT_NIGHTS)
+        counts = ctx.matrix.count_under(origin, BUDGET_BANDS, pairings.DEFAULT_NIGHTS)
+    if total == 0:
+        return []
+    return [b for b, n in zip(BUDGET_BANDS, counts) if _selective(n, total)]
+
+
+def _selective(under: int, total: int) -> bool:
+    return MIN_RESULTS <= under <= MAX_FRACTION * total
 
 
 def _money(n) -> str:
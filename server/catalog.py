@@ -0,0 +1,137 @@
+"""In-process destination catalog, decoded once per catalog version.
+
+The destinations table is small (~100 rows) and changes only when the YAML is
+reloaded, yet the hot paths (/go, hub/budget/comparison builds, pairing
+verification, watch emails) each re-queried it row by row and re-ran json.loads
+on vibes / best_months every time. This module loads the whole table once into
+frozen Destination records keyed by IATA — vibes as a frozenset, best months as
+a 12-bit mask — and serves every later lookup from memory.
+
+Invalidation: catalog_meta.version is bumped by triggers on every destinations
+insert/update/delete (so destinations.load_all, or any hand edit, bumps it).
+get_catalog() checks that one integer and reloads only when it moved. The cache
+is per database file, so tests on separate temp DBs never see each other.
+"""
+import json
+import threading
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+_CATALOG_SQL = (
+    "SELECT iata, city, country, region, vibes, best_months, avg_daily_cost_usd, "
+    "       safety_tier, novelty_score, base_catch "
+    "FROM destinations ORDER BY iata"
+)
+
+
+@dataclass(frozen=True)
+class Destination:
+    iata: str
+    city: str
+    country: str
+    region: str
+    vibes: frozenset
+    vibes_list: tuple            # catalog order, for JSON/API output
+    best_months: tuple
+    month_mask: int              # bit (m - 1) set when month m is a best month
+    avg_daily_cost_usd: int
+    safety_tier: int
+    novelty_score: int
+    base_catch: Optional[str]
+
+    def in_season(self, month: int) -> bool:
+        return bool(self.month_mask >> (month - 1) & 1)
+
+
+class Catalog:
+    """An immutable snapshot of the destinations table at one version."""
+
+    def __init__(self, version: int, destinations: dict):
+        self.version = version
+        self._by_iata = destinations
+
+    def get(self, iata: str) -> Optional[Destination]:
+        return self._by_iata.get(iata)
+
+    def __contains__(self, iata) -> bool:
+        return iata in self._by_iata
+
+    def __iter__(self) -> Iterator[Destination]:
+        return iter(self._by_iata.values())
+
+    def __len__(self) -> int:
+        return len(self._by_iata)
+
+
+def month_mask(months) -> int:
+    mask = 0
+    for m in months:
+        if isinstance(m, int) and 1 <= m <= 12:
+            mask |= 1 << (m - 1)
+    return mask
+
+
+def _json_list(raw) -> list:
+    if not raw:
+        return []
+    try:
+        val = json.loads(raw)
+        return val if isinstance(val, list) else []
+    except (ValueError, TypeError):
+        return []
+
+
+def load(conn, version: int = 0) -> Catalog:
+    """Read and decode the whole destinations table (no caching)."""
+    out = {}
+    for (iata, city, country, region, vibes, best_months, daily, safety,
+         novelty, base_catch) in conn.execute(_CATALOG_SQL):
+        vibes_list = tuple(_json_list(vibes))
+        months = tuple(_json_list(best_months))
+        out[iata] = Destination(
+            iata=iata, city=city, country=country, region=region,
+            vibes=frozenset(vibes_list), vibes_list=vibes_list,
+            best_months=months, month_mask=month_mask(months),
+            avg_daily_cost_usd=int(daily), safety_tier=int(safety),
+            novelty_score=int(novelty), base_catch=base_catch,
+        )
+    return Catalog(version, out)
+
+
+_cache: dict = {}      # db file path -> Catalog
+_cache_lock = threading.Lock()
+
+
+def _db_file(conn) -> str:
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == "main":
+            return path or ""
+    return ""
+
+
+def current_version(conn) -> int:
+    row = conn.execute("SELECT version FROM catalog_meta WHERE id = 1").fetchone()
+    return int(row[0]) if row else 0
+
+
+def get_catalog(conn) -> Catalog:
+    """The decoded catalog for conn's database, reloaded only when
+    catalog_meta.version has moved since the cached copy."""
+    version = current_version(conn)
+    path = _db_file(conn)
+    if not path:                     # in-memory DB: nothing stable to key on
+        return load(conn, version)
+    with _cache_lock:
+        cached = _cache.get(path)
+    if cached is not None and cached.version == version:
+        return cached
+    fresh = load(conn, version)
+    with _cache_lock:
+        _cache[path] = fresh
+    return fresh
+
+
+def invalidate() -> None:
+    """Drop every cached catalog (tests, or after swapping a DB file)."""
+    with _cache_lock:
+        _cache.clear()
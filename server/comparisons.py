@@ -15,6 +15,10 @@ the pairing engine. No Offer/price markup: the figures are directional.
 import statistics
 from typing import Optional
 
+import numpy as np
+
+from server.catalog import get_catalog
+from server.cost_matrix import CostMatrix
 from server.hubs import DISPLAY_NAMES
 from server.hub_render import slugify
 
@@ -39,52 +43,52 @@ CURATED_COMPARISONS = [
 
 
 def _dest(conn, iata: str) -> Optional[dict]:
-    row = conn.execute(
-        "SELECT iata, city, country, avg_daily_cost_usd FROM destinations WHERE iata=?",
-        (iata,),
-    ).fetchone()
-    if not row:
+    d = get_catalog(conn).get(iata)
+    if d is None:
         return None
-    return {"iata": row[0], "city": DISPLAY_NAMES.get(row[0]) or row[1],
-            "country": row[2], "daily": int(row[3])}
+    return {"iata": d.iata, "city": DISPLAY_NAMES.get(d.iata) or d.city,
+            "country": d.country, "daily": d.avg_daily_cost_usd}
 
 
-def _airfare_by_origin(conn, iata: str, nights: int = NIGHTS) -> dict:
+def _airfare_by_origin(conn, iata: str, nights: int = NIGHTS,
+                       matrix: Optional[CostMatrix] = None) -> dict:
     """origin -> cheapest airfare to dest (per-origin floor)."""
+    if matrix is not None:
+        return matrix.airfare_by_origin(iata, nights)
     return {o: a for o, a in conn.execute(
-        "SELECT origin_iata, MIN(cheapest_price_usd) FROM price_history "
-        "WHERE dest_iata=? AND trip_nights=? GROUP BY origin_iata", (iata, nights))
+        "SELECT origin_iata, floor_usd FROM route_floor "
+        "WHERE dest_iata=? AND trip_nights=?", (iata, nights))
         if a is not None}
 
 
-def typical_total(conn, dest: dict, nights: int = NIGHTS):
+def typical_total(conn, dest: dict, nights: int = NIGHTS,
+                  matrix: Optional[CostMatrix] = None):
     """(median airfare across origins, that + a week on the ground), or None."""
-    airs = list(_airfare_by_origin(conn, dest["iata"], nights).values())
+    airs = list(_airfare_by_origin(conn, dest["iata"], nights, matrix).values())
     if not airs:
         return None
     air = int(statistics.median(airs))
     return air, air + nights * dest["daily"]
 
 
-def build_comparison(conn, cheap_iata: str, anchor_iata: str, angle: str = "") -> Optional[dict]:
+def build_comparison(conn, cheap_iata: str, anchor_iata: str, angle: str = "",
+                     matrix: Optional[CostMatrix] = None) -> Optional[dict]:
     """Assemble one comparison, or None if it's gated out (missing data, the
-    typical flip doesn't hold, or it isn't robust across origins)."""
+    typical flip doesn't hold, or it isn't robust across origins). Reads
+    totals from `matrix` (loaded here if not given)."""
+    matrix = matrix or CostMatrix.load(conn)
     cheap = _dest(conn, cheap_iata)
     anchor = _dest(conn, anchor_iata)
     if not cheap or not anchor:
         return None
-    ct = typical_total(conn, cheap)
-    at = typical_total(conn, anchor)
+    ct = typical_total(conn, cheap, matrix=matrix)
+    at = typical_total(conn, anchor, matrix=matrix)
     if not ct or not at:
         return None
     cheap_air, cheap_total = ct
     anchor_air, anchor_total = at
 
-    cheap_by = _airfare_by_origin(conn, cheap_iata)
-    anchor_by = _airfare_by_origin(conn, anchor_iata)
-    shared = set(cheap_by) & set(anchor_by)
-    wins = sum(1 for o in shared
-               if cheap_by[o] + NIGHTS * cheap["daily"] < anchor_by[o] + NIGHTS * anchor["daily"])
+    wins, shared = matrix.wins(cheap_iata, anchor_iata, NIGHTS)
 
     # Gate: the typical-city flip must hold AND be robust across origins.
     if cheap_total >= anchor_total or wins < MIN_ROBUST:
@@ -95,18 +99,65 @@ def build_comparison(conn, cheap_iata: str, anchor_iata: str, angle: str = "") -
         "anchor": {**anchor, "airfare": anchor_air, "total": anchor_total},
         "margin": anchor_total - cheap_total,
         "wins": wins,
-        "origins": len(shared),
+        "origins": shared,
         "nights": NIGHTS,
         "angle": angle,
         "slug": f"{slugify(cheap['city'])}-vs-{slugify(anchor['city'])}",
     }
 
 
-def published_comparisons(conn) -> list:
+def discover_flips(conn, nights: int = NIGHTS, min_robust: Optional[int] = None,
+                   matrix: Optional[CostMatrix] = None, limit: Optional[int] = None) -> list:
+    """Every ordered destination pair that would pass build_comparison's gate
+    AND is the signature surprise — the cheap leg costs MORE to fly to but
+    less for the week — ranked for editors: most origins won first, then the
+    biggest typical-city margin.
+
+    One vectorized pass over the cost matrix (dests^2 x origins comparisons),
+    so it covers the whole catalog, not just CURATED_COMPARISONS. Each entry
+    carries the same figures a comparison page shows plus `curated`, so an
+    editor can see which finds are new.
+    """
+    matrix = matrix or CostMatrix.load(conn)
+    min_robust = MIN_ROBUST if min_robust is None else min_robust
+    if not matrix.dests:
+        return []
+    wins, shared = matrix.pair_wins(nights)
+    median_air = matrix.median_airfare(nights)
+    priced = ~np.isnan(median_air)
+    # int() of the median, as typical_total() does.
+    air = np.where(priced, np.trunc(np.nan_to_num(median_air)), 0).astype(np.int64)
+    total = air + nights * matrix.daily
+    both = priced[:, None] & priced[None, :]
+    flips = (both & (total[:, None] < total[None, :])      # typical flip holds
+             & (air[:, None] > air[None, :])               # cheap flight, dear week
+             & (wins >= min_robust))
+    curated = {(c, a) for c, a, _ in CURATED_COMPARISONS}
+    out = []
+    for c, a in zip(*np.nonzero(flips)):
+        cheap, anchor = matrix.dests[c], matrix.dests[a]
+        out.append({
+            "cheap_iata": cheap,
+            "anchor_iata": anchor,
+            "cheap_airfare": int(air[c]),
+            "anchor_airfare": int(air[a]),
+            "cheap_total": int(total[c]),
+            "anchor_total": int(total[a]),
+            "margin": int(total[a] - total[c]),
+            "wins": int(wins[c, a]),
+            "origins": int(shared[c, a]),
+            "curated": (cheap, anchor) in curated,
+        })
+    out.sort(key=lambda f: (-f["wins"], -f["margin"], f["cheap_iata"], f["anchor_iata"]))
+    return out[:limit] if limit is not None else out
+
+
+def published_comparisons(conn, matrix: Optional[CostMatrix] = None) -> list:
     """The curated comparisons that pass the gate, in curated order."""
+    matrix = matrix or CostMatrix.load(conn)
     out = []
     for cheap, anchor, angle in CURATED_COMPARISONS:
-        c = build_comparison(conn, cheap, anchor, angle)
+        c = build_comparison(conn, cheap, anchor, angle, matrix=matrix)
         if c:
             out.append(c)
     return out
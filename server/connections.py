@@ -0,0 +1,113 @@
+"""Shared SQLite connection management for the whole server package.
+
+Every reader and writer used to open its own sqlite3 connection with default
+settings (rollback journal, FULL sync), so the multi-hour price_refresh writer
+held locks that stalled gunicorn's /api/go and /api/healthz readers. This
+module is the one place connections get made:
+
+- journal_mode=WAL: readers never block on the writer and vice versa (the mode
+  is persistent in the file; setting it per connection is a cheap no-op after
+  the first time).
+- synchronous=NORMAL: the WAL-recommended durability level — no fsync per
+  commit, still crash-safe (a power cut can only lose the last commits).
+- busy_timeout: a writer that does collide waits instead of raising
+  "database is locked".
+- a larger prepared-statement cache, since every module reuses a small fixed
+  set of SQL strings.
+
+Two ways in. `connection()` is the pool: one long-lived connection per
+(thread, database), reused across requests, with any transaction a caller left
+open rolled back when the outermost `with` exits. `connect()` hands out a new,
+identically configured connection the caller owns and closes (long-running
+jobs, cross-thread writers).
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+BUSY_TIMEOUT_MS = 5000
+CACHED_STATEMENTS = 256
+
+_local = threading.local()
+_registry_lock = threading.Lock()
+_registry: list = []   # every pooled connection, so close_all() can reach them
+_generation = 0        # bumped by close_all(); stale thread pools reset on next use
+
+
+def _resolve(db_path: Optional[str]) -> str:
+    db_path = db_path or os.environ.get("DATABASE_PATH")
+    if not db_path:
+        raise RuntimeError("DATABASE_PATH not set")
+    return db_path
+
+
+def configure(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """Apply the shared PRAGMAs to an open connection."""
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def connect(db_path: Optional[str] = None, check_same_thread: bool = True) -> sqlite3.Connection:
+    """A new configured connection owned (and closed) by the caller."""
+    conn = sqlite3.connect(_resolve(db_path), timeout=BUSY_TIMEOUT_MS / 1000,
+                           cached_statements=CACHED_STATEMENTS,
+                           check_same_thread=check_same_thread)
+    conn.row_factory = sqlite3.Row
+    return configure(conn)
+
+
+def _pool() -> dict:
+    pool = getattr(_local, "pool", None)
+    # A forked worker must not reuse its parent's connections, and a thread
+    # must not reuse connections close_all() has since closed.
+    if (pool is None or getattr(_local, "pid", None) != os.getpid()
+            or getattr(_local, "generation", None) != _generation):
+        pool = _local.pool = {}
+        _local.pid = os.getpid()
+        _local.generation = _generation
+        _local.depth = {}
+    return pool
+
+
+@contextmanager
+def connection(db_path: Optional[str] = None):
+    """The calling thread's pooled connection to `db_path` (default
+    $DATABASE_PATH). Nested uses share it; the outermost exit rolls back any
+    transaction the body didn't commit, so the next user starts clean."""
+    path = _resolve(db_path)
+    pool = _pool()
+    conn = pool.get(path)
+    if conn is None:
+        # check_same_thread=False only so close_all() may close it from the
+        # test/teardown thread; the pool itself never shares across threads.
+        conn = connect(path, check_same_thread=False)
+        pool[path] = conn
+        with _registry_lock:
+            _registry.append(conn)
+    depth = _local.depth
+    depth[path] = depth.get(path, 0) + 1
+    try:
+        yield conn
+    finally:
+        depth[path] -= 1
+        if depth[path] == 0 and conn.in_transaction:
+            conn.rollback()
+
+
+def close_all() -> None:
+    """Close every pooled connection in the process (shutdown and tests)."""
+    global _generation
+    with _registry_lock:
+        conns = list(_registry)
+        _registry.clear()
+        _generation += 1
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
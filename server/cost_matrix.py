@@ -0,0 +1,141 @@
+"""All-in trip costs for every origin x destination x nights, as one array.
+
+The hubs, budget pages and comparisons all answer questions about the same
+number — a route's airfare floor plus nights x the destination's daily cost —
+and each used to derive it with its own SQL per page. CostMatrix reads
+route_floor and the catalog once and holds:
+
+- airfare: int64 (origins, dests, nights), the route's all-time floor;
+- has_fare: bool, same shape — False where we have no fare for the route;
+- daily: int64 (dests,), avg_daily_cost_usd per catalog destination;
+- total: airfare + nights x daily (meaningless where has_fare is False).
+
+Only catalog destinations are on the dest axis, matching total_cost() (a fare
+to an uncatalogued dest has no defensible total). Values are exact integers,
+so every query agrees with the SQL it replaces. A matrix is a snapshot: load
+one per generation run (HubContext does) and it never sees later fares.
+"""
+from typing import Optional
+
+import numpy as np
+
+from server.catalog import get_catalog
+
+
+class CostMatrix:
+    def __init__(self, origins: list, dests: list, nights: list,
+                 airfare: np.ndarray, has_fare: np.ndarray, daily: np.ndarray):
+        self.origins = list(origins)
+        self.dests = list(dests)          # sorted, so ties rank by IATA
+        self.nights = list(nights)
+        self.airfare = airfare
+        self.has_fare = has_fare
+        self.daily = daily
+        self.total = airfare + np.asarray(self.nights, dtype=np.int64) * daily[:, None]
+        self._origin_ix = {o: i for i, o in enumerate(self.origins)}
+        self._dest_ix = {d: i for i, d in enumerate(self.dests)}
+        self._nights_ix = {n: i for i, n in enumerate(self.nights)}
+
+    @classmethod
+    def load(cls, conn) -> "CostMatrix":
+        cat = get_catalog(conn)
+        dests = sorted(d.iata for d in cat)
+        rows = conn.execute(
+            "SELECT origin_iata, dest_iata, trip_nights, floor_usd FROM route_floor"
+        ).fetchall()
+        origins = sorted({r[0] for r in rows})
+        nights = sorted({r[2] for r in rows})
+        o_ix = {o: i for i, o in enumerate(origins)}
+        d_ix = {d: i for i, d in enumerate(dests)}
+        n_ix = {n: i for i, n in enumerate(nights)}
+        shape = (len(origins), len(dests), len(nights))
+        airfare = np.zeros(shape, dtype=np.int64)
+        has_fare = np.zeros(shape, dtype=bool)
+        for origin, dest, n, floor in rows:
+            d = d_ix.get(dest)
+            if d is None:
+                continue
+            airfare[o_ix[origin], d, n_ix[n]] = floor
+            has_fare[o_ix[origin], d, n_ix[n]] = True
+        daily = np.fromiter((cat.get(d).avg_daily_cost_usd for d in dests),
+                            np.int64, len(dests))
+        return cls(origins, dests, nights, airfare, has_fare, daily)
+
+    def _plane(self, nights: int) -> Optional[int]:
+        return self._nights_ix.get(nights)
+
+    def total_cost(self, origin: str, dest: str, nights: int) -> Optional[int]:
+        """pairings.total_cost() from the snapshot."""
+        o, d, n = self._origin_ix.get(origin), self._dest_ix.get(dest), self._plane(nights)
+        if o is None or d is None or n is None or not self.has_fare[o, d, n]:
+            return None
+        return int(self.total[o, d, n])
+
+    def ranked(self, origin: str, nights: int) -> list:
+        """[(dest, airfare, total)] for every priced dest from `origin`, cheapest
+        total first (ties by IATA)."""
+        o, n = self._origin_ix.get(origin), self._plane(nights)
+        if o is None or n is None:
+            return []
+        idx = np.flatnonzero(self.has_fare[o, :, n])
+        idx = idx[np.argsort(self.total[o, idx, n], kind="stable")]
+        return [(self.dests[d], int(self.airfare[o, d, n]), int(self.total[o, d, n]))
+                for d in idx]
+
+    def count_under(self, origin: str, budgets, nights: int) -> list:
+        """How many priced dests from `origin` have total <= each budget."""
+        o, n = self._origin_ix.get(origin), self._plane(nights)
+        if o is None or n is None:
+            return [0] * len(budgets)
+        totals = np.sort(self.total[o, self.has_fare[o, :, n], n])
+        return np.searchsorted(totals, np.asarray(budgets), side="right").tolist()
+
+    def priced_count(self, origin: str, nights: int) -> int:
+        o, n = self._origin_ix.get(origin), self._plane(nights)
+        if o is None or n is None:
+            return 0
+        return int(self.has_fare[o, :, n].sum())
+
+    def airfare_by_origin(self, dest: str, nights: int) -> dict:
+        """origin -> airfare floor to `dest`, for origins with a fare."""
+        d, n = self._dest_ix.get(dest), self._plane(nights)
+        if d is None or n is None:
+            return {}
+        col = self.has_fare[:, d, n]
+        return {self.origins[o]: int(self.airfare[o, d, n]) for o in np.flatnonzero(col)}
+
+    def wins(self, cheap: str, anchor: str, nights: int) -> tuple:
+        """(origins where cheap's total < anchor's, origins pricing both)."""
+        c, a, n = self._dest_ix.get(cheap), self._dest_ix.get(anchor), self._plane(nights)
+        if c is None or a is None or n is None:
+            return 0, 0
+        shared = self.has_fare[:, c, n] & self.has_fare[:, a, n]
+        won = shared & (self.total[:, c, n] < self.total[:, a, n])
+        return int(won.sum()), int(shared.sum())
+
+    def pair_wins(self, nights: int) -> tuple:
+        """wins(), for every ordered (cheap, anchor) pair of dests at once:
+        two (dests, dests) int arrays, [i, j] counting origins where dest i's
+        total beats dest j's, and origins pricing both."""
+        n = self._plane(nights)
+        size = len(self.dests)
+        if n is None:
+            return np.zeros((size, size), np.int64), np.zeros((size, size), np.int64)
+        has = self.has_fare[:, :, n]
+        total = self.total[:, :, n]
+        shared = has[:, :, None] & has[:, None, :]
+        won = shared & (total[:, :, None] < total[:, None, :])
+        return won.sum(axis=0), shared.sum(axis=0)
+
+    def median_airfare(self, nights: int) -> np.ndarray:
+        """Per dest, the median airfare floor across origins with a fare
+        (NaN where no origin has one) — statistics.median's value."""
+        n = self._plane(nights)
+        if n is None:
+            return np.full(len(self.dests), np.nan)
+        air = np.where(self.has_fare[:, :, n], self.airfare[:, :, n], np.nan)
+        priced = self.has_fare[:, :, n].any(axis=0)
+        out = np.full(len(self.dests), np.nan)
+        if priced.any():
+            out[priced] = np.nanmedian(air[:, priced], axis=0)
+        return out
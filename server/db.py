@@ -1,23 +1,15 @@
 """SQLite access layer for DashAway teaser."""
 import json
-import os
 import secrets
 import sqlite3
 from datetime import datetime, timezone
 from typing import Optional
 
-
-VALID_BUDGET_BUCKETS = {"low", "mid", "stretch"}
+from server.catalog import get_catalog
+from server.connections import connection
 
 
-def _connect() -> sqlite3.Connection:
-    db_path = os.environ.get("DATABASE_PATH")
-    if not db_path:
-        raise RuntimeError("DATABASE_PATH not set")
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON;")
-    return conn
+VALID_BUDGET_BUCKETS = {"low", "mid", "stretch"}
 
 
 def _now() -> str:
@@ -29,8 +21,7 @@ def insert_signup(email: str, ip_hash: Optional[str] = None, referrer: Optional[
     """Insert a signup (= a weekly-digest subscription). If the email exists,
     return the existing id; backfill its digest_city / unsub_token if missing so a
     later hub signup can supply the city a homepage signup didn't have."""
-    conn = _connect()
-    try:
+    with connection() as conn:
         existing = conn.execute(
             "SELECT id, digest_city, unsub_token FROM signups WHERE email = ?", (email,)
         ).fetchone()
@@ -57,21 +48,16 @@ def insert_signup(email: str, ip_hash: Optional[str] = None, referrer: Optional[
         if new_id is None:
             raise RuntimeError("INSERT succeeded but lastrowid is None")
         return new_id
-    finally:
-        conn.close()
 
 
 def get_digest_subscribers() -> list:
     """Active subscribers with a known served city, for the weekly digest."""
-    conn = _connect()
-    try:
+    with connection() as conn:
         return conn.execute(
             "SELECT email, digest_city, unsub_token FROM signups "
             "WHERE unsubscribed_at IS NULL AND digest_city IS NOT NULL AND digest_city != '' "
             "ORDER BY digest_city, email"
         ).fetchall()
-    finally:
-        conn.close()
 
 
 def unsubscribe_by_token(token: Optional[str]) -> bool:
@@ -79,8 +65,7 @@ def unsubscribe_by_token(token: Optional[str]) -> bool:
     token is valid (already-unsubscribed counts as success), False if unknown."""
     if not token:
         return False
-    conn = _connect()
-    try:
+    with connection() as conn:
         row = conn.execute(
             "SELECT id, unsubscribed_at FROM signups WHERE unsub_token = ?", (token,)
         ).fetchone()
@@ -90,26 +75,18 @@ def unsubscribe_by_token(token: Optional[str]) -> bool:
             conn.execute("UPDATE signups SET unsubscribed_at = ? WHERE id = ?", (_now(), row["id"]))
             conn.commit()
         return True
-    finally:
-        conn.close()
 
 
 def get_signup_by_email(email: str) -> Optional[sqlite3.Row]:
-    conn = _connect()
-    try:
+    with connection() as conn:
         cur = conn.execute("SELECT * FROM signups WHERE email = ?", (email,))
         return cur.fetchone()
-    finally:
-        conn.close()
 
 
 def get_signup_by_id(signup_id: int) -> Optional[sqlite3.Row]:
-    conn = _connect()
-    try:
+    with connection() as conn:
         cur = conn.execute("SELECT * FROM signups WHERE id = ?", (signup_id,))
         return cur.fetchone()
-    finally:
-        conn.close()
 
 
 def upsert_qualifiers(
@@ -122,8 +99,7 @@ def upsert_qualifiers(
     if budget_bucket is not None and budget_bucket not in VALID_BUDGET_BUCKETS:
         raise ValueError(f"budget_bucket must be one of {VALID_BUDGET_BUCKETS}, got {budget_bucket}")
 
-    conn = _connect()
-    try:
+    with connection() as conn:
         existing = conn.execute(
             "SELECT id FROM qualifiers WHERE signup_id = ?", (signup_id,)
         ).fetchone()
@@ -145,25 +121,17 @@ def upsert_qualifiers(
                 (signup_id, budget_bucket, home_airport, frustration, _now()),
             )
         conn.commit()
-    finally:
-        conn.close()
 
 
 def get_qualifiers_by_signup_id(signup_id: int) -> Optional[sqlite3.Row]:
-    conn = _connect()
-    try:
+    with connection() as conn:
         cur = conn.execute("SELECT * FROM qualifiers WHERE signup_id = ?", (signup_id,))
         return cur.fetchone()
-    finally:
-        conn.close()
 
 
 def count_signups() -> int:
-    conn = _connect()
-    try:
+    with connection() as conn:
         return int(conn.execute("SELECT COUNT(*) FROM signups").fetchone()[0])
-    finally:
-        conn.close()
 
 
 def find_candidates(
@@ -171,68 +139,148 @@ def find_candidates(
     origin_iata: str,
     budget_usd: int,
     trip_nights: int,
+    max_price_usd: Optional[int] = None,
 ) -> list[dict]:
-    """Return destinations with cheapest cached price within budget+15%.
+    """Return destinations with cheapest cached price within budget+15%
+    (or within `max_price_usd` when given — the /go cache's band ceiling).
 
     Each dict contains: iata, city, country, vibes (list), best_months (list),
     avg_daily_cost_usd, safety_tier, novelty_score, base_catch,
     route_catch_text, price_usd, departure_date, return_date,
     cheapest_date_in_best_months.
 
+    Reads the route_best_fares materialization (one range scan on
+    origin/nights/price), which the price_snapshots triggers keep current;
+    the destination fields, and whether the fare's month is a best month,
+    come from the in-process catalog, so they always match the current row.
     Caller owns the transaction; this function does not commit.
     """
-    max_price = int(budget_usd * 1.15)
+    cat = get_catalog(conn)
+    max_price = int(budget_usd * 1.15) if max_price_usd is None else max_price_usd
     rows = conn.execute(
         """
-        WITH cheapest AS (
-            SELECT dest_iata,
-                   MIN(total_price_usd) AS min_price
-            FROM price_snapshots
-            WHERE origin_iata = ?
-              AND trip_nights = ?
-              AND total_price_usd <= ?
-            GROUP BY dest_iata
-        )
-        SELECT d.iata, d.city, d.country, d.vibes, d.best_months,
-               d.avg_daily_cost_usd, d.safety_tier, d.novelty_score, d.base_catch,
-               r.route_catch_text,
-               c.min_price,
-               s.departure_date, s.return_date
-        FROM cheapest c
-        JOIN destinations d ON d.iata = c.dest_iata
-        LEFT JOIN routes r ON r.origin_iata = ? AND r.dest_iata = d.iata
-        JOIN price_snapshots s ON s.origin_iata = ?
-                              AND s.dest_iata = c.dest_iata
-                              AND s.trip_nights = ?
-                              AND s.total_price_usd = c.min_price
-        GROUP BY d.iata
+        SELECT b.dest_iata, r.route_catch_text, b.price_usd,
+               b.departure_date, b.return_date
+        FROM route_best_fares b
+        LEFT JOIN routes r ON r.origin_iata = b.origin_iata AND r.dest_iata = b.dest_iata
+        WHERE b.origin_iata = ? AND b.trip_nights = ? AND b.price_usd <= ?
+        ORDER BY b.dest_iata
         """,
-        (origin_iata, trip_nights, max_price, origin_iata, origin_iata, trip_nights),
+        (origin_iata, trip_nights, max_price),
     ).fetchall()
 
     out: list[dict] = []
-    for row in rows:
-        best_months = json.loads(row[4])
-        dep_month = int(row[11].split("-")[1])
+    for iata, catch_text, price, departure, ret in rows:
+        dest = cat.get(iata)
+        if dest is None:
+            continue
         out.append({
-            "iata": row[0],
-            "city": row[1],
-            "country": row[2],
-            "vibes": json.loads(row[3]),
-            "best_months": best_months,
-            "avg_daily_cost_usd": row[5],
-            "safety_tier": row[6],
-            "novelty_score": row[7],
-            "base_catch": row[8],
-            "route_catch_text": row[9],
-            "price_usd": row[10],
-            "departure_date": row[11],
-            "return_date": row[12],
-            "cheapest_date_in_best_months": dep_month in best_months,
+            "iata": iata,
+            "city": dest.city,
+            "country": dest.country,
+            "vibes": list(dest.vibes_list),
+            "best_months": list(dest.best_months),
+            "avg_daily_cost_usd": dest.avg_daily_cost_usd,
+            "safety_tier": dest.safety_tier,
+            "novelty_score": dest.novelty_score,
+            "base_catch": dest.base_catch,
+            "route_catch_text": catch_text,
+            "price_usd": price,
+            "departure_date": departure,
+            "return_date": ret,
+            "cheapest_date_in_best_months": dest.in_season(int(departure[5:7])),
         })
     return out
 
 
+def rebuild_route_floor(conn: sqlite3.Connection) -> None:
+    """Recompute route_floor from all of price_history (the price_history
+    triggers keep it current between rebuilds). Caller owns the transaction."""
+    conn.execute("DELETE FROM route_floor")
+    conn.execute(
+        """
+        INSERT INTO route_floor
+            (origin_iata, dest_iata, trip_nights, floor_usd, floor_date, last_observed,
+             trailing_since, trailing_7d_min)
+        SELECT f.origin_iata, f.dest_iata, f.trip_nights, f.cheapest_price_usd,
+               f.observed_date, l.last, date(l.last, '-6 days'),
+               (SELECT MIN(h.cheapest_price_usd) FROM price_history h
+                WHERE h.origin_iata = f.origin_iata AND h.dest_iata = f.dest_iata
+                  AND h.trip_nights = f.trip_nights
+                  AND h.observed_date >= date(l.last, '-6 days'))
+        FROM (
+            SELECT *, ROW_NUMBER() OVER (
+                       PARTITION BY origin_iata, dest_iata, trip_nights
+                       ORDER BY cheapest_price_usd, observed_date) AS rn
+            FROM price_history
+        ) f
+        JOIN (
+            SELECT origin_iata, dest_iata, trip_nights, MAX(observed_date) AS last
+            FROM price_history GROUP BY origin_iata, dest_iata, trip_nights
+        ) l USING (origin_iata, dest_iata, trip_nights)
+        WHERE f.rn = 1
+        """
+    )
+
+
+def rebuild_route_baseline(conn: sqlite3.Connection) -> None:
+    """Recompute route_baseline from all of price_history (the price_history
+    triggers keep it current between rebuilds). Caller owns the transaction."""
+    conn.execute("DELETE FROM route_baseline")
+    conn.execute(
+        "INSERT INTO route_baseline (origin_iata, trip_nights, dest_iata, as_of) "
+        "SELECT origin_iata, trip_nights, dest_iata, MAX(observed_date) FROM price_history "
+        "GROUP BY origin_iata, trip_nights, dest_iata"
+    )
+    conn.execute(
+        """
+        UPDATE route_baseline SET
+            obs_days = (SELECT COUNT(DISTINCT observed_date) FROM price_history h
+                        WHERE h.origin_iata = route_baseline.origin_iata
+                          AND h.dest_iata = route_baseline.dest_iata
+                          AND h.trip_nights = route_baseline.trip_nights
+                          AND h.observed_date >= date(route_baseline.as_of, '-45 days')),
+            recent_min = (SELECT MIN(cheapest_price_usd) FROM price_history h
+                          WHERE h.origin_iata = route_baseline.origin_iata
+                            AND h.dest_iata = route_baseline.dest_iata
+                            AND h.trip_nights = route_baseline.trip_nights
+                            AND h.observed_date >= date(route_baseline.as_of, '-6 days')),
+            median_usd = (SELECT AVG(p) FROM (
+                              SELECT cheapest_price_usd AS p,
+                                     ROW_NUMBER() OVER (ORDER BY cheapest_price_usd) AS rn,
+                                     COUNT(*) OVER () AS cnt
+                              FROM price_history h
+                              WHERE h.origin_iata = route_baseline.origin_iata
+                                AND h.dest_iata = route_baseline.dest_iata
+                                AND h.trip_nights = route_baseline.trip_nights
+                                AND h.observed_date >= date(route_baseline.as_of, '-45 days'))
+                          WHERE rn IN ((cnt + 1) / 2, (cnt + 2) / 2))
+        """
+    )
+
+
+def rebuild_best_fares(conn: sqlite3.Connection) -> None:
+    """Recompute route_best_fares from scratch: the cheapest snapshot per route
+    (earliest departure on ties). The triggers keep it current between
+    rebuilds. Caller owns the transaction."""
+    conn.execute("DELETE FROM route_best_fares")
+    conn.execute(
+        """
+        INSERT INTO route_best_fares
+            (origin_iata, dest_iata, trip_nights, price_usd, departure_date, return_date)
+        SELECT origin_iata, dest_iata, trip_nights, total_price_usd,
+               departure_date, return_date
+        FROM (
+            SELECT *, ROW_NUMBER() OVER (
+                       PARTITION BY origin_iata, dest_iata, trip_nights
+                       ORDER BY total_price_usd, departure_date) AS rn
+            FROM price_snapshots
+        )
+        WHERE rn = 1
+        """
+    )
+
+
 def record_search(
     conn: sqlite3.Connection,
     session_id: str,
@@ -242,7 +290,8 @@ def record_search(
     vibe_filter: list[str],
     result_iatas: list[str],
 ) -> None:
-    """Insert a search row. Caller owns the transaction."""
+    """Insert a search row and bump the session's seen counters.
+    Caller owns the transaction."""
     conn.execute(
         """INSERT INTO searches
            (session_id, origin_iata, budget_usd, trip_nights, vibe_filter, result_iatas, created_at)
@@ -254,6 +303,12 @@ def record_search(
             _now(),
         ),
     )
+    conn.executemany(
+        """INSERT INTO session_seen (session_id, dest_iata, seen_count)
+           VALUES (?, ?, 1)
+           ON CONFLICT(session_id, dest_iata) DO UPDATE SET seen_count = seen_count + 1""",
+        [(session_id, iata) for iata in result_iatas],
+    )
 
 
 def count_searches(conn: sqlite3.Connection, session_id: str) -> int:
@@ -266,10 +321,21 @@ def count_searches(conn: sqlite3.Connection, session_id: str) -> int:
 
 def session_seen_counts(conn: sqlite3.Connection, session_id: str) -> dict[str, int]:
     """Return {dest_iata: times_appeared} across this session's prior result lists."""
-    counts: dict[str, int] = {}
-    for (raw,) in conn.execute(
-        "SELECT result_iatas FROM searches WHERE session_id = ?", (session_id,)
-    ):
-        for iata in json.loads(raw):
-            counts[iata] = counts.get(iata, 0) + 1
-    return counts
+    return {
+        iata: n for iata, n in conn.execute(
+            "SELECT dest_iata, seen_count FROM session_seen WHERE session_id = ?",
+            (session_id,),
+        )
+    }
+
+
+def rebuild_session_seen(conn: sqlite3.Connection) -> None:
+    """Recount session_seen from the full searches history. record_search keeps
+    it current; this is the one-time backfill. Caller owns the transaction."""
+    conn.execute("DELETE FROM session_seen")
+    conn.execute(
+        """INSERT INTO session_seen (session_id, dest_iata, seen_count)
+           SELECT s.session_id, j.value, COUNT(*)
+           FROM searches s, json_each(s.result_iatas) j
+           GROUP BY s.session_id, j.value"""
+    )
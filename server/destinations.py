@@ -5,6 +5,8 @@ from pathlib import Path
 
 import yaml
 
+from server import connections
+
 
 def load_all(db_path: str, data_dir: Path) -> None:
     """Upsert airports, destinations, routes from YAML files in data_dir."""
@@ -13,8 +15,7 @@ def load_all(db_path: str, data_dir: Path) -> None:
     destinations = yaml.safe_load((data_dir / "destinations.yaml").read_text())
     routes = yaml.safe_load((data_dir / "routes.yaml").read_text()) or []
 
-    conn = sqlite3.connect(db_path)
-    conn.execute("PRAGMA foreign_keys = ON")
+    conn = connections.connect(db_path)
     try:
         _upsert_airports(conn, airports)
         _upsert_destinations(conn, destinations)
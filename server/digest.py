@@ -19,12 +19,11 @@ import datetime
 import html
 import logging
 import os
-import sqlite3
 import statistics
 import time
 from typing import Optional
 
-from server import hubs, email_client
+from server import connections, hubs, email_client
 from server.hubs import DISPLAY_NAMES
 from server.hub_render import slugify
 
@@ -100,45 +99,62 @@ def _lens_picks(lens_key: str, hub: dict, as_of: datetime.date, n: int = N_FEATU
     return trips[:n]  # cheapest
 
 
+def _route_baseline(conn, origin: str, dest: str, nights: int, window_start: str,
+                    recent_start: str, as_of: str) -> tuple:
+    """(median, distinct observation days, recent min) for one route, straight
+    from price_history — for a route whose route_baseline row isn't as of
+    `as_of` (not scanned that day, or a back-dated digest)."""
+    obs = conn.execute(
+        "SELECT observed_date, cheapest_price_usd FROM price_history "
+        "WHERE origin_iata = ? AND dest_iata = ? AND trip_nights = ? "
+        "AND observed_date >= ? AND observed_date <= ?",
+        (origin, dest, nights, window_start, as_of),
+    ).fetchall()
+    if not obs:
+        return None, 0, None
+    recent = [p for od, p in obs if od >= recent_start]
+    return (statistics.median([p for _, p in obs]), len({od for od, _ in obs}),
+            min(recent) if recent else None)
+
+
 def detect_deals(conn, origin: str, as_of: datetime.date, nights: int = 7) -> list:
     """Routes whose recent fare is meaningfully under their own trailing normal.
 
     Gated: a route needs >= DEAL_MIN_OBS distinct observation days before we'll
     call anything "normal", so this returns [] until the archive is deep enough,
     then turns on route by route. Returns the biggest drops first.
+
+    Reads route_baseline, which the price_history triggers keep as of each
+    route's newest day: when that is `as_of` (a digest after the night's
+    refresh) the baseline is one indexed read for the whole origin. Any other
+    route is recomputed from its own price_history window.
     """
     window_start = (as_of - datetime.timedelta(days=DEAL_WINDOW_DAYS)).isoformat()
     recent_start = (as_of - datetime.timedelta(days=DEAL_RECENT_DAYS - 1)).isoformat()
+    day = as_of.isoformat()
     rows = conn.execute(
-        "SELECT ph.dest_iata, ph.observed_date, ph.cheapest_price_usd, "
+        "SELECT b.dest_iata, b.as_of, b.median_usd, b.obs_days, b.recent_min, "
         "       d.city, d.country, d.avg_daily_cost_usd "
-        "FROM price_history ph JOIN destinations d ON d.iata = ph.dest_iata "
-        "WHERE ph.origin_iata = ? AND ph.trip_nights = ? "
-        "AND ph.observed_date >= ? AND ph.observed_date <= ?",
-        (origin, nights, window_start, as_of.isoformat()),
+        "FROM route_baseline b JOIN destinations d ON d.iata = b.dest_iata "
+        "WHERE b.origin_iata = ? AND b.trip_nights = ? AND b.as_of >= ?",
+        (origin, nights, window_start),
     ).fetchall()
 
-    by_dest: dict = {}
-    for dest, od, price, city, country, daily in rows:
-        d = by_dest.setdefault(dest, {"city": city, "country": country, "daily": daily, "obs": []})
-        d["obs"].append((od, price))
-
     deals = []
-    for dest, info in by_dest.items():
-        obs = info["obs"]
-        if len({od for od, _ in obs}) < DEAL_MIN_OBS:
+    for dest, b_as_of, baseline, obs_days, recent_min, city, country, daily in rows:
+        if b_as_of != day:
+            baseline, obs_days, recent_min = _route_baseline(
+                conn, origin, dest, nights, window_start, recent_start, day)
+        if obs_days < DEAL_MIN_OBS:
             continue
-        baseline = statistics.median([p for _, p in obs])
-        recent = [p for od, p in obs if od >= recent_start]
-        if not recent or baseline <= 0:
+        if recent_min is None or baseline <= 0:
             continue
-        recent_min = min(recent)
         if recent_min <= baseline * (1 - DEAL_MIN_DROP):
-            daily = int(info["daily"])
+            daily = int(daily)
             deals.append({
                 "iata": dest,
-                "city": DISPLAY_NAMES.get(dest) or info["city"],
-                "country": info["country"],
+                "city": DISPLAY_NAMES.get(dest) or city,
+                "country": country,
                 "recent_total_usd": int(recent_min) + nights * daily,
                 "baseline_total_usd": int(baseline) + nights * daily,
                 "pct": round((baseline - recent_min) / baseline * 100),
@@ -149,12 +165,14 @@ def detect_deals(conn, origin: str, as_of: datetime.date, nights: int = 7) -> li
 
 def compose_city_email(conn, city_name: str, as_of: Optional[datetime.date] = None,
                        week_index: Optional[int] = None, unsubscribe_url: str = "#",
-                       base_url: str = BASE_URL) -> Optional[dict]:
+                       base_url: str = BASE_URL,
+                       ctx: Optional[hubs.HubContext] = None) -> Optional[dict]:
     """Render the weekly email for one city. Returns {subject, html, text} or
     None if the city isn't served / has no recent trip data.
 
     `as_of` drives the trailing window, the in-season month, and the lens.
     `week_index` overrides the lens (for previewing different weeks).
+    `ctx` shares hub builds across the cities of one send.
     """
     if as_of is None:
         as_of = datetime.date.today()
@@ -162,10 +180,11 @@ def compose_city_email(conn, city_name: str, as_of: Optional[datetime.date] = No
     if not origin:
         return None
 
+    ctx = ctx or hubs.HubContext(conn)
     window_start = (as_of - datetime.timedelta(days=TRAILING_DAYS - 1)).isoformat()
-    hub = hubs.build_hub(conn, origin, since=window_start)
+    hub = ctx.hub(origin, since=window_start)
     if not hub["trips"]:  # thin window early on -> fall back to all-time
-        hub = hubs.build_hub(conn, origin)
+        hub = ctx.hub(origin)
     if not hub["trips"]:
         return None
 
@@ -336,12 +355,14 @@ def send_digest(conn, as_of: Optional[datetime.date] = None, dry_run: bool = Tru
     ).fetchall()
 
     cache: dict = {}
+    ctx = hubs.HubContext(conn)
     summary = {"subscribers": len(subs), "would_send": 0, "skipped_no_content": 0,
                "by_city": {}, "dry_run": dry_run}
     for email_addr, city, token in subs:
         if city not in cache:
             cache[city] = compose_city_email(
-                conn, city, as_of=as_of, unsubscribe_url=UNSUB_SENTINEL, base_url=base_url)
+                conn, city, as_of=as_of, unsubscribe_url=UNSUB_SENTINEL, base_url=base_url,
+                ctx=ctx)
         composed = cache[city]
         if composed is None:
             summary["skipped_no_content"] += 1
@@ -370,7 +391,7 @@ def main() -> int:
 
     db_path = os.environ.get("DATABASE_PATH", "/var/lib/promptiv/teaser.sqlite")
     as_of = datetime.date.fromisoformat(args.as_of) if args.as_of else datetime.date.today()
-    conn = sqlite3.connect(db_path)
+    conn = connections.connect(db_path)
     try:
         summary = send_digest(conn, as_of=as_of, dry_run=not args.send)
     finally:
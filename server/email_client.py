@@ -130,7 +130,8 @@ def send_pairing_alert(at_risk_list: list, to_email: Optional[str] = None) -> Op
     """Notify the operator that one or more pairing claims need a human look.
 
     The fact monitor calls this after each refresh with the output of
-    pairings.at_risk(). No-op (returns None) when nothing is at risk or no
+    pairings.at_risk(), each entry carrying its `replacements` (from
+    pairings.recommend_replacements) when there are any. No-op (returns None) when nothing is at risk or no
     recipient is configured — the alert is internal, so a missing address just
     means "don't bother me," not an error worth raising.
     """
@@ -149,11 +150,13 @@ def send_pairing_alert(at_risk_list: list, to_email: Optional[str] = None) -> Op
         )
         return None
 
-    lines = [
-        f"  {p['origin']}: {p['cheap_iata']} vs {p['anchor_iata']} "
-        f"— {p['reason']} (margin ${p.get('margin_usd')})"
-        for p in at_risk_list
-    ]
+    lines = []
+    for p in at_risk_list:
+        lines.append(f"  {p['origin']}: {p['cheap_iata']} vs {p['anchor_iata']} "
+                     f"— {p['reason']} (margin ${p.get('margin_usd')})")
+        for r in p.get("replacements") or []:
+            lines.append(f"      try {r['cheap_iata']} vs {r['anchor_iata']}: "
+                         f"margin ${r['margin_usd']}, this week ${r['recent_margin_usd']}")
     body = (
         "These pairing claims broke or got thin against the latest fares. "
         "Re-pair or re-verify:\n\n" + "\n".join(lines) + "\n"
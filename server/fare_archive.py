@@ -0,0 +1,297 @@
+"""Month-partitioned fare archive in attached SQLite files.
+
+fare_observations grows by ~106k rows a day and is never deleted, and it
+shared one file with signups and watches, so backups, VACUUM and page-cache
+pressure all scaled with the archive. Only the hot months (the current one and
+the previous HOT_MONTHS - 1) now stay in the main database. archive_months()
+moves each older month whole into its own file, fares-YYYY-MM.sqlite under
+the archive directory, records it in fare_archive_months, and seals it: the
+file is chmod read-only and only ever ATTACHed read-only after that.
+observed_date is always "today", so a sealed month never receives a write.
+
+Readers go through query(): `{fare_observations}` in the SQL stands for the
+main table plus the archived months that overlap the caller's observed_date
+range, and only those get ATTACHed. SQLite caps attached databases (10 by
+default), so a long range runs in batches of MAX_ATTACHED months, oldest
+first with the main table in the last batch. The rows are concatenated. That
+is exact for queries that are partition-local: row selects, or aggregates
+grouped by observed_date or finer. Every fare_observations reader is one of
+those.
+
+Partitions are run-length encoded. Most departure dates price the same on
+consecutive scan days, yet the live table holds a full row per date per day.
+A sealed month therefore stores:
+
+- fare_scan_days: one row per (route, nights, source, observed_date) that was
+  scanned, carrying the fetch's fetched_at;
+- fare_intervals: one row per run of consecutive scan days on which a
+  departure/return pair kept the same fare (price, stops, carriers), with
+  valid_from and valid_to as observed days. A date that is missing from a scan,
+  or a fare that changes, starts a new interval.
+
+A fare_observations view joins the two back into the live table's exact
+columns, so "price as observed on day X" reads the same as before. Two things
+are not kept. The surrogate id comes back as NULL. fetched_at becomes the
+scan's, not the row's; a route's rows share one fetched_at per scan anyway. The hot months
+stay as daily rows, because today's readers (fetch_cache, nightly_best) want
+them. The move checks that the view reproduces every row before the main
+table gives them up.
+
+The move is crash-safe without cross-file atomicity. The month file is built
+and committed first, and the main-table delete and the manifest row commit
+together after it. A file with no manifest row is a half-finished move; the
+next run rebuilds it.
+"""
+import argparse
+import logging
+import os
+import stat
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from server import connections
+
+log = logging.getLogger(__name__)
+
+HOT_MONTHS = 2
+MAX_ATTACHED = 8          # of SQLite's default 10, leaving room for callers'
+PLACEHOLDER = "{fare_observations}"
+
+
+def _month_start(month: str) -> str:
+    return f"{month}-01"
+
+
+def _next_month(month: str) -> str:
+    y, m = int(month[:4]), int(month[5:7])
+    y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return f"{y:04d}-{m:02d}"
+
+
+def hot_cutoff(today: date, hot_months: int = HOT_MONTHS) -> str:
+    """First month that stays in the main file ('YYYY-MM')."""
+    y, m = today.year, today.month - (hot_months - 1)
+    while m < 1:
+        y, m = y - 1, m + 12
+    return f"{y:04d}-{m:02d}"
+
+
+def archive_dir(conn) -> Path:
+    """$FARE_ARCHIVE_DIR, else fare-archive/ beside the main database."""
+    env = os.environ.get("FARE_ARCHIVE_DIR")
+    if env:
+        return Path(env)
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == "main" and path:
+            return Path(path).parent / "fare-archive"
+    raise RuntimeError("in-memory database has no archive directory; set FARE_ARCHIVE_DIR")
+
+
+def _alias(month: str) -> str:
+    return "fa_" + month.replace("-", "_")
+
+
+def _partition_ddl(conn, alias: str) -> list:
+    """Interval tables plus a fare_observations view with the live table's
+    columns in the live order (read from main, so the two can't drift)."""
+    cols = []
+    for _, name, *_ in conn.execute("PRAGMA main.table_info(fare_observations)"):
+        cols.append("NULL AS id" if name == "id"
+                    else f"d.{name}" if name in ("observed_date", "fetched_at")
+                    else f"i.{name}")
+    return [
+        f"""CREATE TABLE IF NOT EXISTS {alias}.fare_scan_days (
+            origin_iata TEXT NOT NULL, dest_iata TEXT NOT NULL,
+            trip_nights INTEGER NOT NULL, source TEXT NOT NULL,
+            observed_date TEXT NOT NULL, fetched_at TEXT NOT NULL,
+            PRIMARY KEY (origin_iata, dest_iata, trip_nights, source, observed_date)
+        ) WITHOUT ROWID""",
+        f"""CREATE TABLE IF NOT EXISTS {alias}.fare_intervals (
+            origin_iata TEXT NOT NULL, dest_iata TEXT NOT NULL,
+            trip_nights INTEGER NOT NULL, source TEXT NOT NULL,
+            departure_date TEXT NOT NULL, return_date TEXT,
+            total_price_usd INTEGER, stops INTEGER, carrier_codes TEXT,
+            valid_from TEXT NOT NULL, valid_to TEXT NOT NULL
+        )""",
+        f"CREATE INDEX IF NOT EXISTS {alias}.idx_fare_intervals_route ON fare_intervals"
+        "(origin_iata, dest_iata, trip_nights, source, valid_from)",
+        f"""CREATE VIEW IF NOT EXISTS {alias}.fare_observations AS
+            SELECT {", ".join(cols)}
+            FROM fare_intervals i
+            JOIN fare_scan_days d
+              ON d.origin_iata = i.origin_iata AND d.dest_iata = i.dest_iata
+             AND d.trip_nights = i.trip_nights AND d.source = i.source
+             AND d.observed_date BETWEEN i.valid_from AND i.valid_to""",
+    ]
+
+
+# Gaps and islands: number each route's scan days, then a fare's rows on
+# consecutive scan days at one value share (day_no - row_number) and collapse
+# into one interval.
+_ENCODE_SQL = """
+WITH days AS (
+    SELECT origin_iata, dest_iata, trip_nights, source, observed_date,
+           ROW_NUMBER() OVER (PARTITION BY origin_iata, dest_iata, trip_nights, source
+                              ORDER BY observed_date) AS day_no
+    FROM {alias}.fare_scan_days
+), obs AS (
+    SELECT o.origin_iata, o.dest_iata, o.trip_nights, o.source, o.departure_date,
+           o.return_date, o.total_price_usd, o.stops, o.carrier_codes, o.observed_date,
+           d.day_no - ROW_NUMBER() OVER (
+               PARTITION BY o.origin_iata, o.dest_iata, o.trip_nights, o.source,
+                            o.departure_date, o.return_date, o.total_price_usd,
+                            o.stops, o.carrier_codes
+               ORDER BY o.observed_date) AS island
+    FROM main.fare_observations o
+    JOIN days d ON d.origin_iata = o.origin_iata AND d.dest_iata = o.dest_iata
+               AND d.trip_nights = o.trip_nights AND d.source = o.source
+               AND d.observed_date = o.observed_date
+    WHERE o.observed_date >= ? AND o.observed_date < ?
+)
+INSERT INTO {alias}.fare_intervals
+    (origin_iata, dest_iata, trip_nights, source, departure_date, return_date,
+     total_price_usd, stops, carrier_codes, valid_from, valid_to)
+SELECT origin_iata, dest_iata, trip_nights, source, departure_date, return_date,
+       total_price_usd, stops, carrier_codes, MIN(observed_date), MAX(observed_date)
+FROM obs
+GROUP BY origin_iata, dest_iata, trip_nights, source, departure_date, return_date,
+         total_price_usd, stops, carrier_codes, island
+"""
+
+
+def archive_months(conn, today: Optional[date] = None, hot_months: int = HOT_MONTHS,
+                   directory: Optional[Path] = None) -> dict:
+    """Move every month older than the hot window out of the main file into its
+    own sealed, run-length encoded partition. Idempotent; returns {months,
+    rows, intervals}."""
+    today = today or datetime.now(timezone.utc).date()
+    cutoff = _month_start(hot_cutoff(today, hot_months))
+    directory = Path(directory) if directory else archive_dir(conn)
+    sealed = {m for (m,) in conn.execute("SELECT month FROM fare_archive_months")}
+    months = [m for (m,) in conn.execute(
+        "SELECT DISTINCT substr(observed_date, 1, 7) FROM fare_observations "
+        "WHERE observed_date < ? ORDER BY 1", (cutoff,))]
+    summary = {"months": [], "rows": 0, "intervals": 0}
+    for month in months:
+        if month in sealed:
+            log.warning("fare archive: %s is sealed but the main file has rows for it; "
+                        "left in place", month)
+            continue
+        rows, intervals = _move_month(conn, month, directory)
+        summary["months"].append(month)
+        summary["rows"] += rows
+        summary["intervals"] += intervals
+        log.info("fare archive: sealed %s (%d rows as %d intervals)", month, rows, intervals)
+    return summary
+
+
+def _move_month(conn, month: str, directory: Path) -> tuple:
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"fares-{month}.sqlite"
+    if path.exists():                    # a move that died before its manifest row
+        path.chmod(stat.S_IRUSR | stat.S_IWUSR)
+        path.unlink()
+    lo, hi = _month_start(month), _month_start(_next_month(month))
+    alias = _alias(month)
+    conn.commit()
+    conn.execute("ATTACH DATABASE ? AS " + alias, (str(path),))
+    try:
+        conn.execute(f"PRAGMA {alias}.journal_mode = DELETE")
+        for ddl in _partition_ddl(conn, alias):
+            conn.execute(ddl)
+        conn.execute(
+            f"INSERT INTO {alias}.fare_scan_days SELECT origin_iata, dest_iata, trip_nights, "
+            "source, observed_date, MAX(fetched_at) FROM main.fare_observations "
+            "WHERE observed_date >= ? AND observed_date < ? GROUP BY 1, 2, 3, 4, 5", (lo, hi))
+        conn.execute(_ENCODE_SQL.format(alias=alias), (lo, hi))
+        rows = conn.execute("SELECT COUNT(*) FROM main.fare_observations "
+                            "WHERE observed_date >= ? AND observed_date < ?",
+                            (lo, hi)).fetchone()[0]
+        decoded = conn.execute(f"SELECT COUNT(*) FROM {alias}.fare_observations").fetchone()[0]
+        if decoded != rows:
+            conn.rollback()
+            raise RuntimeError(f"fare archive: {month} decodes to {decoded} rows, "
+                               f"expected {rows}; month left in the main file")
+        intervals = conn.execute(f"SELECT COUNT(*) FROM {alias}.fare_intervals").fetchone()[0]
+        conn.commit()
+    finally:
+        conn.execute("DETACH DATABASE " + alias)
+    path.chmod(stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+    conn.execute("DELETE FROM fare_observations WHERE observed_date >= ? AND observed_date < ?",
+                 (lo, hi))
+    conn.execute("INSERT INTO fare_archive_months (month, path, rows, intervals, archived_at, "
+                 "sealed) VALUES (?, ?, ?, ?, ?, 1)",
+                 (month, str(path.resolve()), rows, intervals,
+                  datetime.now(timezone.utc).isoformat()))
+    conn.commit()
+    return rows, intervals
+
+
+def partitions(conn, since: Optional[str] = None, until: Optional[str] = None) -> list:
+    """[(month, path)] of archived months overlapping [since, until] (ISO
+    dates, inclusive, None = open), oldest first."""
+    sql = "SELECT month, path FROM fare_archive_months WHERE 1"
+    params = []
+    if since:
+        sql += " AND month >= ?"
+        params.append(since[:7])
+    if until:
+        sql += " AND month <= ?"
+        params.append(until[:7])
+    return [(m, p) for m, p in conn.execute(sql + " ORDER BY month", params)]
+
+
+def query(conn, sql: str, params=(), since: Optional[str] = None,
+          until: Optional[str] = None) -> list:
+    """Rows of `sql` over the whole archive for observed dates in [since,
+    until]. `{fare_observations}` in `sql` names the table; with nothing
+    archived in range it is plain main.fare_observations, so the query runs
+    exactly as before. Must not be called inside an open transaction when a
+    partition is needed (SQLite can't ATTACH there)."""
+    parts = partitions(conn, since, until)
+    if not parts:
+        return conn.execute(sql.replace(PLACEHOLDER, "fare_observations"), params).fetchall()
+    out = []
+    batches = [parts[i:i + MAX_ATTACHED] for i in range(0, len(parts), MAX_ATTACHED)]
+    for i, batch in enumerate(batches):
+        attached = []
+        try:
+            for month, path in batch:
+                alias = _alias(month)
+                conn.execute(f"ATTACH DATABASE ? AS {alias}", (f"file:{path}?mode=ro",))
+                attached.append(alias)
+            sources = [f"SELECT * FROM {a}.fare_observations" for a in attached]
+            if i == len(batches) - 1:
+                sources.append("SELECT * FROM main.fare_observations")
+            table = "(" + " UNION ALL ".join(sources) + ")"
+            out.extend(conn.execute(sql.replace(PLACEHOLDER, table), params).fetchall())
+        finally:
+            for alias in attached:
+                conn.execute("DETACH DATABASE " + alias)
+    return out
+
+
+def main(argv: Optional[list] = None) -> int:
+    ap = argparse.ArgumentParser(description="Seal old fare_observations months into "
+                                             "per-month archive files.")
+    ap.add_argument("--hot-months", type=int, default=HOT_MONTHS)
+    ap.add_argument("--dir", help="archive directory (default $FARE_ARCHIVE_DIR or "
+                                  "fare-archive/ beside the database)")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    db_path = os.environ.get("DATABASE_PATH", "/var/lib/promptiv/teaser.sqlite")
+    conn = connections.connect(db_path)
+    try:
+        summary = archive_months(conn, hot_months=args.hot_months,
+                                 directory=Path(args.dir) if args.dir else None)
+    finally:
+        conn.close()
+    print(f"archived {len(summary['months'])} month(s), {summary['rows']} rows as "
+          f"{summary['intervals']} intervals: "
+          f"{', '.join(summary['months']) or '-'}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,229 @@
+"""Batched writer for the nightly refresh's three fare tables.
+
+One scanned route lands in three places: price_snapshots (diffed, serves
+/go), price_history (one cheapest row per route per day) and fare_observations
+(the full surface, ~106k rows a day). Writing that per route on a fresh
+connection with one INSERT per row meant a connect/commit/fsync per route and a
+Python->SQLite round trip per row. FareWriter keeps ONE connection open for the
+whole run, writes each table with executemany over constant SQL (so sqlite3's
+statement cache keeps them prepared), and commits every `batch_routes` routes.
+
+Routes wait in memory until the batch is full and then land in one short
+BEGIN IMMEDIATE ... COMMIT, so SQLite's write lock is only held while rows are
+actually being written — never while the workers are off fetching from Google.
+/api/go's record_search, signups and watch writes only ever wait out a flush.
+
+Snapshots are diffed, not rewritten: most of a route's fares don't move night
+to night, so the writer reads the route's current rows, upserts only the dates
+whose fare changed (keyed by the route and departure_date), and deletes the
+dates that vanished. Unchanged rows keep their id and fetched_at (the fare has
+stood since then), and the snapshot indexes and the route_best_fares
+triggers only see real changes. stats() reports changed/unchanged/deleted.
+
+Thread-safe: the scan engine's workers share one writer; writes serialize on a
+lock, which is also what SQLite would do anyway.
+
+Durability trade: a crash loses at most the last `batch_routes - 1` routes'
+writes (still in memory), which the next run re-scans. With a `run_id`, each route's ledger row
+(refresh_run_routes) rides in the same batch, so `--resume` only skips routes
+whose fares actually committed.
+
+A flush that fails (the write lock never came, a full disk) rolls back and
+puts the whole batch back, other workers' routes included, and the stats
+with it; the next full batch retries. write_route/mark_route only log that,
+since the routes are still queued, not lost; flush() and close() raise, so a
+run that can't get its tail onto disk fails instead of reporting it written.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from server import connections, fetch_cache
+
+log = logging.getLogger(__name__)
+
+BATCH_ROUTES = 25
+
+_ROUTE_SNAPSHOTS = """SELECT departure_date, return_date, total_price_usd, stops, carrier_codes
+   FROM price_snapshots WHERE origin_iata=? AND dest_iata=? AND trip_nights=?"""
+_UPSERT_SNAPSHOT = """INSERT INTO price_snapshots
+   (origin_iata, dest_iata, departure_date, return_date,
+    trip_nights, total_price_usd, stops, carrier_codes,
+    source, fetched_at)
+   VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'fli', ?)
+   ON CONFLICT(origin_iata, dest_iata, trip_nights, departure_date) DO UPDATE SET
+    return_date = excluded.return_date,
+    total_price_usd = excluded.total_price_usd,
+    stops = excluded.stops,
+    carrier_codes = excluded.carrier_codes,
+    source = excluded.source,
+    fetched_at = excluded.fetched_at"""
+_DELETE_SNAPSHOT = """DELETE FROM price_snapshots
+   WHERE origin_iata=? AND dest_iata=? AND trip_nights=? AND departure_date=?"""
+_UPSERT_HISTORY = """INSERT OR REPLACE INTO price_history
+   (origin_iata, dest_iata, trip_nights, cheapest_price_usd, observed_date, source)
+   VALUES (?, ?, ?, ?, date('now'), 'fli')"""
+_UPSERT_OBSERVATION = """INSERT OR REPLACE INTO fare_observations
+   (origin_iata, dest_iata, departure_date, return_date,
+    trip_nights, total_price_usd, stops, carrier_codes,
+    source, observed_date, fetched_at)
+   VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'fli', date('now'), ?)"""
+_UPSERT_LEDGER = """INSERT OR REPLACE INTO refresh_run_routes
+   (run_id, origin_iata, dest_iata, trip_nights, status, rows, finished_at)
+   VALUES (?, ?, ?, ?, ?, ?, ?)"""
+
+
+class FareWriter:
+    """Persistent, batching writer. Use as a context manager or call close()."""
+
+    def __init__(self, db_path: str, batch_routes: int = BATCH_ROUTES,
+                 run_id: Optional[int] = None):
+        self.batch_routes = max(1, int(batch_routes))
+        self.run_id = run_id
+        self._conn = connections.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._batch: list = []           # routes waiting for the next flush
+        self.routes = 0
+        self.rows = 0
+        self.commits = 0
+        self.write_seconds = 0.0
+        self.snapshots_changed = 0
+        self.snapshots_unchanged = 0
+        self.snapshots_deleted = 0
+
+    def write_route(self, origin: str, dest: str, nights: int, results: list,
+                    fetched_at: str, window: Optional[tuple] = None) -> int:
+        """Queue the route: on flush its snapshots are synced to `results`
+        (upsert changed dates, delete vanished ones) and its history +
+        observations appended.
+        `results` must already be plausibility-filtered and non-empty. With the
+        fetch's (start, end) `window`, also logs it in fetch_log so later jobs
+        can reuse it. Returns the number of snapshot rows written."""
+        rows = [
+            (r.origin_iata, r.dest_iata, r.departure_date, r.return_date,
+             r.trip_nights, r.total_price_usd, r.stops,
+             json.dumps(r.carrier_codes) if r.carrier_codes else None,
+             fetched_at)
+            for r in results
+        ]
+        cheapest = min(r.total_price_usd for r in results)
+        observed = datetime.now(timezone.utc).date().isoformat()
+        with self._lock:
+            self._batch.append(("write", origin, dest, nights, rows, cheapest,
+                                fetched_at, window, observed))
+            self._commit_if_full()
+        return len(rows)
+
+    def mark_route(self, origin: str, dest: str, nights: int, status: str,
+                   finished_at: str) -> None:
+        """Ledger a route that wrote no fares ('empty' or 'failed'). Rides in
+        the current batch like a write. No-op without a run_id."""
+        if self.run_id is None:
+            return
+        with self._lock:
+            self._batch.append(("mark", origin, dest, nights, status, finished_at))
+            self._commit_if_full()
+
+    def _commit_if_full(self) -> None:
+        """Flush a full batch; on a database error keep it queued for the
+        next try (see the module docstring). Caller holds the lock."""
+        if len(self._batch) < self.batch_routes:
+            return
+        try:
+            self._commit()
+        except sqlite3.Error as e:
+            log.warning("flush of %d routes failed, keeping them queued: %s",
+                        len(self._batch), e)
+
+    def _write(self, c, origin, dest, nights, rows, cheapest, fetched_at, window,
+               observed) -> None:
+        current = {row[0]: row[1:] for row in c.execute(_ROUTE_SNAPSHOTS,
+                                                        (origin, dest, nights))}
+        # Compare what's stored: (return_date, price, stops, carrier_codes).
+        changed = [row for row in rows if current.get(row[2]) != row[3:4] + row[5:8]]
+        seen = {row[2] for row in rows}
+        vanished = [(origin, dest, nights, d) for d in current if d not in seen]
+        c.executemany(_UPSERT_SNAPSHOT, changed)
+        c.executemany(_DELETE_SNAPSHOT, vanished)
+        self.snapshots_changed += len(changed)
+        self.snapshots_unchanged += len(rows) - len(changed)
+        self.snapshots_deleted += len(vanished)
+        # price_snapshots is ephemeral ("what's cheap to book now");
+        # price_history accumulates the route's cheapest price per scan day
+        # (what baselines read); fare_observations keeps the FULL surface.
+        # Both archives are append-only and never deleted: INSERT OR
+        # REPLACE on their UNIQUE keys makes a same-day re-run overwrite
+        # rather than duplicate.
+        c.execute(_UPSERT_HISTORY, (origin, dest, nights, cheapest))
+        c.executemany(_UPSERT_OBSERVATION, rows)
+        if window is not None:
+            fetch_cache.record(c, origin, dest, nights, window[0], window[1],
+                               observed, "fli", fetched_at, len(rows))
+        if self.run_id is not None:
+            c.execute(_UPSERT_LEDGER, (self.run_id, origin, dest, nights, "ok",
+                                       len(rows), fetched_at))
+        self.routes += 1
+        self.rows += len(changed) + len(vanished) + len(rows) + 1
+
+    def _commit(self) -> None:
+        """Write the queued batch in one transaction. On failure the batch and
+        the stats are put back as they were. Caller holds the lock."""
+        batch, self._batch = self._batch, []
+        counters = (self.routes, self.rows, self.snapshots_changed,
+                    self.snapshots_unchanged, self.snapshots_deleted)
+        t0 = time.perf_counter()
+        c = self._conn
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            for op in batch:
+                if op[0] == "write":
+                    self._write(c, *op[1:])
+                else:
+                    _, origin, dest, nights, status, finished_at = op
+                    c.execute(_UPSERT_LEDGER, (self.run_id, origin, dest, nights,
+                                               status, 0, finished_at))
+            c.commit()
+        except BaseException:
+            c.rollback()
+            self._batch[:0] = batch
+            (self.routes, self.rows, self.snapshots_changed,
+             self.snapshots_unchanged, self.snapshots_deleted) = counters
+            raise
+        self.commits += 1
+        self.write_seconds += time.perf_counter() - t0
+
+    def flush(self) -> None:
+        """Write any routes still waiting in the batch."""
+        with self._lock:
+            if self._batch:
+                self._commit()
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        secs = self.write_seconds
+        return {
+            "routes_written": self.routes,
+            "rows_written": self.rows,
+            "commits": self.commits,
+            "snapshots_changed": self.snapshots_changed,
+            "snapshots_unchanged": self.snapshots_unchanged,
+            "snapshots_deleted": self.snapshots_deleted,
+            "write_seconds": round(secs, 3),
+            "rows_per_sec": round(self.rows / secs) if secs > 0 else None,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,85 @@
+"""Shared fare-fetch cache for the refresh and watch jobs.
+
+The 07:00 price_refresh pulls every route's 90-day SearchDates surface into
+fare_observations; the watch runner then asked Google again for watched routes
+whose windows sat inside that same surface. fetch_log records every non-empty
+fetch — (origin, dest, nights, window, observed day, source) — and both jobs
+look there first: a request whose window is fully inside a fetch made today
+for the same route and trip length is answered from that fetch's
+fare_observations rows instead of a new Google request.
+
+Empty fetches are never logged (an empty grid may be a soft-block), so they
+never satisfy a later request. The refresh writes its fetch_log rows through
+FareWriter, in the same transaction as the observations they point at.
+"""
+import json
+import threading
+from datetime import date
+from typing import Optional
+
+from server.fli_client import FliResult
+
+_RECORD = """INSERT OR REPLACE INTO fetch_log
+   (origin_iata, dest_iata, trip_nights, window_start, window_end,
+    observed_date, source, fetched_at, results)
+   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+class Stats:
+    """Thread-safe hit/miss counter for one run's summary."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def summary(self) -> dict:
+        total = self.hits + self.misses
+        return {"cache_hits": self.hits, "cache_misses": self.misses,
+                "cache_hit_rate": round(self.hits / total, 3) if total else None}
+
+
+def record(conn, origin: str, dest: str, nights: int, start: date, end: date,
+           observed_date: str, source: str, fetched_at: str, results: int) -> None:
+    """Log a non-empty fetch. Caller owns the transaction."""
+    if results <= 0:
+        return
+    conn.execute(_RECORD, (origin, dest, nights, start.isoformat(), end.isoformat(),
+                           observed_date, source, fetched_at, results))
+
+
+def lookup(conn, origin: str, dest: str, nights: int, start: date, end: date,
+           observed_date: str) -> Optional[list]:
+    """FliResults for departures in [start, end] from a fetch made on
+    `observed_date` whose window covers it, or None when no fetch does."""
+    row = conn.execute(
+        "SELECT source FROM fetch_log "
+        "WHERE origin_iata = ? AND dest_iata = ? AND trip_nights = ? AND observed_date = ? "
+        "  AND window_start <= ? AND window_end >= ? "
+        "ORDER BY fetched_at DESC LIMIT 1",
+        (origin, dest, nights, observed_date, start.isoformat(), end.isoformat()),
+    ).fetchone()
+    if row is None:
+        return None
+    rows = conn.execute(
+        "SELECT departure_date, return_date, total_price_usd, stops, carrier_codes "
+        "FROM fare_observations "
+        "WHERE origin_iata = ? AND dest_iata = ? AND trip_nights = ? "
+        "  AND observed_date = ? AND source = ? "
+        "  AND departure_date >= ? AND departure_date <= ? "
+        "  AND total_price_usd IS NOT NULL "
+        "ORDER BY total_price_usd",
+        (origin, dest, nights, observed_date, row[0], start.isoformat(), end.isoformat()),
+    ).fetchall()
+    return [FliResult(origin_iata=origin, dest_iata=dest, departure_date=dep,
+                      return_date=ret, trip_nights=nights, total_price_usd=price,
+                      stops=stops, carrier_codes=json.loads(carriers) if carriers else None)
+            for dep, ret, price, stops, carriers in rows]
@@ -3,11 +3,18 @@
 Real mode talks to Google via reverse-engineered API. Mock mode returns
 synthetic data for tests. If fli's API changes, _real_search is the only
 place to update. See scripts/spike_fli.py for the discovered API shape.
+
+AsyncFliClient is the asyncio face of the same client: one event loop keeps
+many searches in flight (search_many, capped by a semaphore) while the
+blocking fli calls run on a thread pool. Its mock sleeps a seeded, simulated
+Google latency so concurrency actually shows up in tests and benchmarks.
 """
+import asyncio
 import random
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import date, timedelta
-from typing import Optional
+from typing import Iterable, Optional
 
 
 @dataclass(frozen=True)
@@ -121,3 +128,98 @@ class FliClient:
             ))
         out.sort(key=lambda r: r.total_price_usd)
         return out
+
+
+# Searches in flight at once in AsyncFliClient.search_many. Throughput past the
+# rate limit is still the limiter's call; this only bounds open sockets/threads.
+ASYNC_CONCURRENCY = 8
+# Simulated Google latency for the async mock: uniform between these seconds.
+MOCK_LATENCY_S = (0.3, 1.5)
+
+
+class AsyncFliClient:
+    """asyncio wrapper around FliClient.
+
+    Real mode runs each blocking search on a private thread pool sized to
+    `concurrency`. Mock mode awaits a simulated latency (seeded by `seed`, so
+    runs are reproducible) and then returns FliClient's mock surface — the same
+    results the sync client gives for the same query.
+
+    `limiter` is anything with the TokenBucket interface (scan_engine or
+    request_budget); acquire() blocks, so it is taken on the pool too.
+    `is_rate_limit` classifies errors that should slow it down.
+    """
+
+    def __init__(self, mock: bool = False, concurrency: int = ASYNC_CONCURRENCY,
+                 latency_s: tuple = MOCK_LATENCY_S, seed: int = 0,
+                 limiter=None, is_rate_limit=None, client: Optional[FliClient] = None):
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+        self.mock = mock
+        self.concurrency = concurrency
+        self.latency_s = latency_s
+        self.limiter = limiter
+        self._is_rate_limit = is_rate_limit or (lambda e: False)
+        self._client = client or FliClient(mock=mock)
+        self._rng = random.Random(seed)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency,
+                                            thread_name_prefix="fli-async")
+
+    async def search_dates(
+        self,
+        origin: str,
+        destination: str,
+        start_date: date,
+        end_date: date,
+        trip_nights: int,
+    ) -> list[FliResult]:
+        loop = asyncio.get_running_loop()
+        if self.limiter is not None:
+            await loop.run_in_executor(self._executor, self.limiter.acquire)
+        try:
+            if self.mock:
+                lo, hi = self.latency_s
+                await asyncio.sleep(self._rng.uniform(lo, hi))
+                out = self._client.search_dates(origin, destination, start_date,
+                                                end_date, trip_nights)
+            else:
+                out = await loop.run_in_executor(
+                    self._executor, self._client.search_dates,
+                    origin, destination, start_date, end_date, trip_nights)
+        except Exception as e:
+            if self.limiter is not None and self._is_rate_limit(e):
+                self.limiter.slow_down()
+            raise
+        if self.limiter is not None:
+            self.limiter.recover()
+        return out
+
+    async def search_many(self, queries: Iterable[tuple],
+                          concurrency: Optional[int] = None) -> list:
+        """Run search_dates for every (origin, destination, start_date,
+        end_date, trip_nights) query, at most `concurrency` at a time.
+
+        Returns [(query, results, error)] in query order, like
+        scan_engine.run_scan: one failed route never cancels the others.
+        """
+        queries = list(queries)
+        gate = asyncio.Semaphore(min(concurrency or self.concurrency, self.concurrency))
+
+        async def _one(query):
+            async with gate:
+                try:
+                    return query, await self.search_dates(*query), None
+                except Exception as e:  # noqa: BLE001 — reported per query
+                    return query, None, e
+
+        return list(await asyncio.gather(*(_one(q) for q in queries)))
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,163 @@
+"""In-process cache of /api/go candidate pools.
+
+A /go answer depends on the origin's current best fares, the catalog, the
+query, and the session's seen counts. Only the last is personal, and it only
+scales each score by a novelty factor — so the expensive, shared part (the
+candidate query plus building ranking columns) is cached and the session is
+applied per request as a cheap NumPy re-rank over the cached pool.
+
+Key: (origin, budget band, nights, vibes). A band covers every budget whose
++15% ceiling falls in the same BAND_USD bucket; the cached pool holds all
+candidates up to the band's ceiling (vibe-filtered when the query has vibes),
+and each request masks it down to its exact ceiling before ranking. Pool order
+and tie-breaks match the uncached path, so results are identical.
+
+Invalidation: triggers on route_best_fares and routes bump a per-origin
+version (best_fare_versions) whenever a refresh lands new fares for that
+origin or its route text changes, and catalog_meta.version covers any
+destinations change (find_candidates reads the card fields from the catalog,
+so a rebuilt pool always carries the edited values). A cached pool remembers the
+versions it was built at; once it is REVALIDATE_S old it re-reads them (one
+primary-key lookup) and is dropped if either moved. Entries also expire after
+TTL_S and the cache is LRU-bounded at MAX_ENTRIES.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from server import db
+from server import ranking as rankmod
+
+BAND_USD = 250
+TTL_S = 15 * 60
+REVALIDATE_S = 5.0
+MAX_ENTRIES = 512
+
+
+@dataclass
+class Pool:
+    """One cached candidate pool: the rows (find_candidates dicts, dest order)
+    and their ranking columns."""
+    rows: list
+    cols: rankmod.CandidateColumns
+    versions: tuple
+    created_at: float
+    checked_at: float
+
+
+def band_ceiling(budget_usd: int) -> int:
+    """The price ceiling of the band `budget_usd` falls in."""
+    max_price = int(budget_usd * 1.15)
+    return max(1, math.ceil(max_price / BAND_USD)) * BAND_USD
+
+
+def _vibes_key(vibes) -> Optional[tuple]:
+    try:
+        return tuple(sorted(set(vibes)))
+    except TypeError:           # unhashable / unorderable junk: don't cache
+        return None
+
+
+def versions(conn, origin_iata: str) -> tuple:
+    row = conn.execute(
+        "SELECT (SELECT version FROM best_fare_versions WHERE origin_iata = ?), "
+        "       (SELECT version FROM catalog_meta WHERE id = 1)",
+        (origin_iata,),
+    ).fetchone()
+    return (row[0] or 0, row[1] or 0)
+
+
+class GoCache:
+    """Thread-safe TTL/LRU map of candidate pools. One per app (per DB).
+    The hit/miss counters are only touched under the lock, like the map."""
+
+    def __init__(self, ttl_s: float = TTL_S, revalidate_s: float = REVALIDATE_S,
+                 max_entries: int = MAX_ENTRIES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl_s = ttl_s
+        self.revalidate_s = revalidate_s
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _build(self, conn, origin_iata, budget_usd, trip_nights, vibes, now) -> Pool:
+        ver = versions(conn, origin_iata)
+        rows = db.find_candidates(conn, origin_iata, budget_usd, trip_nights,
+                                  max_price_usd=band_ceiling(budget_usd))
+        if vibes:
+            wanted = set(vibes)
+            rows = [r for r in rows if wanted & set(r["vibes"])]
+        cols = rankmod.CandidateColumns.from_candidates([
+            rankmod.Candidate(
+                iata=r["iata"],
+                price_usd=r["price_usd"],
+                vibes=r["vibes"],
+                novelty_score=r["novelty_score"],
+                cheapest_date_in_best_months=r["cheapest_date_in_best_months"],
+            ) for r in rows
+        ])
+        return Pool(rows=rows, cols=cols, versions=ver, created_at=now, checked_at=now)
+
+    def pool(self, conn, origin_iata: str, budget_usd: int, trip_nights: int,
+             vibes: list) -> Pool:
+        """The cached pool for this query, building (and caching) it on a miss."""
+        vkey = _vibes_key(vibes)
+        now = self._clock()
+        if vkey is None:
+            with self._lock:
+                self.misses += 1
+            return self._build(conn, origin_iata, budget_usd, trip_nights, vibes, now)
+        key = (origin_iata, band_ceiling(budget_usd), trip_nights, vkey)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry.created_at >= self.ttl_s:
+                    del self._entries[key]
+                    entry = None
+                else:
+                    self._entries.move_to_end(key)
+        if entry is not None and now - entry.checked_at >= self.revalidate_s:
+            if versions(conn, origin_iata) == entry.versions:
+                entry.checked_at = now
+            else:
+                with self._lock:
+                    self._entries.pop(key, None)
+                entry = None
+        if entry is not None:
+            with self._lock:
+                self.hits += 1
+            return entry
+        entry = self._build(conn, origin_iata, budget_usd, trip_nights, vibes, now)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def rank(self, conn, query: rankmod.UserQuery, session: rankmod.SessionState,
+             k: int) -> list[dict]:
+        """The top-k candidate rows for `query`, personalised by `session` —
+        the same rows, in the same order, as find_candidates + ranking.rank."""
+        pool = self.pool(conn, query.origin_iata, query.budget_usd,
+                         query.trip_nights, query.vibes)
+        keep = pool.cols.prices <= int(query.budget_usd * 1.15)
+        ranked = rankmod.rank_columns(pool.cols, query, session, k,
+                                      require_vibe_overlap=True, keep=keep)
+        return [pool.rows[i] for i, _score in ranked]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits,
+                    "misses": self.misses}
@@ -11,11 +11,11 @@ That on-ground term is the insight the whole product rests on — the place that
 cheaper to FLY to is often dearer to BE in, and the all-in number reorders the
 list (Sofia beats Las Vegas from Nashville; Tbilisi ties San Diego).
 """
-import json
 import logging
 from typing import Optional
 
-from server import pairings
+from server import catalog, pairings
+from server.cost_matrix import CostMatrix
 
 log = logging.getLogger(__name__)
 
@@ -36,7 +36,8 @@ NEARBY_REGIONS = {"North America", "Latin America", "Caribbean"}
 
 
 def build_hub(conn, origin: str, nights: int = pairings.DEFAULT_NIGHTS,
-              display_names: dict = DISPLAY_NAMES, since: Optional[str] = None) -> dict:
+              display_names: dict = DISPLAY_NAMES, since: Optional[str] = None,
+              matrix: Optional[CostMatrix] = None) -> dict:
     """Assemble the full hub content for one origin.
 
     Returns {origin, origin_city, hero, trips}. `trips` is every reachable
@@ -46,40 +47,58 @@ def build_hub(conn, origin: str, nights: int = pairings.DEFAULT_NIGHTS,
     `since` (an ISO date) restricts the airfare to observations on/after that
     day — used by the weekly digest for trailing-window pricing so "this week"
     reflects recent fares, not the all-time floor. None = all-time (the hubs).
+
+    Both read route_floor: the all-time floor, or its trailing-7-day minimum
+    when `since` opens that route's trailing window (the digest's case). Only a
+    route whose window doesn't line up with `since` re-reads price_history.
+    An all-time hub reads `matrix` instead when given (HubContext passes one).
     """
     arow = conn.execute(
         "SELECT city FROM airports WHERE iata=?", (origin,)
     ).fetchone()
     origin_city = arow[0] if arow else origin
 
-    sql = (
-        "SELECT d.iata, d.city, d.country, d.region, d.vibes, d.best_months, "
-        "       d.avg_daily_cost_usd AS daily, MIN(ph.cheapest_price_usd) AS air "
-        "FROM destinations d "
-        "JOIN price_history ph ON ph.dest_iata = d.iata "
-        "WHERE ph.origin_iata = ? AND ph.trip_nights = ? "
-    )
-    params = [origin, nights]
-    if since:
-        sql += "AND ph.observed_date >= ? "
-        params.append(since)
-    sql += "GROUP BY d.iata"
-    rows = conn.execute(sql, params).fetchall()
-
+    if matrix is not None and not since:
+        floors = [(iata, air, None, None, None)
+                  for iata, air, _ in matrix.ranked(origin, nights)]
+    else:
+        floors = conn.execute(
+            "SELECT dest_iata, floor_usd, last_observed, trailing_since, trailing_7d_min "
+            "FROM route_floor WHERE origin_iata = ? AND trip_nights = ?",
+            (origin, nights),
+        ).fetchall()
+    rows = []
+    for iata, floor, last, trailing_since, trailing in floors:
+        if not since:
+            rows.append((iata, floor))
+        elif last < since:
+            continue                      # nothing observed inside the window
+        elif trailing_since == since:
+            rows.append((iata, trailing))
+        else:
+            rows.append((iata, conn.execute(
+                "SELECT MIN(cheapest_price_usd) FROM price_history "
+                "WHERE origin_iata = ? AND dest_iata = ? AND trip_nights = ? "
+                "AND observed_date >= ?", (origin, iata, nights, since)).fetchone()[0]))
+
+    cat = catalog.get_catalog(conn)
     trips = []
-    for iata, city, country, region, vibes, best_months, daily, air in rows:
+    for iata, air in rows:
+        d = cat.get(iata)
+        if d is None:
+            continue
         trips.append({
             "iata": iata,
-            "city": display_names.get(iata) or city,
-            "country": country,
-            "region": region,
+            "city": display_names.get(iata) or d.city,
+            "country": d.country,
+            "region": d.region,
             "airfare_usd": int(air),
-            "daily_usd": int(daily),
+            "daily_usd": d.avg_daily_cost_usd,
             "nights": nights,
-            "total_usd": int(air) + nights * int(daily),
-            "vibes": _parse_json_list(vibes),
-            "best_months": _parse_json_list(best_months),
-            "overseas": region not in NEARBY_REGIONS,
+            "total_usd": int(air) + nights * d.avg_daily_cost_usd,
+            "vibes": list(d.vibes_list),
+            "best_months": list(d.best_months),
+            "overseas": d.region not in NEARBY_REGIONS,
         })
     trips.sort(key=lambda t: t["total_usd"])
 
@@ -91,6 +110,45 @@ def build_hub(conn, origin: str, nights: int = pairings.DEFAULT_NIGHTS,
     }
 
 
+class HubContext:
+    """Memoizes build_hub per (origin, nights, since) for one generation run.
+
+    A regen (or digest send) used to rebuild the same hub several times — once
+    for the hub page, once per budget band, again for pairings.js — each a full
+    route_floor scan. Share one context across those callers and each
+    hub is built once. Hubs are returned shared: treat them as read-only. Make a
+    fresh context per run; it never notices fare changes after the first build.
+
+    All-time hubs (and anything else in the run that wants totals, like the
+    comparisons) read one CostMatrix loaded on first use.
+    """
+
+    def __init__(self, conn, display_names: dict = DISPLAY_NAMES):
+        self.conn = conn
+        self.display_names = display_names
+        self._hubs: dict = {}
+        self._matrix: Optional[CostMatrix] = None
+        self.builds = 0
+
+    @property
+    def matrix(self) -> CostMatrix:
+        if self._matrix is None:
+            self._matrix = CostMatrix.load(self.conn)
+        return self._matrix
+
+    def hub(self, origin: str, nights: int = pairings.DEFAULT_NIGHTS,
+            since: Optional[str] = None) -> dict:
+        key = (origin, nights, since)
+        hub = self._hubs.get(key)
+        if hub is None:
+            hub = self._hubs[key] = build_hub(self.conn, origin, nights=nights,
+                                              display_names=self.display_names,
+                                              since=since,
+                                              matrix=None if since else self.matrix)
+            self.builds += 1
+        return hub
+
+
 def cheapest_trips(hub: dict, n: int) -> list:
     """The n cheapest all-in trips."""
     return hub["trips"][:n]
@@ -109,12 +167,3 @@ def long_haul_under(hub: dict, benchmark_usd: int, n: Optional[int] = None) -> l
     out = [t for t in hub["trips"] if t["overseas"] and t["total_usd"] < benchmark_usd]
     return out[:n] if n is not None else out
 
-
-def _parse_json_list(raw) -> list:
-    if not raw:
-        return []
-    try:
-        val = json.loads(raw)
-        return val if isinstance(val, list) else []
-    except (ValueError, TypeError):
-        return []
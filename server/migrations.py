@@ -1,7 +1,8 @@
 """Schema initialization for the DashAway teaser database."""
-import sqlite3
 from pathlib import Path
 
+from server import connections, db
+
 
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS signups (
@@ -84,6 +85,16 @@ CREATE TABLE IF NOT EXISTS searches (
     created_at    TEXT NOT NULL
 );
 
+-- Running count of how often each destination appeared in a session's /go
+-- results, maintained by db.record_search so the novelty lookup reads a few
+-- rows instead of re-parsing the session's whole search history.
+CREATE TABLE IF NOT EXISTS session_seen (
+    session_id  TEXT NOT NULL,
+    dest_iata   TEXT NOT NULL,
+    seen_count  INTEGER NOT NULL,
+    PRIMARY KEY (session_id, dest_iata)
+) WITHOUT ROWID;
+
 CREATE TABLE IF NOT EXISTS price_history (
     id                  INTEGER PRIMARY KEY AUTOINCREMENT,
     origin_iata         TEXT NOT NULL,
@@ -95,12 +106,13 @@ CREATE TABLE IF NOT EXISTS price_history (
     UNIQUE(origin_iata, dest_iata, trip_nights, observed_date, source)
 );
 
--- Append-only fare archive. Unlike price_snapshots (ephemeral, rewritten each
+-- Append-only fare archive. Unlike price_snapshots (ephemeral, synced to each
 -- scan for /go) and price_history (one cheapest number per route/day), this
 -- keeps the FULL price surface every scan: every departure date's fare, tagged
 -- by observed_date. This is the durable time series for booking-curve analysis
--- and date-level deal detection. Never deleted. UNIQUE -> same-day re-runs
--- overwrite rather than duplicate.
+-- and date-level deal detection. Never deleted: months past the hot window
+-- move to sealed per-month files (fare_archive_months). UNIQUE -> same-day
+-- re-runs overwrite rather than duplicate.
 CREATE TABLE IF NOT EXISTS fare_observations (
     id                INTEGER PRIMARY KEY AUTOINCREMENT,
     origin_iata       TEXT NOT NULL,
@@ -117,6 +129,52 @@ CREATE TABLE IF NOT EXISTS fare_observations (
     UNIQUE(origin_iata, dest_iata, departure_date, return_date, trip_nights, observed_date, source)
 );
 
+-- Per-route fare floor over price_history, so total_cost / hubs / comparisons
+-- read one row instead of re-aggregating the whole history on every call.
+-- floor_usd is the all-time cheapest day (floor_date: the earliest day at that
+-- price); trailing_7d_min covers [trailing_since, last_observed], the seven
+-- days ending at the route's newest observation. Kept current by the
+-- price_history triggers below; db.rebuild_route_floor() recomputes it.
+CREATE TABLE IF NOT EXISTS route_floor (
+    origin_iata      TEXT NOT NULL,
+    dest_iata        TEXT NOT NULL,
+    trip_nights      INTEGER NOT NULL,
+    floor_usd        INTEGER NOT NULL,
+    floor_date       TEXT NOT NULL,
+    last_observed    TEXT NOT NULL,
+    trailing_since   TEXT NOT NULL,
+    trailing_7d_min  INTEGER,
+    PRIMARY KEY (origin_iata, dest_iata, trip_nights)
+) WITHOUT ROWID;
+
+-- Per-route rolling baseline for digest deal detection (digest.detect_deals),
+-- as of the route's newest price_history day (as_of): median of every row in
+-- the 45 days before it (DEAL_WINDOW_DAYS), distinct observed days in that
+-- window, and the cheapest fare of its last 7 days (DEAL_RECENT_DAYS). Kept
+-- current by the price_history triggers below; db.rebuild_route_baseline()
+-- recomputes it. The windows are digest's constants spelled out in SQL:
+-- change them together (test_digest checks the edges).
+CREATE TABLE IF NOT EXISTS route_baseline (
+    origin_iata   TEXT NOT NULL,
+    trip_nights   INTEGER NOT NULL,
+    dest_iata     TEXT NOT NULL,
+    as_of         TEXT NOT NULL,
+    median_usd    REAL,
+    obs_days      INTEGER NOT NULL DEFAULT 0,
+    recent_min    INTEGER,
+    PRIMARY KEY (origin_iata, trip_nights, dest_iata)
+) WITHOUT ROWID;
+
+-- Months of fare_observations moved out to sealed per-month files
+-- (server/fare_archive.py). Readers ATTACH only the months their range needs.
+CREATE TABLE IF NOT EXISTS fare_archive_months (
+    month        TEXT PRIMARY KEY,          -- 'YYYY-MM' of observed_date
+    path         TEXT NOT NULL,
+    rows         INTEGER NOT NULL,          -- daily rows moved out
+    archived_at  TEXT NOT NULL,
+    sealed       INTEGER NOT NULL DEFAULT 0
+);
+
 -- The pairing engine's durable creative. One curated row per origin: a "cheap"
 -- destination and an "anchor" destination, with the headline claim "a week in
 -- <cheap> costs less than a week in <anchor>". The pairing (the three IATAs) is
@@ -135,6 +193,93 @@ CREATE TABLE IF NOT EXISTS city_pairings (
     last_checked      TEXT
 );
 
+-- Materialized cheapest CURRENT fare per (origin, dest, nights) for /api/go,
+-- so the request path is one indexed range scan on (origin, nights, price)
+-- instead of a CTE + join-back + GROUP BY over price_snapshots. Fare and dates
+-- only: the card's destination fields (and whether the date is in season)
+-- come from the in-process catalog at query time, so a catalog edit can't
+-- leave stale copies here. Kept current row by row by the price_snapshots
+-- triggers below (so every refresh_route write lands here as the route
+-- lands); db.rebuild_best_fares() recomputes it. Derived data: safe to drop
+-- and rebuild at any time.
+CREATE TABLE IF NOT EXISTS route_best_fares (
+    origin_iata         TEXT NOT NULL,
+    dest_iata           TEXT NOT NULL,
+    trip_nights         INTEGER NOT NULL,
+    price_usd           INTEGER NOT NULL,
+    departure_date      TEXT NOT NULL,
+    return_date         TEXT NOT NULL,
+    PRIMARY KEY (origin_iata, dest_iata, trip_nights)
+);
+
+-- Destination catalog version, bumped by the triggers below on ANY change to
+-- destinations (destinations.load_all or a hand edit). server/catalog.py keeps
+-- a decoded in-process copy of the catalog and reloads only when this moves.
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    id       INTEGER PRIMARY KEY CHECK (id = 1),
+    version  INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO catalog_meta (id, version) VALUES (1, 0);
+
+-- Shared fetch cache (server/fetch_cache.py): every non-empty SearchDates fetch
+-- by the refresh or the watch runner, so a later request whose window is inside
+-- a same-day fetch is served from fare_observations instead of Google.
+CREATE TABLE IF NOT EXISTS fetch_log (
+    origin_iata    TEXT NOT NULL,
+    dest_iata      TEXT NOT NULL,
+    trip_nights    INTEGER NOT NULL,
+    window_start   TEXT NOT NULL,
+    window_end     TEXT NOT NULL,
+    observed_date  TEXT NOT NULL,
+    source         TEXT NOT NULL,
+    fetched_at     TEXT NOT NULL,
+    results        INTEGER NOT NULL,
+    PRIMARY KEY (origin_iata, dest_iata, trip_nights, observed_date, source,
+                 window_start, window_end)
+);
+
+-- Nightly refresh run ledger (server/refresh_runs.py). One row per refresh_all
+-- run; one row per route it finished, written in the same transaction as the
+-- route's fares so `price_refresh --resume` can skip exactly what landed.
+CREATE TABLE IF NOT EXISTS refresh_runs (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_date     TEXT NOT NULL,
+    started_at   TEXT NOT NULL,
+    finished_at  TEXT,
+    resumed      INTEGER NOT NULL DEFAULT 0,
+    status       TEXT NOT NULL,
+    summary      TEXT
+);
+CREATE TABLE IF NOT EXISTS refresh_run_routes (
+    run_id       INTEGER NOT NULL REFERENCES refresh_runs(id),
+    origin_iata  TEXT NOT NULL,
+    dest_iata    TEXT NOT NULL,
+    trip_nights  INTEGER NOT NULL,
+    status       TEXT NOT NULL,
+    rows         INTEGER NOT NULL DEFAULT 0,
+    finished_at  TEXT NOT NULL,
+    PRIMARY KEY (run_id, origin_iata, dest_iata, trip_nights)
+);
+CREATE INDEX IF NOT EXISTS idx_refresh_runs_date ON refresh_runs(run_date);
+
+-- Incremental static regen (server/static_manifest.py): per generated file,
+-- the hash of its render inputs, the hash of the bytes written, and the date
+-- it last changed (its freshness line and sitemap lastmod).
+CREATE TABLE IF NOT EXISTS regen_manifest (
+    path          TEXT PRIMARY KEY,
+    input_hash    TEXT NOT NULL,
+    content_hash  TEXT NOT NULL,
+    changed_on    TEXT NOT NULL
+);
+
+-- Per-origin version of route_best_fares, bumped by the triggers below whenever
+-- an origin's best fares (or its routes' catch text) change. The
+-- /api/go cache (server/go_cache.py) drops an origin's pools when it moves.
+CREATE TABLE IF NOT EXISTS best_fare_versions (
+    origin_iata  TEXT PRIMARY KEY,
+    version      INTEGER NOT NULL
+);
+
 CREATE INDEX IF NOT EXISTS idx_signups_email ON signups(email);
 CREATE INDEX IF NOT EXISTS idx_qualifiers_signup_id ON qualifiers(signup_id);
 CREATE INDEX IF NOT EXISTS idx_snapshots_lookup ON price_snapshots(origin_iata, total_price_usd, trip_nights, departure_date);
@@ -143,6 +288,246 @@ CREATE INDEX IF NOT EXISTS idx_searches_session ON searches(session_id, created_
 CREATE INDEX IF NOT EXISTS idx_price_history_route ON price_history(origin_iata, dest_iata, trip_nights, observed_date);
 CREATE INDEX IF NOT EXISTS idx_fare_obs_route_day ON fare_observations(origin_iata, dest_iata, trip_nights, observed_date);
 CREATE INDEX IF NOT EXISTS idx_fare_obs_day ON fare_observations(observed_date);
+CREATE INDEX IF NOT EXISTS idx_snapshots_route ON price_snapshots(origin_iata, dest_iata, trip_nights, total_price_usd, departure_date);
+CREATE INDEX IF NOT EXISTS idx_best_fares_lookup ON route_best_fares(origin_iata, trip_nights, price_usd);
+CREATE INDEX IF NOT EXISTS idx_route_floor_dest ON route_floor(dest_iata, trip_nights);
+
+CREATE TRIGGER IF NOT EXISTS trg_destinations_version_ins AFTER INSERT ON destinations
+BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_destinations_version_upd AFTER UPDATE ON destinations
+BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_destinations_version_del AFTER DELETE ON destinations
+BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END;
+
+CREATE TRIGGER IF NOT EXISTS trg_best_fares_version_ins AFTER INSERT ON route_best_fares
+BEGIN
+    INSERT INTO best_fare_versions (origin_iata, version) VALUES (NEW.origin_iata, 1)
+    ON CONFLICT(origin_iata) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_best_fares_version_upd AFTER UPDATE ON route_best_fares
+BEGIN
+    INSERT INTO best_fare_versions (origin_iata, version) VALUES (NEW.origin_iata, 1)
+    ON CONFLICT(origin_iata) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_best_fares_version_del AFTER DELETE ON route_best_fares
+BEGIN
+    INSERT INTO best_fare_versions (origin_iata, version) VALUES (OLD.origin_iata, 1)
+    ON CONFLICT(origin_iata) DO UPDATE SET version = version + 1;
+END;
+
+-- A routes edit changes the route_catch_text /go joins onto an origin's best
+-- fares; bump that origin too so cached pools don't serve the old text.
+CREATE TRIGGER IF NOT EXISTS trg_routes_version_ins AFTER INSERT ON routes
+BEGIN
+    INSERT INTO best_fare_versions (origin_iata, version) VALUES (NEW.origin_iata, 1)
+    ON CONFLICT(origin_iata) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_routes_version_upd AFTER UPDATE ON routes
+BEGIN
+    INSERT INTO best_fare_versions (origin_iata, version) VALUES (NEW.origin_iata, 1)
+    ON CONFLICT(origin_iata) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_routes_version_del AFTER DELETE ON routes
+BEGIN
+    INSERT INTO best_fare_versions (origin_iata, version) VALUES (OLD.origin_iata, 1)
+    ON CONFLICT(origin_iata) DO UPDATE SET version = version + 1;
+END;
+
+-- route_best_fares maintenance. An insert can only lower a route's best, so it
+-- upserts conditionally; a delete/update only matters when it touched the
+-- current best, and then re-picks from the route's remaining snapshots (an
+-- index seek over ~13 rows). Ties go to the earliest departure.
+CREATE TRIGGER IF NOT EXISTS trg_snapshots_best_ins AFTER INSERT ON price_snapshots
+BEGIN
+    INSERT INTO route_best_fares
+        (origin_iata, dest_iata, trip_nights, price_usd, departure_date, return_date)
+    VALUES (NEW.origin_iata, NEW.dest_iata, NEW.trip_nights, NEW.total_price_usd,
+            NEW.departure_date, NEW.return_date)
+    ON CONFLICT(origin_iata, dest_iata, trip_nights) DO UPDATE SET
+        price_usd = excluded.price_usd,
+        departure_date = excluded.departure_date,
+        return_date = excluded.return_date
+    WHERE excluded.price_usd < route_best_fares.price_usd
+       OR (excluded.price_usd = route_best_fares.price_usd
+           AND excluded.departure_date < route_best_fares.departure_date);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_snapshots_best_del AFTER DELETE ON price_snapshots
+WHEN EXISTS (SELECT 1 FROM route_best_fares b
+             WHERE b.origin_iata = OLD.origin_iata AND b.dest_iata = OLD.dest_iata
+               AND b.trip_nights = OLD.trip_nights AND b.price_usd = OLD.total_price_usd
+               AND b.departure_date = OLD.departure_date)
+BEGIN
+    DELETE FROM route_best_fares
+    WHERE origin_iata = OLD.origin_iata AND dest_iata = OLD.dest_iata
+      AND trip_nights = OLD.trip_nights;
+    INSERT INTO route_best_fares
+        (origin_iata, dest_iata, trip_nights, price_usd, departure_date, return_date)
+    SELECT s.origin_iata, s.dest_iata, s.trip_nights, s.total_price_usd,
+           s.departure_date, s.return_date
+    FROM price_snapshots s
+    WHERE s.origin_iata = OLD.origin_iata AND s.dest_iata = OLD.dest_iata
+      AND s.trip_nights = OLD.trip_nights
+    ORDER BY s.total_price_usd, s.departure_date LIMIT 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_snapshots_best_upd
+AFTER UPDATE OF total_price_usd, departure_date, return_date ON price_snapshots
+BEGIN
+    DELETE FROM route_best_fares
+    WHERE origin_iata = NEW.origin_iata AND dest_iata = NEW.dest_iata
+      AND trip_nights = NEW.trip_nights;
+    INSERT INTO route_best_fares
+        (origin_iata, dest_iata, trip_nights, price_usd, departure_date, return_date)
+    SELECT s.origin_iata, s.dest_iata, s.trip_nights, s.total_price_usd,
+           s.departure_date, s.return_date
+    FROM price_snapshots s
+    WHERE s.origin_iata = NEW.origin_iata AND s.dest_iata = NEW.dest_iata
+      AND s.trip_nights = NEW.trip_nights
+    ORDER BY s.total_price_usd, s.departure_date LIMIT 1;
+END;
+
+-- route_floor upkeep. An insert can only lower the all-time floor, except
+-- when it re-observes (INSERT OR REPLACE) the floor's own day at a higher price;
+-- only then is the route's history re-scanned. The trailing minimum is always
+-- recomputed, over at most seven days of the route's index range.
+CREATE TRIGGER IF NOT EXISTS trg_price_history_floor_ins AFTER INSERT ON price_history
+BEGIN
+    -- NOT EXISTS, not OR IGNORE: FareWriter's outer INSERT OR REPLACE would
+    -- override the trigger's conflict clause and reset the row every upsert.
+    INSERT INTO route_floor
+        (origin_iata, dest_iata, trip_nights, floor_usd, floor_date, last_observed,
+         trailing_since, trailing_7d_min)
+    SELECT NEW.origin_iata, NEW.dest_iata, NEW.trip_nights, NEW.cheapest_price_usd,
+           NEW.observed_date, NEW.observed_date, date(NEW.observed_date, '-6 days'),
+           NEW.cheapest_price_usd
+    WHERE NOT EXISTS (SELECT 1 FROM route_floor
+                      WHERE origin_iata = NEW.origin_iata AND dest_iata = NEW.dest_iata
+                        AND trip_nights = NEW.trip_nights);
+    UPDATE route_floor SET floor_usd = NEW.cheapest_price_usd, floor_date = NEW.observed_date
+    WHERE origin_iata = NEW.origin_iata AND dest_iata = NEW.dest_iata
+      AND trip_nights = NEW.trip_nights
+      AND (NEW.cheapest_price_usd < floor_usd
+           OR (NEW.cheapest_price_usd = floor_usd AND NEW.observed_date < floor_date));
+    UPDATE route_floor SET (floor_usd, floor_date) = (
+        SELECT cheapest_price_usd, observed_date FROM price_history
+        WHERE origin_iata = NEW.origin_iata AND dest_iata = NEW.dest_iata
+          AND trip_nights = NEW.trip_nights
+        ORDER BY cheapest_price_usd, observed_date LIMIT 1)
+    WHERE origin_iata = NEW.origin_iata AND dest_iata = NEW.dest_iata
+      AND trip_nights = NEW.trip_nights
+      AND floor_date = NEW.observed_date AND NEW.cheapest_price_usd > floor_usd;
+    UPDATE route_floor
+    SET last_observed = max(last_observed, NEW.observed_date),
+        trailing_since = date(max(last_observed, NEW.observed_date), '-6 days')
+    WHERE origin_iata = NEW.origin_iata AND dest_iata = NEW.dest_iata
+      AND trip_nights = NEW.trip_nights;
+    UPDATE route_floor SET trailing_7d_min = (
+        SELECT MIN(cheapest_price_usd) FROM price_history
+        WHERE origin_iata = NEW.origin_iata AND dest_iata = NEW.dest_iata
+          AND trip_nights = NEW.trip_nights AND observed_date >= route_floor.trailing_since)
+    WHERE origin_iata = NEW.origin_iata AND dest_iata = NEW.dest_iata
+      AND trip_nights = NEW.trip_nights;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_price_history_floor_del AFTER DELETE ON price_history
+BEGIN
+    DELETE FROM route_floor
+    WHERE origin_iata = OLD.origin_iata AND dest_iata = OLD.dest_iata
+      AND trip_nights = OLD.trip_nights;
+    INSERT INTO route_floor
+        (origin_iata, dest_iata, trip_nights, floor_usd, floor_date, last_observed,
+         trailing_since, trailing_7d_min)
+    SELECT f.origin_iata, f.dest_iata, f.trip_nights, f.cheapest_price_usd, f.observed_date,
+           l.last, date(l.last, '-6 days'),
+           (SELECT MIN(cheapest_price_usd) FROM price_history
+            WHERE origin_iata = OLD.origin_iata AND dest_iata = OLD.dest_iata
+              AND trip_nights = OLD.trip_nights AND observed_date >= date(l.last, '-6 days'))
+    FROM (SELECT * FROM price_history
+          WHERE origin_iata = OLD.origin_iata AND dest_iata = OLD.dest_iata
+            AND trip_nights = OLD.trip_nights
+          ORDER BY cheapest_price_usd, observed_date LIMIT 1) f,
+         (SELECT MAX(observed_date) AS last FROM price_history
+          WHERE origin_iata = OLD.origin_iata AND dest_iata = OLD.dest_iata
+            AND trip_nights = OLD.trip_nights) l;
+END;
+
+-- route_baseline upkeep: move as_of to the newest day, then recompute the
+-- route's window (a bounded index range; a row older than the window still
+-- lands here, and recomputing is cheaper than deciding it didn't matter).
+CREATE TRIGGER IF NOT EXISTS trg_price_history_baseline_ins AFTER INSERT ON price_history
+BEGIN
+    INSERT INTO route_baseline (origin_iata, trip_nights, dest_iata, as_of)
+    SELECT NEW.origin_iata, NEW.trip_nights, NEW.dest_iata, NEW.observed_date
+    WHERE NOT EXISTS (SELECT 1 FROM route_baseline
+                      WHERE origin_iata = NEW.origin_iata AND dest_iata = NEW.dest_iata
+                        AND trip_nights = NEW.trip_nights);
+    UPDATE route_baseline SET as_of = max(as_of, NEW.observed_date)
+    WHERE origin_iata = NEW.origin_iata AND dest_iata = NEW.dest_iata
+      AND trip_nights = NEW.trip_nights;
+    UPDATE route_baseline SET
+        obs_days = (SELECT COUNT(DISTINCT observed_date) FROM price_history h
+                    WHERE h.origin_iata = route_baseline.origin_iata
+                      AND h.dest_iata = route_baseline.dest_iata
+                      AND h.trip_nights = route_baseline.trip_nights
+                      AND h.observed_date >= date(route_baseline.as_of, '-45 days')),
+        recent_min = (SELECT MIN(cheapest_price_usd) FROM price_history h
+                      WHERE h.origin_iata = route_baseline.origin_iata
+                        AND h.dest_iata = route_baseline.dest_iata
+                        AND h.trip_nights = route_baseline.trip_nights
+                        AND h.observed_date >= date(route_baseline.as_of, '-6 days')),
+        median_usd = (SELECT AVG(p) FROM (
+                          SELECT cheapest_price_usd AS p,
+                                 ROW_NUMBER() OVER (ORDER BY cheapest_price_usd) AS rn,
+                                 COUNT(*) OVER () AS cnt
+                          FROM price_history h
+                          WHERE h.origin_iata = route_baseline.origin_iata
+                            AND h.dest_iata = route_baseline.dest_iata
+                            AND h.trip_nights = route_baseline.trip_nights
+                            AND h.observed_date >= date(route_baseline.as_of, '-45 days'))
+                      WHERE rn IN ((cnt + 1) / 2, (cnt + 2) / 2))
+    WHERE origin_iata = NEW.origin_iata AND dest_iata = NEW.dest_iata
+      AND trip_nights = NEW.trip_nights;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_price_history_baseline_del AFTER DELETE ON price_history
+BEGIN
+    DELETE FROM route_baseline
+    WHERE origin_iata = OLD.origin_iata AND dest_iata = OLD.dest_iata
+      AND trip_nights = OLD.trip_nights
+      AND NOT EXISTS (SELECT 1 FROM price_history
+                      WHERE origin_iata = OLD.origin_iata AND dest_iata = OLD.dest_iata
+                        AND trip_nights = OLD.trip_nights);
+    UPDATE route_baseline SET as_of = (
+        SELECT MAX(observed_date) FROM price_history
+        WHERE origin_iata = OLD.origin_iata AND dest_iata = OLD.dest_iata
+          AND trip_nights = OLD.trip_nights)
+    WHERE origin_iata = OLD.origin_iata AND dest_iata = OLD.dest_iata
+      AND trip_nights = OLD.trip_nights;
+    UPDATE route_baseline SET
+        obs_days = (SELECT COUNT(DISTINCT observed_date) FROM price_history h
+                    WHERE h.origin_iata = route_baseline.origin_iata
+                      AND h.dest_iata = route_baseline.dest_iata
+                      AND h.trip_nights = route_baseline.trip_nights
+                      AND h.observed_date >= date(route_baseline.as_of, '-45 days')),
+        recent_min = (SELECT MIN(cheapest_price_usd) FROM price_history h
+                      WHERE h.origin_iata = route_baseline.origin_iata
+                        AND h.dest_iata = route_baseline.dest_iata
+                        AND h.trip_nights = route_baseline.trip_nights
+                        AND h.observed_date >= date(route_baseline.as_of, '-6 days')),
+        median_usd = (SELECT AVG(p) FROM (
+                          SELECT cheapest_price_usd AS p,
+                                 ROW_NUMBER() OVER (ORDER BY cheapest_price_usd) AS rn,
+                                 COUNT(*) OVER () AS cnt
+                          FROM price_history h
+                          WHERE h.origin_iata = route_baseline.origin_iata
+                            AND h.dest_iata = route_baseline.dest_iata
+                            AND h.trip_nights = route_baseline.trip_nights
+                            AND h.observed_date >= date(route_baseline.as_of, '-45 days'))
+                      WHERE rn IN ((cnt + 1) / 2, (cnt + 2) / 2))
+    WHERE origin_iata = OLD.origin_iata AND dest_iata = OLD.dest_iata
+      AND trip_nights = OLD.trip_nights;
+END;
 
 -- Fare watches: one user-defined route+window watched nightly (Watches v1).
 CREATE TABLE IF NOT EXISTS watches (
@@ -189,6 +574,7 @@ _COLUMN_MIGRATIONS = [
     ("signups", "digest_city", "TEXT"),
     ("signups", "unsubscribed_at", "TEXT"),
     ("signups", "unsub_token", "TEXT"),
+    ("fare_archive_months", "intervals", "INTEGER"),
 ]
 
 
@@ -201,14 +587,52 @@ def _add_column_if_missing(conn, table: str, column: str, decl: str) -> None:
 def init_schema(db_path: str) -> None:
     """Ensure schema exists at db_path. Idempotent — safe to run repeatedly."""
     Path(db_path).parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(db_path)
+    conn = connections.connect(db_path)
     try:
+        # route_best_fares used to carry copies of the destination fields,
+        # which catalog edits left stale. Drop the old shape (and the snapshot
+        # triggers that fill it); SCHEMA recreates both and the backfill below
+        # repopulates it.
+        if "city" in [r[1] for r in conn.execute("PRAGMA table_info(route_best_fares)")]:
+            for trigger in ("trg_snapshots_best_ins", "trg_snapshots_best_del",
+                            "trg_snapshots_best_upd"):
+                conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            conn.execute("DROP TABLE route_best_fares")
         conn.executescript(SCHEMA)
         for table, column, decl in _COLUMN_MIGRATIONS:
             _add_column_if_missing(conn, table, column, decl)
         conn.execute(
             "CREATE INDEX IF NOT EXISTS idx_signups_unsub_token ON signups(unsub_token)"
         )
+        # FareWriter upserts snapshots by route + departure date. Older
+        # databases were delete-then-insert and never enforced it; keep the
+        # newest row of any duplicate before adding the key.
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type='index' "
+                            "AND name='idx_snapshots_route_date'").fetchone():
+            conn.execute(
+                "DELETE FROM price_snapshots WHERE id NOT IN (SELECT MAX(id) "
+                "FROM price_snapshots GROUP BY origin_iata, dest_iata, trip_nights, "
+                "departure_date)")
+            conn.execute(
+                "CREATE UNIQUE INDEX idx_snapshots_route_date ON price_snapshots"
+                "(origin_iata, dest_iata, trip_nights, departure_date)")
+        # One-time backfill of the /go materialization on a database that had
+        # snapshots before route_best_fares existed.
+        if (conn.execute("SELECT 1 FROM price_snapshots LIMIT 1").fetchone()
+                and not conn.execute("SELECT 1 FROM route_best_fares LIMIT 1").fetchone()):
+            db.rebuild_best_fares(conn)
+        # ... and the route fare floors.
+        if (conn.execute("SELECT 1 FROM price_history LIMIT 1").fetchone()
+                and not conn.execute("SELECT 1 FROM route_floor LIMIT 1").fetchone()):
+            db.rebuild_route_floor(conn)
+        # ... and the deal-detection baselines.
+        if (conn.execute("SELECT 1 FROM price_history LIMIT 1").fetchone()
+                and not conn.execute("SELECT 1 FROM route_baseline LIMIT 1").fetchone()):
+            db.rebuild_route_baseline(conn)
+        # Likewise for the session novelty counters.
+        if (conn.execute("SELECT 1 FROM searches LIMIT 1").fetchone()
+                and not conn.execute("SELECT 1 FROM session_seen LIMIT 1").fetchone()):
+            db.rebuild_session_seen(conn)
         conn.commit()
     finally:
         conn.close()
@@ -7,7 +7,8 @@ not creative — they drift as fares move, so verify_all() recomputes them on ev
 fare refresh and only marks a pairing `verified` when the cheap leg genuinely
 costs less. get_headline() refuses to serve an unverified pairing, so we never
 publish a claim the data does not back. at_risk() surfaces pairings whose claim
-broke or whose margin got thin, for a human to re-pair.
+broke or whose margin got thin, for a human to re-pair, and
+recommend_replacements() proposes the pairs to re-pair with.
 
 Total trip cost = best airfare seen + nights x avg daily on-ground cost. That
 on-ground term is the whole insight: the destination that is cheaper to FLY to
@@ -16,6 +17,10 @@ is often dearer to BE in, and the all-in number flips the ranking.
 import logging
 from typing import Optional
 
+import numpy as np
+
+from server.catalog import get_catalog
+
 log = logging.getLogger(__name__)
 
 DEFAULT_NIGHTS = 7
@@ -24,6 +29,9 @@ DEFAULT_NIGHTS = 7
 # this all-in margin the pairing is "at risk" and gets surfaced for re-pairing.
 MIN_MARGIN_USD = 75
 
+# Replacement candidates attached to each at-risk pairing in the alert.
+REPLACEMENTS = 5
+
 # The durable creative: (origin, cheap_dest, anchor_dest). Hand-curated from the
 # BNA-led data exploration; stable across refreshes. Dollar figures are
 # deliberately absent — those are facts, recomputed by verify_all().
@@ -50,19 +58,17 @@ def total_cost(conn, origin: str, dest: str, nights: int = DEFAULT_NIGHTS) -> Op
     destination — either way there is no defensible number to make a claim from.
     """
     row = conn.execute(
-        "SELECT MIN(cheapest_price_usd) FROM price_history "
+        "SELECT floor_usd FROM route_floor "
         "WHERE origin_iata=? AND dest_iata=? AND trip_nights=?",
         (origin, dest, nights),
     ).fetchone()
     airfare = row[0] if row else None
     if airfare is None:
         return None
-    drow = conn.execute(
-        "SELECT avg_daily_cost_usd FROM destinations WHERE iata=?", (dest,)
-    ).fetchone()
-    if drow is None or drow[0] is None:
+    d = get_catalog(conn).get(dest)
+    if d is None:
         return None
-    return int(airfare) + nights * int(drow[0])
+    return int(airfare) + nights * d.avg_daily_cost_usd
 
 
 def seed_pairings(conn, pairings=CURATED_PAIRINGS) -> None:
@@ -78,6 +84,23 @@ def seed_pairings(conn, pairings=CURATED_PAIRINGS) -> None:
     conn.commit()
 
 
+# Both legs' all-in totals for every pairing in one pass: route_floor gives the
+# airfare floor, destinations the daily cost. A missing fare or destination
+# leaves that leg NULL, exactly as total_cost() returns None.
+_PAIRING_TOTALS_SQL = """
+    SELECT p.origin_iata,
+           cf.floor_usd + p.trip_nights * cd.avg_daily_cost_usd,
+           af.floor_usd + p.trip_nights * ad.avg_daily_cost_usd
+    FROM city_pairings p
+    LEFT JOIN route_floor cf ON cf.origin_iata = p.origin_iata
+         AND cf.dest_iata = p.cheap_iata AND cf.trip_nights = p.trip_nights
+    LEFT JOIN destinations cd ON cd.iata = p.cheap_iata
+    LEFT JOIN route_floor af ON af.origin_iata = p.origin_iata
+         AND af.dest_iata = p.anchor_iata AND af.trip_nights = p.trip_nights
+    LEFT JOIN destinations ad ON ad.iata = p.anchor_iata
+"""
+
+
 def verify_all(conn, now: Optional[str] = None) -> dict:
     """Recompute both legs for every pairing and update verified flag + margin.
 
@@ -85,30 +108,26 @@ def verify_all(conn, now: Optional[str] = None) -> dict:
     all-in cost is strictly lower. margin_usd is anchor_total - cheap_total
     (positive when the claim holds, negative when it is broken, None when a leg
     has no data). Returns counts of {verified, broken, unknown}.
+
+    One bulk read (the same totals total_cost() gives, for every pairing at
+    once) and one executemany, so cost doesn't grow per-pairing in queries.
     """
-    rows = conn.execute(
-        "SELECT origin_iata, cheap_iata, anchor_iata, trip_nights FROM city_pairings"
-    ).fetchall()
     counts = {"verified": 0, "broken": 0, "unknown": 0}
-    for origin, cheap, anchor, nights in rows:
-        cheap_total = total_cost(conn, origin, cheap, nights)
-        anchor_total = total_cost(conn, origin, anchor, nights)
+    updates = []
+    for origin, cheap_total, anchor_total in conn.execute(_PAIRING_TOTALS_SQL):
         if cheap_total is None or anchor_total is None:
             ok, margin = 0, None
             counts["unknown"] += 1
         else:
             margin = anchor_total - cheap_total
-            if cheap_total < anchor_total:
-                ok = 1
-                counts["verified"] += 1
-            else:
-                ok = 0
-                counts["broken"] += 1
-        conn.execute(
-            "UPDATE city_pairings SET cheap_total_usd=?, anchor_total_usd=?, "
-            "margin_usd=?, verified=?, last_checked=? WHERE origin_iata=?",
-            (cheap_total, anchor_total, margin, ok, now, origin),
-        )
+            ok = 1 if cheap_total < anchor_total else 0
+            counts["verified" if ok else "broken"] += 1
+        updates.append((cheap_total, anchor_total, margin, ok, now, origin))
+    conn.executemany(
+        "UPDATE city_pairings SET cheap_total_usd=?, anchor_total_usd=?, "
+        "margin_usd=?, verified=?, last_checked=? WHERE origin_iata=?",
+        updates,
+    )
     conn.commit()
     return counts
 
@@ -156,18 +175,19 @@ def at_risk(conn, min_margin: int = MIN_MARGIN_USD) -> list:
     re-pair until fares arrive. Ordered thinnest/most-broken first.
     """
     rows = conn.execute(
-        "SELECT origin_iata, cheap_iata, anchor_iata, cheap_total_usd, "
+        "SELECT origin_iata, cheap_iata, anchor_iata, trip_nights, cheap_total_usd, "
         "anchor_total_usd, margin_usd, verified FROM city_pairings "
         "WHERE cheap_total_usd IS NOT NULL AND anchor_total_usd IS NOT NULL "
         "AND (verified=0 OR margin_usd < ?) ORDER BY margin_usd",
         (min_margin,),
     ).fetchall()
     out = []
-    for origin, cheap, anchor, cheap_total, anchor_total, margin, verified in rows:
+    for origin, cheap, anchor, nights, cheap_total, anchor_total, margin, verified in rows:
         out.append({
             "origin": origin,
             "cheap_iata": cheap,
             "anchor_iata": anchor,
+            "trip_nights": nights,
             "cheap_total_usd": cheap_total,
             "anchor_total_usd": anchor_total,
             "margin_usd": margin,
@@ -176,8 +196,57 @@ def at_risk(conn, min_margin: int = MIN_MARGIN_USD) -> list:
     return out
 
 
+def recommend_replacements(conn, origin: str, nights: int = DEFAULT_NIGHTS,
+                           k: int = REPLACEMENTS,
+                           min_margin: int = MIN_MARGIN_USD) -> list:
+    """The k best (cheap, anchor) pairs to re-pair `origin` with, best first.
+
+    Every ordered pair of the origin's priced catalog destinations is scored in
+    one NumPy pass from route_floor. A candidate must make the pairing's own
+    point — the cheap leg costs MORE to fly to, less for the week — and clear
+    min_margin on both the all-time floors (what verify_all() will check) and
+    the trailing-7-day fares, so it isn't at risk the night it ships. A route
+    with no fare in the origin's latest week has no trailing figure and can't
+    be recommended. Score: the smaller of the two margins, nudged by the cheap
+    leg's novelty (ranking.score's +/-5% per point around 3).
+    """
+    rows = conn.execute(
+        "SELECT dest_iata, floor_usd, "
+        "       CASE WHEN last_observed >= date((SELECT MAX(last_observed) FROM route_floor "
+        "                 WHERE origin_iata = ? AND trip_nights = ?), '-6 days') "
+        "            THEN trailing_7d_min END "
+        "FROM route_floor WHERE origin_iata = ? AND trip_nights = ?",
+        (origin, nights, origin, nights),
+    ).fetchall()
+    cat = get_catalog(conn)
+    rows = [(d, floor, trailing, cat.get(d)) for d, floor, trailing in rows
+            if trailing is not None and d in cat]
+    if len(rows) < 2:
+        return []
+    iatas = [r[0] for r in rows]
+    air = np.array([r[1] for r in rows], dtype=np.int64)
+    ground = nights * np.array([r[3].avg_daily_cost_usd for r in rows], dtype=np.int64)
+    total = air + ground
+    recent = np.array([r[2] for r in rows], dtype=np.int64) + ground
+    # [i, j]: cheap = i, anchor = j.
+    margin = total[None, :] - total[:, None]
+    recent_margin = recent[None, :] - recent[:, None]
+    ok = (air[:, None] > air[None, :]) & (margin >= min_margin) & (recent_margin >= min_margin)
+    novelty = 1.0 + (np.array([r[3].novelty_score for r in rows]) - 3) * 0.05
+    score = np.minimum(margin, recent_margin) * novelty[:, None]
+    cheap, anchor = np.nonzero(ok)
+    order = np.lexsort((-margin[cheap, anchor], -score[cheap, anchor]))[:k]
+    return [{
+        "cheap_iata": iatas[c],
+        "anchor_iata": iatas[a],
+        "cheap_total_usd": int(total[c]),
+        "anchor_total_usd": int(total[a]),
+        "margin_usd": int(margin[c, a]),
+        "recent_margin_usd": int(recent_margin[c, a]),
+        "score": round(float(score[c, a]), 1),
+    } for c, a in zip(cheap[order], anchor[order])]
+
+
 def _city(conn, iata: str) -> Optional[str]:
-    row = conn.execute(
-        "SELECT city FROM destinations WHERE iata=?", (iata,)
-    ).fetchone()
-    return row[0] if row else None
+    d = get_catalog(conn).get(iata)
+    return d.city if d else None
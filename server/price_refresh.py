@@ -2,29 +2,39 @@
 
 Invocation: python -m server.price_refresh
 Reads DATABASE_PATH from env. Uses real FliClient unless FLI_MOCK=1.
+SCAN_REQUEST_BUDGET=N scans only the N highest-value routes (scan_scheduler).
+--resume skips routes a run already finished today (refresh_runs ledger).
+FLI_BUDGET_PATH shares one request budget with every other fli job on the host
+(request_budget).
 """
-import json
+import argparse
 import logging
 import os
-import sqlite3
 import sys
 import time
 from datetime import date, datetime, timedelta, timezone
-from typing import Iterable
+from typing import Iterable, Optional
 
+from server.fare_writer import BATCH_ROUTES, FareWriter
 from server.fli_client import FliClient, FliError
-from server import pairings
+from server import (connections, fare_archive, fetch_cache, pairings, refresh_runs,
+                    request_budget, scan_scheduler)
+from server.scan_engine import GovernedClient, TokenBucket, run_scan
 from server.email_client import send_pairing_alert
 
 
 log = logging.getLogger("price_refresh")
 
 
-SLEEP_BETWEEN_CALLS = 6.0
+# Aggregate pacing across ALL scan workers: one request may start every
+# SLEEP_BETWEEN_CALLS seconds (a shared token bucket, see server/scan_engine.py).
+# Serially this used to be a per-call sleep on top of the call's own latency;
+# with SCAN_WORKERS overlapping that latency the same spacing is the whole cost,
+# which is what brings 5 and 10 nights back inside the timeout (~3,600 calls).
+SLEEP_BETWEEN_CALLS = 2.0
+SCAN_WORKERS = 4
 WINDOW_DAYS = 90
-TRIP_LENGTHS = (7,)  # v1: 7-night only to stay under 12h timeout. v1.1: re-add 5 and 10
-                     # once we either parallelize, raise timeout, or get less aggressive
-                     # rate-limiting from Google.
+TRIP_LENGTHS = (5, 7, 10)
 RATE_LIMIT_BACKOFF_SECONDS = 60.0
 
 # Plausibility band for a cheapest-economy round-trip from a US city. Fares
@@ -54,24 +64,43 @@ def refresh_route(
     start_date: date,
     end_date: date,
     rate_limit_backoff: float = RATE_LIMIT_BACKOFF_SECONDS,
+    writer: Optional[FareWriter] = None,
+    cache_stats: Optional[fetch_cache.Stats] = None,
 ) -> int:
     """Refresh one (origin, dest, nights) tuple. Returns rows inserted.
 
     Retries once with a `rate_limit_backoff`-second sleep if fli signals
     HTTP 429 or rate-limit on the first attempt. Other FliErrors propagate
     to the caller without retry.
+
+    Writes go through `writer` (refresh_all shares one batched FareWriter
+    across the run); without one, a single-route writer commits immediately.
+
+    With `cache_stats`, a same-day fetch in fetch_log covering this window (a
+    re-run, or the watch runner) answers the route without a Google request.
     """
-    try:
-        results = fli.search_dates(origin, dest, start_date, end_date, trip_nights)
-    except FliError as e:
-        if not _is_rate_limit_error(e):
-            raise
-        log.info(
-            "%s->%s %dn rate-limited; backing off %.0fs and retrying once",
-            origin, dest, trip_nights, rate_limit_backoff,
-        )
-        time.sleep(rate_limit_backoff)
-        results = fli.search_dates(origin, dest, start_date, end_date, trip_nights)
+    results = None
+    if cache_stats is not None:
+        with connections.connection(db_path) as conn:
+            results = fetch_cache.lookup(conn, origin, dest, trip_nights, start_date,
+                                         end_date, _utc_today())
+        if results:
+            cache_stats.hit()
+        else:
+            cache_stats.miss()
+            results = None
+    if results is None:
+        try:
+            results = fli.search_dates(origin, dest, start_date, end_date, trip_nights)
+        except FliError as e:
+            if not _is_rate_limit_error(e):
+                raise
+            log.info(
+                "%s->%s %dn rate-limited; backing off %.0fs and retrying once",
+                origin, dest, trip_nights, rate_limit_backoff,
+            )
+            time.sleep(rate_limit_backoff)
+            results = fli.search_dates(origin, dest, start_date, end_date, trip_nights)
 
     # Drop implausible fares (bad scrapes) before any write, so one error fare
     # can't skew the archive or a hub/comparison ranking.
@@ -87,69 +116,11 @@ def refresh_route(
         return 0
 
     fetched_at = _iso_now()
-    conn = sqlite3.connect(db_path)
-    conn.execute("PRAGMA foreign_keys = ON")
-    try:
-        conn.execute(
-            "DELETE FROM price_snapshots WHERE origin_iata=? AND dest_iata=? AND trip_nights=?",
-            (origin, dest, trip_nights),
-        )
-        inserted = 0
-        for r in results:
-            conn.execute(
-                """INSERT INTO price_snapshots
-                   (origin_iata, dest_iata, departure_date, return_date,
-                    trip_nights, total_price_usd, stops, carrier_codes,
-                    source, fetched_at)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    r.origin_iata, r.dest_iata,
-                    r.departure_date, r.return_date,
-                    r.trip_nights, r.total_price_usd,
-                    r.stops, json.dumps(r.carrier_codes) if r.carrier_codes else None,
-                    "fli", fetched_at,
-                ),
-            )
-            inserted += 1
-
-        # Append one summary row to durable price_history (append-only, never
-        # deleted). price_snapshots above is ephemeral ("what's cheap to book
-        # now"); price_history accumulates the route's cheapest observed price
-        # per scan day, which is what baseline computation reads. INSERT OR
-        # REPLACE keyed on the UNIQUE constraint means re-running the same day
-        # overwrites rather than duplicates.
-        cheapest = min(r.total_price_usd for r in results)
-        conn.execute(
-            """INSERT OR REPLACE INTO price_history
-               (origin_iata, dest_iata, trip_nights, cheapest_price_usd, observed_date, source)
-               VALUES (?, ?, ?, ?, date('now'), 'fli')""",
-            (origin, dest, trip_nights, cheapest),
-        )
-
-        # Append the FULL price surface to the durable fare_observations
-        # archive (never deleted), so we keep every departure-date fare per
-        # scan day, not just the single cheapest. INSERT OR REPLACE on the
-        # UNIQUE key makes a same-day re-run idempotent.
-        for r in results:
-            conn.execute(
-                """INSERT OR REPLACE INTO fare_observations
-                   (origin_iata, dest_iata, departure_date, return_date,
-                    trip_nights, total_price_usd, stops, carrier_codes,
-                    source, observed_date, fetched_at)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, date('now'), ?)""",
-                (
-                    r.origin_iata, r.dest_iata,
-                    r.departure_date, r.return_date,
-                    r.trip_nights, r.total_price_usd,
-                    r.stops, json.dumps(r.carrier_codes) if r.carrier_codes else None,
-                    "fli", fetched_at,
-                ),
-            )
-
-        conn.commit()
-        return inserted
-    finally:
-        conn.close()
+    window = (start_date, end_date)
+    if writer is not None:
+        return writer.write_route(origin, dest, trip_nights, results, fetched_at, window)
+    with FareWriter(db_path, batch_routes=1) as one_off:
+        return one_off.write_route(origin, dest, trip_nights, results, fetched_at, window)
 
 
 def refresh_all(
@@ -157,9 +128,39 @@ def refresh_all(
     fli: FliClient,
     trip_lengths: Iterable[int] = TRIP_LENGTHS,
     sleep_seconds: float = SLEEP_BETWEEN_CALLS,
+    workers: int = SCAN_WORKERS,
+    clock=None,
+    batch_routes: int = BATCH_ROUTES,
+    max_requests: Optional[int] = None,
+    resume: bool = False,
+    use_cache: bool = True,
+    limiter=None,
 ) -> dict:
-    """Iterate every route x trip_length. Returns summary metrics."""
-    conn = sqlite3.connect(db_path)
+    """Scan every route x trip_length on the concurrent engine. Returns summary
+    metrics.
+
+    `sleep_seconds` is the aggregate spacing between request starts (0 = no
+    pacing). Rate-limit errors slow the shared bucket down for everyone; the
+    route's own single retry then waits on the bucket's cooldown instead of a
+    private sleep. `clock` is injectable for tests (see scan_engine). All
+    workers share one FareWriter committing every `batch_routes` routes.
+
+    `max_requests` caps tonight's scans: the scan scheduler ranks every
+    route by volatility, age and curation and only the top `max_requests`
+    are scanned, best first. None scans everything (destination-major).
+
+    Every run is recorded in the refresh_runs ledger, each finished route in
+    the same transaction as its fares. `resume` skips routes any run already
+    finished today (a crash or deploy mid-run) and scans the rest in order.
+    `use_cache` answers routes from a covering same-day fetch (fetch_cache);
+    hit rates land in the summary.
+
+    `limiter` replaces the private bucket with a shared one (a
+    request_budget.SharedTokenBucket): pacing and 429 cooldowns are then
+    coordinated with every other fli job on the host, and `sleep_seconds` is
+    ignored.
+    """
+    conn = connections.connect(db_path)
     try:
         # Round-robin by destination so every origin gets coverage quickly.
         # Iterating origin-major means /go is empty for 11/12 origins for hours
@@ -169,32 +170,78 @@ def refresh_all(
         pairs = conn.execute(
             "SELECT origin_iata, dest_iata FROM routes ORDER BY dest_iata, origin_iata"
         ).fetchall()
+        today = date.today()
+        tasks = [(origin, dest, nights) for origin, dest in pairs for nights in trip_lengths]
+        routes_total = len(tasks)
+        skipped = 0
+        if resume:
+            done = refresh_runs.completed_on(conn, today)
+            tasks = [t for t in tasks if t not in done]
+            skipped = routes_total - len(tasks)
+            log.info("resuming: %d routes already done today, %d to go", skipped, len(tasks))
+        if max_requests is not None:
+            tasks = scan_scheduler.plan(conn, tasks, max_requests, as_of=today)
+        run_id = refresh_runs.start_run(conn, today, resumed=resume)
     finally:
         conn.close()
 
-    today = date.today()
     end = today + timedelta(days=WINDOW_DAYS)
+    cache_stats = fetch_cache.Stats() if use_cache else None
+
+    if limiter is None and sleep_seconds > 0:
+        limiter = TokenBucket(rate=1.0 / sleep_seconds, clock=clock,
+                              cooldown_s=RATE_LIMIT_BACKOFF_SECONDS)
+    if limiter is not None:
+        fli = GovernedClient(fli, limiter, is_rate_limit=_is_rate_limit_error)
+
+    def _work(task):
+        origin, dest, nights = task
+        # The bucket owns the backoff when present; otherwise keep the old sleep.
+        backoff = 0 if limiter else RATE_LIMIT_BACKOFF_SECONDS
+        try:
+            n = refresh_route(db_path, fli, origin, dest, nights, today, end,
+                              rate_limit_backoff=backoff, writer=writer,
+                              cache_stats=cache_stats)
+        except Exception:
+            writer.mark_route(origin, dest, nights, "failed", _iso_now())
+            raise
+        if n == 0:
+            writer.mark_route(origin, dest, nights, "empty", _iso_now())
+        return n
 
     summary = {
-        "routes_attempted": 0,
+        "run_id": run_id,
+        "routes_total": routes_total,
+        "routes_skipped_resume": skipped,
+        "routes_attempted": len(tasks),
         "routes_succeeded": 0,
         "routes_failed": 0,
         "snapshots_written": 0,
+        "rate_limit_slowdowns": 0,
     }
-
-    for origin, dest in pairs:
-        for nights in trip_lengths:
-            summary["routes_attempted"] += 1
-            try:
-                n = refresh_route(db_path, fli, origin, dest, nights, today, end)
-                summary["snapshots_written"] += n
-                summary["routes_succeeded"] += 1
-            except FliError as e:
-                log.warning("%s->%s %dn failed: %s", origin, dest, nights, e)
-                summary["routes_failed"] += 1
-            if sleep_seconds > 0:
-                time.sleep(sleep_seconds)
-
+    with FareWriter(db_path, batch_routes=batch_routes, run_id=run_id) as writer:
+        results = run_scan(tasks, _work, workers=workers)
+    for (origin, dest, nights), n, err in results:
+        if err is None:
+            summary["snapshots_written"] += n
+            summary["routes_succeeded"] += 1
+            continue
+        if isinstance(err, FliError):
+            log.warning("%s->%s %dn failed: %s", origin, dest, nights, err)
+        else:
+            log.error("%s->%s %dn crashed: %r", origin, dest, nights, err)
+        summary["routes_failed"] += 1
+    if limiter:
+        summary["rate_limit_slowdowns"] = limiter.slowdowns
+    summary["writer"] = writer.stats()
+    if cache_stats is not None:
+        summary.update(cache_stats.summary())
+
+    conn = connections.connect(db_path)
+    try:
+        refresh_runs.finish_run(conn, run_id, summary)
+    finally:
+        conn.close()
     log.info("refresh done: %s", summary)
     return summary
 
@@ -203,7 +250,18 @@ def _iso_now() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-def main() -> int:
+def _utc_today() -> str:
+    # fare_observations.observed_date is SQLite's date('now'), i.e. UTC.
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def main(argv: Optional[list] = None) -> int:
+    ap = argparse.ArgumentParser(description="Nightly fli price refresh.")
+    ap.add_argument("--resume", action="store_true",
+                    help="skip routes a run already finished today")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="always ask Google, even when a same-day fetch covers the route")
+    args = ap.parse_args(argv)
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s %(levelname)s %(name)s: %(message)s",
@@ -211,17 +269,26 @@ def main() -> int:
     db_path = os.environ.get("DATABASE_PATH", "/var/lib/promptiv/teaser.sqlite")
     mock = os.environ.get("FLI_MOCK") == "1"
     fli = FliClient(mock=mock)
-    summary = refresh_all(db_path, fli)
+    # Optional nightly request budget for the adaptive scheduler; unset scans
+    # every route.
+    budget = os.environ.get("SCAN_REQUEST_BUDGET")
+    summary = refresh_all(db_path, fli, max_requests=int(budget) if budget else None,
+                          resume=args.resume, use_cache=not args.no_cache,
+                          limiter=request_budget.from_env())
 
     # Fact monitor: re-seed the curated pairings (idempotent) and re-verify every
     # claim against the fares we just collected, then alert if any broke or got
-    # thin. Non-fatal — a monitor hiccup must not fail the price refresh itself.
+    # thin, with replacement pairs to pick from. Non-fatal — a monitor hiccup
+    # must not fail the price refresh itself.
     try:
-        conn = sqlite3.connect(db_path)
+        conn = connections.connect(db_path)
         try:
             pairings.seed_pairings(conn)
             verify_summary = pairings.verify_all(conn, now=_iso_now())
             flagged = pairings.at_risk(conn)
+            for p in flagged:
+                p["replacements"] = pairings.recommend_replacements(
+                    conn, p["origin"], p["trip_nights"])
         finally:
             conn.close()
         log.info("pairings verified: %s; %d at risk", verify_summary, len(flagged))
@@ -230,6 +297,17 @@ def main() -> int:
     except Exception:
         log.exception("pairing verification failed (non-fatal)")
 
+    # Seal any fare_observations month that has left the hot window into its
+    # own archive file (a no-op on all but the first run of a month).
+    try:
+        conn = connections.connect(db_path)
+        try:
+            fare_archive.archive_months(conn)
+        finally:
+            conn.close()
+    except Exception:
+        log.exception("fare archive failed (non-fatal)")
+
     failure_rate = (
         summary["routes_failed"] / summary["routes_attempted"]
         if summary["routes_attempted"] else 0
@@ -2,6 +2,8 @@
 from dataclasses import dataclass, field
 from typing import Optional
 
+import numpy as np
+
 
 @dataclass(frozen=True)
 class Candidate:
@@ -59,3 +61,183 @@ def score(candidate: Candidate, query: UserQuery, session: SessionState) -> Opti
     novelty_bonus = 1.0 + (candidate.novelty_score - 3) * 0.05
 
     return budget_fit * novelty * vibe_match * seasonality * novelty_bonus
+
+
+# --- Batch scoring -----------------------------------------------------------
+#
+# /api/go scores every candidate for one query. Doing that through score()
+# means one Candidate/UserQuery/SessionState per row and a fresh set(vibes)
+# intersection each time. The batch path takes the same inputs as columns —
+# vibes as bitmasks over a small vocabulary, so overlap is a popcount — and
+# scores the whole set in one NumPy pass.
+#
+# Results are bit-for-bit identical to score(): every factor is computed with
+# the same float64 operations and multiplied in the same order.
+
+MAX_VIBES = 64  # one bit per vibe in a uint64 mask; the catalog uses 7
+_SEEN_NOVELTY = np.array([1.0, 0.6, 0.3])  # by seen count 0, 1, 2+
+
+
+def vibe_vocabulary(*vibe_lists) -> dict[str, int]:
+    """Bit index per distinct vibe, in first-seen order across the lists."""
+    vocab: dict[str, int] = {}
+    for vibes in vibe_lists:
+        for v in vibes:
+            if v not in vocab:
+                if len(vocab) >= MAX_VIBES:
+                    raise ValueError(f"more than {MAX_VIBES} distinct vibes")
+                vocab[v] = len(vocab)
+    return vocab
+
+
+def vibe_mask(vibes, vocab: dict[str, int]) -> int:
+    """Bitmask of `vibes` over `vocab`; vibes outside the vocabulary are dropped."""
+    mask = 0
+    for v in vibes:
+        bit = vocab.get(v)
+        if bit is not None:
+            mask |= 1 << bit
+    return mask
+
+
+def _popcount(masks: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):          # numpy >= 2.0
+        return np.bitwise_count(masks).astype(np.int64)
+    as_bytes = masks.astype(np.uint64).view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(as_bytes, axis=1).sum(axis=1).astype(np.int64)
+
+
+def score_batch(prices, novelty_scores, vibe_masks, in_season, seen_counts,
+                budget_usd: int, query_mask: int = 0,
+                has_query_vibes: bool = False) -> np.ndarray:
+    """Vectorized score() over columns of candidates for one query.
+
+    prices, novelty_scores, seen_counts: integer arrays (seen counts are
+    non-negative). vibe_masks: uint64
+    masks built with vibe_mask() over the same vocabulary as `query_mask`.
+    in_season: bools (cheapest date falls in a best month). has_query_vibes
+    mirrors `bool(query.vibes)` — a query can name vibes no candidate has.
+
+    Returns float64 scores; candidates score() would filter out (more than 15%
+    over budget) are NaN.
+    """
+    prices = np.asarray(prices, dtype=np.int64)
+    ratio = prices / budget_usd
+
+    # Narrowest band last, so each assignment overrides the wider one.
+    budget_fit = np.full(len(prices), np.nan)
+    budget_fit[ratio <= 1.15] = 0.5
+    budget_fit[ratio <= 1.00] = 1.0
+    budget_fit[ratio < 0.70] = 0.6
+    budget_fit[ratio < 0.50] = 0.4
+
+    seen = np.asarray(seen_counts, dtype=np.int64)
+    novelty = _SEEN_NOVELTY[np.minimum(seen, 2)]
+
+    if not has_query_vibes:
+        vibe_match = np.ones(len(prices))
+    else:
+        masks = np.asarray(vibe_masks, dtype=np.uint64)
+        overlap = _popcount(masks & np.uint64(query_mask))
+        vibe_match = np.minimum(1.0, 0.5 + (0.15 * overlap))
+
+    seasonality = np.where(np.asarray(in_season, dtype=bool), 1.0, 0.6)
+
+    novelty_bonus = 1.0 + (np.asarray(novelty_scores, dtype=np.int64) - 3) * 0.05
+
+    return budget_fit * novelty * vibe_match * seasonality * novelty_bonus
+
+
+def top_k(scores: np.ndarray, novelty_scores, prices, k: int,
+          keep: Optional[np.ndarray] = None) -> np.ndarray:
+    """Indices of the k best candidates: score desc, then novelty desc, then
+    price asc, then original order. NaN scores (and rows where `keep` is
+    False) are never returned."""
+    scores = np.asarray(scores, dtype=np.float64)
+    eligible = ~np.isnan(scores)
+    if keep is not None:
+        eligible &= np.asarray(keep, dtype=bool)
+    idx = np.flatnonzero(eligible)
+    # lexsort is stable and sorts by the LAST key first.
+    order = np.lexsort((
+        np.asarray(prices, dtype=np.int64)[idx],
+        -np.asarray(novelty_scores, dtype=np.int64)[idx],
+        -scores[idx],
+    ))
+    return idx[order[:k]]
+
+
+@dataclass(frozen=True)
+class CandidateColumns:
+    """A candidate pool as columns, built once and reusable across queries
+    (nothing in here depends on the query or the session)."""
+    iatas: tuple
+    prices: np.ndarray
+    novelty_scores: np.ndarray
+    vibe_masks: np.ndarray
+    in_season: np.ndarray
+    vocab: dict
+
+    @classmethod
+    def from_candidates(cls, candidates: list[Candidate]) -> "CandidateColumns":
+        vocab = vibe_vocabulary(*(c.vibes for c in candidates))
+        n = len(candidates)
+        return cls(
+            iatas=tuple(c.iata for c in candidates),
+            prices=np.fromiter((c.price_usd for c in candidates), np.int64, n),
+            novelty_scores=np.fromiter((c.novelty_score for c in candidates), np.int64, n),
+            vibe_masks=np.fromiter((vibe_mask(c.vibes, vocab) for c in candidates),
+                                   np.uint64, n),
+            in_season=np.fromiter((bool(c.cheapest_date_in_best_months)
+                                   for c in candidates), bool, n),
+            vocab=vocab,
+        )
+
+    def __len__(self) -> int:
+        return len(self.iatas)
+
+
+def rank_columns(cols: CandidateColumns, query: UserQuery, session: SessionState,
+                 k: int, require_vibe_overlap: bool = False,
+                 keep: Optional[np.ndarray] = None) -> list[tuple[int, float]]:
+    """Score a column pool for one query and return the top k as
+    [(row index, score)]. With require_vibe_overlap, candidates sharing no vibe
+    with a vibe-filtered query are dropped (the /go rule). `keep` is an extra
+    row mask (e.g. a price cutoff over a wider cached pool)."""
+    if not len(cols):
+        return []
+    # Query vibes no candidate has can't add overlap, so dropping them from the
+    # mask is exact; has_query_vibes still records that the query named some.
+    query_mask = vibe_mask(query.vibes, cols.vocab)
+    seen_map = session.seen_count
+    if seen_map:
+        seen = np.fromiter((seen_map.get(i, 0) for i in cols.iatas), np.int64, len(cols))
+    else:
+        seen = np.zeros(len(cols), dtype=np.int64)
+    scores = score_batch(
+        cols.prices, cols.novelty_scores, cols.vibe_masks, cols.in_season, seen,
+        query.budget_usd, query_mask, has_query_vibes=bool(query.vibes),
+    )
+    if require_vibe_overlap and query.vibes:
+        overlap = (cols.vibe_masks & np.uint64(query_mask)) != 0
+        keep = overlap if keep is None else (np.asarray(keep, dtype=bool) & overlap)
+    idx = top_k(scores, cols.novelty_scores, cols.prices, k, keep=keep)
+    return [(int(i), float(scores[i])) for i in idx]
+
+
+def rank(candidates: list[Candidate], query: UserQuery, session: SessionState,
+         k: int, require_vibe_overlap: bool = False) -> list[tuple[int, float]]:
+    """The top k of a plain candidate list as [(index, score)], ordered like
+    rank_columns(). This scores with the score() loop: building columns for
+    one query costs more than the batch scoring saves at every pool size
+    bench_ranking measures, so callers that rank one pool many times should
+    build CandidateColumns once and use rank_columns() instead."""
+    wanted = set(query.vibes) if require_vibe_overlap and query.vibes else None
+    scored = []
+    for i, c in enumerate(candidates):
+        s = score(c, query, session)
+        if s is None or (wanted is not None and not wanted & set(c.vibes)):
+            continue
+        scored.append((-s, -c.novelty_score, c.price_usd, i, s))
+    scored.sort()
+    return [(i, s) for *_, i, s in scored[:k]]
@@ -0,0 +1,65 @@
+"""Run ledger for the nightly refresh: which routes each run finished.
+
+If the refresh unit died hours into a run, the next start scanned every route
+again from the top, re-fetching everything that had already landed that day.
+Each refresh_all run now gets a refresh_runs row, and every route it finishes
+gets a refresh_run_routes row — written by the FareWriter in the SAME
+transaction as the route's fares, so the ledger can never claim a route whose
+writes were lost with an uncommitted batch. `--resume` skips the routes some
+run already completed today and scans the rest in the usual order.
+"""
+import json
+from datetime import date, datetime, timezone
+from typing import Optional
+
+# Ledger statuses that count as "done for today". A failed route is recorded
+# too (for the run's own accounting) but is retried on resume.
+DONE_STATUSES = ("ok", "empty")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def start_run(conn, run_date: date, resumed: bool = False) -> int:
+    """Open a run and return its id. Commits."""
+    cur = conn.execute(
+        "INSERT INTO refresh_runs (run_date, started_at, resumed, status) "
+        "VALUES (?, ?, ?, 'running')",
+        (run_date.isoformat(), _now(), 1 if resumed else 0),
+    )
+    conn.commit()
+    return cur.lastrowid
+
+
+def finish_run(conn, run_id: int, summary: dict) -> None:
+    """Close a run with its summary. Commits."""
+    conn.execute(
+        "UPDATE refresh_runs SET finished_at = ?, status = 'done', summary = ? WHERE id = ?",
+        (_now(), json.dumps(summary, default=str), run_id),
+    )
+    conn.commit()
+
+
+def completed_on(conn, run_date: date) -> set:
+    """(origin, dest, nights) finished by any run dated `run_date`."""
+    marks = ",".join("?" * len(DONE_STATUSES))
+    return {
+        (o, d, n) for o, d, n in conn.execute(
+            "SELECT rr.origin_iata, rr.dest_iata, rr.trip_nights "
+            "FROM refresh_run_routes rr JOIN refresh_runs r ON r.id = rr.run_id "
+            f"WHERE r.run_date = ? AND rr.status IN ({marks})",
+            (run_date.isoformat(), *DONE_STATUSES),
+        )
+    }
+
+
+def last_run(conn) -> Optional[dict]:
+    row = conn.execute(
+        "SELECT id, run_date, started_at, finished_at, resumed, status "
+        "FROM refresh_runs ORDER BY id DESC LIMIT 1"
+    ).fetchone()
+    if row is None:
+        return None
+    return {"id": row[0], "run_date": row[1], "started_at": row[2],
+            "finished_at": row[3], "resumed": bool(row[4]), "status": row[5]}
@@ -0,0 +1,173 @@
+"""Cross-process request budget for every Google-facing job.
+
+price_refresh, watch_runner and ad-hoc scripts share one IP but each paced
+itself (its own SLEEP_BETWEEN_CALLS, its own 429 handling) with no view of the
+others, so the only safe way to run them was to space the timers hours apart.
+SharedTokenBucket is scan_engine.TokenBucket with its state in a tiny SQLite
+file instead of process memory: every FliClient built with it — in any
+process — takes its tokens from the same bucket, and a 429 seen by ANY job
+halves the shared rate and pauses ALL of them for the cooldown.
+
+The state lives in its own file (FLI_BUDGET_PATH), not the main database: the
+refresh's FareWriter holds long write transactions there, and a token grab
+must never queue behind a batch commit. Each acquire is one short BEGIN
+IMMEDIATE transaction, which is also the cross-process lock.
+
+Time is CLOCK_MONOTONIC (time.monotonic on Linux), which is system-wide, so
+every process on the host agrees on it. It restarts near zero on a reboot,
+while the file survives one: a stored time ahead of the clock means the clock
+was reset, so the bucket rebases (updated = now, any pause capped at one
+cooldown from now) instead of waiting for the old uptime to come round again.
+"""
+import logging
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+from server.scan_engine import (DEFAULT_COOLDOWN_S, MIN_RATE_FRACTION, RECOVERY_STEP,
+                                SystemClock)
+
+log = logging.getLogger(__name__)
+
+# Aggregate ceiling across every job on the host: one request per 2s, the pace
+# the refresh has always used on its own.
+DEFAULT_MAX_RATE = 0.5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bucket (
+    id            INTEGER PRIMARY KEY CHECK (id = 1),
+    max_rate      REAL NOT NULL,
+    rate          REAL NOT NULL,
+    burst         INTEGER NOT NULL,
+    tokens        REAL NOT NULL,
+    updated       REAL NOT NULL,
+    paused_until  REAL NOT NULL DEFAULT 0,
+    slowdowns     INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class SharedTokenBucket:
+    """Same interface as scan_engine.TokenBucket (acquire / slow_down /
+    recover / slowdowns), backed by a SQLite file shared across processes.
+
+    Constructing one (re)applies `rate` and `burst` as the shared ceiling, so
+    the last-started job's configuration wins; all jobs read it from one env.
+    """
+
+    def __init__(self, path: str, rate: float = DEFAULT_MAX_RATE, burst: int = 1,
+                 clock=None, cooldown_s: float = DEFAULT_COOLDOWN_S):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.path = path
+        self.clock = clock or SystemClock()
+        self.max_rate = rate
+        self.burst = max(1, int(burst))
+        self.cooldown_s = cooldown_s
+        self.slowdowns = 0            # seen by THIS process
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(_SCHEMA)
+        with self._txn() as c:
+            now = self.clock.monotonic()
+            c.execute(
+                "INSERT OR IGNORE INTO bucket (id, max_rate, rate, burst, tokens, updated) "
+                "VALUES (1, ?, ?, ?, ?, ?)",
+                (rate, rate, self.burst, float(self.burst), now))
+            c.execute("UPDATE bucket SET max_rate = ?, burst = ?, rate = MIN(rate, ?) "
+                      "WHERE id = 1", (rate, self.burst, rate))
+            self._rebase(c, now)
+
+    def _txn(self):
+        bucket = self
+
+        class _Txn:
+            def __enter__(self):
+                bucket._lock.acquire()
+                bucket._conn.execute("BEGIN IMMEDIATE")
+                return bucket._conn
+
+            def __exit__(self, exc_type, *exc):
+                try:
+                    bucket._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+                finally:
+                    bucket._lock.release()
+                return False
+
+        return _Txn()
+
+    def _row(self, c) -> tuple:
+        return c.execute(
+            "SELECT rate, tokens, updated, paused_until, max_rate, burst FROM bucket WHERE id = 1"
+        ).fetchone()
+
+    def _rebase(self, c, now: float) -> None:
+        """Clock reset (reboot): pull stored times back to `now`."""
+        c.execute("UPDATE bucket SET updated = ?, paused_until = MIN(paused_until, ?) "
+                  "WHERE id = 1 AND updated > ?", (now, now + self.cooldown_s, now))
+
+    def acquire(self) -> None:
+        """Block until the shared bucket has a token, then take it."""
+        while True:
+            with self._txn() as c:
+                now = self.clock.monotonic()
+                self._rebase(c, now)
+                rate, tokens, updated, paused_until, _max, burst = self._row(c)
+                if now < paused_until:
+                    wait = paused_until - now
+                else:
+                    if now > updated:
+                        tokens = min(burst, tokens + (now - updated) * rate)
+                        updated = now
+                    if tokens >= 1:
+                        c.execute("UPDATE bucket SET tokens = ?, updated = ? WHERE id = 1",
+                                  (tokens - 1, updated))
+                        return
+                    c.execute("UPDATE bucket SET tokens = ?, updated = ? WHERE id = 1",
+                              (tokens, updated))
+                    wait = (1 - tokens) / rate
+            self.clock.sleep(wait)
+
+    def slow_down(self) -> None:
+        """A 429 anywhere: halve the shared rate, drain it, pause every job."""
+        with self._txn() as c:
+            now = self.clock.monotonic()
+            self._rebase(c, now)
+            rate, _tokens, updated, paused_until, max_rate, _burst = self._row(c)
+            rate = max(max_rate * MIN_RATE_FRACTION, rate / 2)
+            c.execute(
+                "UPDATE bucket SET rate = ?, tokens = 0, updated = ?, paused_until = ?, "
+                "slowdowns = slowdowns + 1 WHERE id = 1",
+                (rate, max(now, updated), max(paused_until, now + self.cooldown_s)))
+        self.slowdowns += 1
+        log.info("rate-limited: ALL jobs paused %.0fs, shared rate now %.3f req/s",
+                 self.cooldown_s, rate)
+
+    def recover(self) -> None:
+        """A clean call: creep the shared rate back toward the ceiling."""
+        with self._txn() as c:
+            c.execute("UPDATE bucket SET rate = MIN(max_rate, rate + max_rate * ?) "
+                      "WHERE id = 1 AND rate < max_rate", (RECOVERY_STEP,))
+
+    def state(self) -> dict:
+        with self._txn() as c:
+            rate, tokens, _updated, paused_until, max_rate, burst = self._row(c)
+            total = c.execute("SELECT slowdowns FROM bucket WHERE id = 1").fetchone()[0]
+        return {"rate": rate, "max_rate": max_rate, "tokens": tokens, "burst": burst,
+                "paused_until": paused_until, "slowdowns_total": total}
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def from_env() -> Optional[SharedTokenBucket]:
+    """The host's shared bucket when FLI_BUDGET_PATH is set (FLI_MAX_RATE
+    req/s ceiling, default DEFAULT_MAX_RATE); None leaves pacing to each job."""
+    path = os.environ.get("FLI_BUDGET_PATH")
+    if not path:
+        return None
+    rate = float(os.environ.get("FLI_MAX_RATE") or DEFAULT_MAX_RATE)
+    return SharedTokenBucket(path, rate=rate)
@@ -0,0 +1,151 @@
+"""Concurrent, rate-governed scan engine for the nightly fare refresh.
+
+The refresh used to walk every route serially with a fixed sleep between calls,
+so wall time was (routes x (latency + sleep)) — 5-6h for one trip length. Most
+of that is waiting on Google, not on us. The engine overlaps that waiting: a
+bounded pool of workers pulls routes off a queue, and every outbound request
+first takes a token from ONE shared bucket, so the aggregate request rate stays
+exactly where we set it no matter how many workers are in flight.
+
+Adaptive slow-down: when a call comes back rate-limited (the same signal
+price_refresh._is_rate_limit_error already detects), the bucket halves its rate
+and pauses every worker for a cooldown. Each clean call after that nudges the
+rate back up toward its configured ceiling. Multiplicative decrease, additive
+increase — we back off hard and creep back, never the other way round.
+
+Time is injected (`clock`) so tests run the whole thing against
+FliClient(mock=True) with a fake clock that never actually sleeps.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional
+
+log = logging.getLogger(__name__)
+
+# Recovery step per clean call, as a fraction of the configured ceiling rate.
+RECOVERY_STEP = 0.05
+# Never slow below this fraction of the ceiling (a floor keeps a long run from
+# grinding to a halt on a burst of 429s; the cooldown does the real protecting).
+MIN_RATE_FRACTION = 0.125
+DEFAULT_COOLDOWN_S = 60.0
+
+
+class SystemClock:
+    """Real time. The fake used in tests has the same two methods."""
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every scan worker.
+
+    `rate` is tokens (requests) per second at full speed; `burst` is how many
+    may go out back-to-back after an idle spell. acquire() blocks until a token
+    is available. slow_down() / recover() are the adaptive controls.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, clock=None,
+                 cooldown_s: float = DEFAULT_COOLDOWN_S):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.clock = clock or SystemClock()
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(1, int(burst))
+        self.cooldown_s = cooldown_s
+        self._tokens = float(self.burst)
+        self._last = self.clock.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.slowdowns = 0
+
+    def _refill(self, now: float) -> None:
+        if now > self._last:
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+
+    def acquire(self) -> None:
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now = self.clock.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            self.clock.sleep(wait)
+
+    def slow_down(self) -> None:
+        """A rate-limit signal: halve the rate, drain the bucket, and pause
+        every worker for the cooldown."""
+        with self._lock:
+            now = self.clock.monotonic()
+            self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+            self._tokens = 0.0
+            self._last = max(now, self._last)
+            self._paused_until = max(self._paused_until, now + self.cooldown_s)
+            self.slowdowns += 1
+        log.info("rate-limited: pausing %.0fs, rate now %.3f req/s",
+                 self.cooldown_s, self.rate)
+
+    def recover(self) -> None:
+        """A clean call: creep back toward the configured rate."""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_STEP)
+
+
+class GovernedClient:
+    """Wraps an FliClient so every search_dates call goes through the bucket.
+
+    Rate-limit errors feed slow_down() and are re-raised unchanged, so the
+    caller's own retry/skip logic (refresh_route) still sees them.
+    """
+
+    def __init__(self, fli, limiter: TokenBucket,
+                 is_rate_limit: Optional[Callable[[Exception], bool]] = None):
+        self._fli = fli
+        self.limiter = limiter
+        self._is_rate_limit = is_rate_limit or (lambda e: False)
+
+    def search_dates(self, *args, **kwargs):
+        self.limiter.acquire()
+        try:
+            out = self._fli.search_dates(*args, **kwargs)
+        except Exception as e:
+            if self._is_rate_limit(e):
+                self.limiter.slow_down()
+            raise
+        self.limiter.recover()
+        return out
+
+
+def run_scan(tasks: Iterable, work: Callable, workers: int = 1) -> list:
+    """Run work(task) for every task on a bounded worker pool.
+
+    Returns [(task, result, error)] in task order; exactly one of result/error
+    is meaningful per entry. Work exceptions are captured, never raised, so one
+    bad route can't take down the night. workers=1 is a plain serial loop.
+    """
+    tasks = list(tasks)
+
+    def _one(task):
+        try:
+            return task, work(task), None
+        except Exception as e:  # noqa: BLE001 — reported per task to the caller
+            return task, None, e
+
+    if workers <= 1:
+        return [_one(t) for t in tasks]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan") as pool:
+        return list(pool.map(_one, tasks))
@@ -0,0 +1,266 @@
+"""Volatility-aware scan scheduler for the nightly refresh.
+
+refresh_all used to give every (origin, dest, nights) the same budget: scan
+all of them, every night. Stable long-haul routes were re-scanned as often as
+the volatile ones, and the request budget — not the catalog — capped how many
+routes we could carry. The scheduler ranks routes by how much a scan is likely
+to be worth and spends a nightly request budget from the top:
+
+- volatility: coefficient of variation of the route's daily cheapest fare over
+  the last LOOKBACK_DAYS of fare_observations (a route that never moves gains
+  little from being re-checked; floored at VOLATILITY_FLOOR so none starve);
+- age: days since the route was last scanned — staleness compounds, so value
+  is volatility x age;
+- curation: routes feeding a curated pairing leg or a curated comparison carry
+  public claims, so they're weighted CURATED_WEIGHT x.
+
+Never-scanned routes come first, then routes older than MAX_AGE_DAYS (a hard
+freshness bound for the hubs), then everything else by value. Ties keep the
+destination-major order refresh_all has always used.
+
+`python -m server.scan_scheduler --simulate` replays the price_history archive
+day by day under a given budget and reports how close the scheduler's view of
+each route's cheapest fare stays to what a full scan saw — coverage vs requests
+spent — next to an oldest-first rotation with the same budget.
+"""
+import argparse
+import math
+import os
+import statistics
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterable, Optional
+
+from server import comparisons, connections, fare_archive, pairings
+
+LOOKBACK_DAYS = 28
+VOLATILITY_FLOOR = 0.02
+DEFAULT_VOLATILITY = 0.10   # fewer than two observations: assume "fairly live"
+CURATED_WEIGHT = 3.0
+MAX_AGE_DAYS = 7
+ACCURACY_TOLERANCE = 0.05   # simulation: a known fare within 5% of truth is "fresh"
+
+
+@dataclass
+class RouteState:
+    last_scanned: Optional[str]     # ISO date, None = never
+    volatility: float
+    curated: bool
+
+
+def volatility(prices: list) -> float:
+    """Coefficient of variation of a daily cheapest-fare series."""
+    if len(prices) < 2:
+        return DEFAULT_VOLATILITY
+    mean = statistics.fmean(prices)
+    if mean <= 0:
+        return DEFAULT_VOLATILITY
+    return statistics.pstdev(prices) / mean
+
+
+def curated_routes(origins: Iterable[str]) -> set:
+    """(origin, dest, nights) keys that feed a curated pairing or comparison."""
+    out = set()
+    for origin, cheap, anchor in pairings.CURATED_PAIRINGS:
+        out.add((origin, cheap, pairings.DEFAULT_NIGHTS))
+        out.add((origin, anchor, pairings.DEFAULT_NIGHTS))
+    comp_dests = {d for cheap, anchor, _ in comparisons.CURATED_COMPARISONS
+                  for d in (cheap, anchor)}
+    for origin in origins:
+        for dest in comp_dests:
+            out.add((origin, dest, comparisons.NIGHTS))
+    return out
+
+
+def route_states(conn, tasks: list, as_of: date,
+                 lookback_days: int = LOOKBACK_DAYS) -> dict:
+    """RouteState per task: volatility from the last `lookback_days` of
+    fare_observations, last scan from any record of an attempt."""
+    since = (as_of - timedelta(days=lookback_days)).isoformat()
+    series: dict = {}
+    for o, d, n, _day, price in fare_archive.query(
+        conn,
+        "SELECT origin_iata, dest_iata, trip_nights, observed_date, MIN(total_price_usd) "
+        "FROM {fare_observations} WHERE observed_date >= ? AND total_price_usd IS NOT NULL "
+        "GROUP BY origin_iata, dest_iata, trip_nights, observed_date "
+        "ORDER BY observed_date",
+        (since,), since=since,
+    ):
+        series.setdefault((o, d, n), []).append(price)
+    # Every attempt counts as a scan, not just the ones that found fares: the
+    # run ledger records empty and failed routes too, and fetch_log covers the
+    # watch scan's fetches. Otherwise a route that keeps coming back empty
+    # stays "never scanned" and eats the top of the budget every night.
+    last = {(o, d, n): day for o, d, n, day in conn.execute(
+        "SELECT origin_iata, dest_iata, trip_nights, MAX(day) FROM ("
+        "  SELECT origin_iata, dest_iata, trip_nights, observed_date AS day FROM price_history"
+        "  UNION ALL"
+        "  SELECT rr.origin_iata, rr.dest_iata, rr.trip_nights, r.run_date"
+        "  FROM refresh_run_routes rr JOIN refresh_runs r ON r.id = rr.run_id"
+        "  UNION ALL"
+        "  SELECT origin_iata, dest_iata, trip_nights, observed_date FROM fetch_log"
+        ") GROUP BY origin_iata, dest_iata, trip_nights")}
+    curated = curated_routes({t[0] for t in tasks})
+    return {t: RouteState(last_scanned=last.get(t), volatility=volatility(series.get(t, [])),
+                          curated=t in curated)
+            for t in tasks}
+
+
+def _age_days(last: Optional[str], as_of: date) -> Optional[int]:
+    if last is None:
+        return None
+    return max(0, (as_of - date.fromisoformat(last)).days)
+
+
+def priority(state: RouteState, as_of: date) -> tuple:
+    """Sort key (lower first): (tier, -value). Tier 0 never scanned, 1 overdue
+    past MAX_AGE_DAYS, 2 everything else."""
+    age = _age_days(state.last_scanned, as_of)
+    if age is None:
+        return (0, -math.inf)
+    value = max(state.volatility, VOLATILITY_FLOOR) * age
+    if state.curated:
+        value *= CURATED_WEIGHT
+    return (1 if age >= MAX_AGE_DAYS else 2, -value)
+
+
+def rank_tasks(tasks: list, states: dict, as_of: date) -> list:
+    """`tasks` (already destination-major) ordered by scan value; stable."""
+    return sorted(tasks, key=lambda t: priority(states[t], as_of))
+
+
+def plan(conn, tasks: list, budget: Optional[int], as_of: Optional[date] = None) -> list:
+    """The tasks to scan tonight, best first. budget None = all of them."""
+    as_of = as_of or date.today()
+    ranked = rank_tasks(tasks, route_states(conn, tasks, as_of), as_of)
+    return ranked if budget is None else ranked[:max(0, budget)]
+
+
+# ---------- simulation ----------
+
+def _load_archive(conn, trip_lengths) -> dict:
+    """{day: {(o, d, n): cheapest}} from price_history."""
+    marks = ",".join("?" * len(trip_lengths))
+    by_day: dict = {}
+    for o, d, n, day, price in conn.execute(
+        "SELECT origin_iata, dest_iata, trip_nights, observed_date, cheapest_price_usd "
+        f"FROM price_history WHERE trip_nights IN ({marks}) AND cheapest_price_usd IS NOT NULL",
+        tuple(trip_lengths),
+    ):
+        by_day.setdefault(day, {})[(o, d, n)] = price
+    return by_day
+
+
+def simulate(conn, budget: int, trip_lengths=(pairings.DEFAULT_NIGHTS,),
+             strategy: str = "scheduler") -> Optional[dict]:
+    """Replay the archive with `budget` requests a day.
+
+    Day one is taken as a full scan (as today's catalog is); on each later day
+    the strategy picks which routes to "scan", learning only what those scans
+    reveal. Reported per day and overall: requests spent, and the share of
+    routes (with a true fare that day) whose known fare is within
+    ACCURACY_TOLERANCE of it. strategy: "scheduler" or "oldest" (rotation)."""
+    archive = _load_archive(conn, trip_lengths)
+    days = sorted(archive)
+    if len(days) < 2:
+        return None
+    universe = sorted({k for obs in archive.values() for k in obs},
+                      key=lambda t: (t[1], t[0], t[2]))
+    curated = curated_routes({t[0] for t in universe})
+    known: dict = {}      # task -> price
+    seen: dict = {}       # task -> [prices revealed], for volatility
+    last: dict = {}       # task -> day
+    for t, price in archive[days[0]].items():
+        known[t], seen[t], last[t] = price, [price], days[0]
+
+    spent = 0
+    fresh_total = 0
+    truth_total = 0
+    per_day = []
+    for day in days[1:]:
+        as_of = date.fromisoformat(day)
+        states = {t: RouteState(last_scanned=last.get(t),
+                                volatility=volatility(seen.get(t, [])[-LOOKBACK_DAYS:]),
+                                curated=t in curated)
+                  for t in universe}
+        if strategy == "oldest":
+            order = sorted(universe, key=lambda t: last.get(t) or "")
+        else:
+            order = rank_tasks(universe, states, as_of)
+        picked = order[:budget]
+        truth = archive[day]
+        for t in picked:
+            if t in truth:
+                known[t] = truth[t]
+                seen.setdefault(t, []).append(truth[t])
+                last[t] = day
+        fresh = sum(1 for t, p in truth.items()
+                    if t in known and abs(known[t] - p) <= ACCURACY_TOLERANCE * p)
+        spent += len(picked)
+        fresh_total += fresh
+        truth_total += len(truth)
+        per_day.append({"day": day, "requests": len(picked),
+                        "fresh_pct": round(100 * fresh / len(truth), 1) if truth else None})
+    return {
+        "strategy": strategy,
+        "budget_per_day": budget,
+        "routes": len(universe),
+        "days": len(per_day),
+        "requests": spent,
+        "full_scan_requests": len(universe) * len(per_day),
+        "fresh_pct": round(100 * fresh_total / truth_total, 1) if truth_total else None,
+        "per_day": per_day,
+    }
+
+
+def _pct(value) -> str:
+    return "-" if value is None else f"{value}"
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Adaptive scan scheduler: plan or simulate.")
+    ap.add_argument("--db", default=os.environ.get("DATABASE_PATH", "/var/lib/promptiv/teaser.sqlite"))
+    ap.add_argument("--simulate", action="store_true",
+                    help="replay the archive and report coverage vs requests spent")
+    ap.add_argument("--budgets", default="",
+                    help="comma-separated requests/day to simulate (default: 25/50/75/100%% of routes)")
+    ap.add_argument("--nights", default=str(pairings.DEFAULT_NIGHTS),
+                    help="comma-separated trip lengths to simulate")
+    ap.add_argument("--budget", type=int, default=None, help="plan: requests to spend tonight")
+    ap.add_argument("--show", type=int, default=20, help="plan: rows to print")
+    args = ap.parse_args()
+    trip_lengths = tuple(int(n) for n in args.nights.split(","))
+
+    conn = connections.connect(args.db)
+    try:
+        if args.simulate:
+            n_routes = conn.execute(
+                "SELECT COUNT(*) FROM routes").fetchone()[0] * len(trip_lengths)
+            budgets = ([int(b) for b in args.budgets.split(",")] if args.budgets
+                       else [max(1, n_routes * f // 4) for f in (1, 2, 3, 4)])
+            if len(_load_archive(conn, trip_lengths)) < 2:
+                print("archive has fewer than two days; nothing to replay")
+                return 1
+            print(f"{'budget/day':>10} {'strategy':>10} {'requests':>9} {'vs full':>8} {'fresh%':>7}")
+            for b in budgets:
+                for strategy in ("scheduler", "oldest"):
+                    r = simulate(conn, b, trip_lengths, strategy)
+                    share = r["requests"] / r["full_scan_requests"] if r["full_scan_requests"] else 0
+                    print(f"{b:>10} {strategy:>10} {r['requests']:>9} {share:>7.0%} {_pct(r['fresh_pct']):>7}")
+            return 0
+        tasks = [(o, d, n) for o, d in conn.execute(
+            "SELECT origin_iata, dest_iata FROM routes ORDER BY dest_iata, origin_iata")
+            for n in trip_lengths]
+        today = date.today()
+        states = route_states(conn, tasks, today)
+        for t in plan(conn, tasks, args.budget, today)[:args.show]:
+            s = states[t]
+            print(f"{t[0]}->{t[1]} {t[2]}n  last={s.last_scanned}  vol={s.volatility:.3f}"
+                  f"{'  curated' if s.curated else ''}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,128 @@
+"""Content-hash manifest for incremental static-site regeneration.
+
+scripts/generate_hubs.py used to re-render and rewrite every hub, budget page,
+/vs/ page, pairings.js and sitemap.xml on each run. Most of them are identical
+from one day to the next, so that was wasted CPU and disk writes on a 1 GB
+droplet, and every rewrite reset nginx's Last-Modified/ETag for pages that had
+not changed.
+
+The manifest (table regen_manifest) records, per output path, a hash of the
+page's render inputs, a hash of the bytes last written, and the date the page
+last changed. A page is re-rendered only when its input hash moved (or the
+file went missing), and written only when the rendered bytes differ from
+what is on disk. `changed_on` is the page's honest freshness date: it moves
+only when the page does, so the "Prices updated" line and sitemap lastmod stay
+stable for unchanged pages.
+
+The input hash includes a fingerprint of the renderer source files, so a
+template change re-renders everything once.
+"""
+import hashlib
+import json
+from datetime import date
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+
+def _sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def inputs_hash(inputs) -> str:
+    """Stable hash of a JSON-able render input (dates etc. via str())."""
+    return _sha(json.dumps(inputs, sort_keys=True, default=str,
+                           separators=(",", ":")).encode("utf-8"))
+
+
+def source_fingerprint(modules: Iterable) -> str:
+    """Hash of the given modules' source files."""
+    h = hashlib.sha256()
+    for mod in modules:
+        h.update(Path(mod.__file__).read_bytes())
+    return h.hexdigest()
+
+
+class Manifest:
+    """Per-run view of regen_manifest for one public/ directory.
+
+    `conn` is committed by the caller after the run. `force` re-renders every
+    page (still writing only changed bytes).
+    """
+
+    def __init__(self, conn, public_dir: Path, today: Optional[str] = None,
+                 fingerprint: str = "", force: bool = False):
+        self.conn = conn
+        self.public_dir = Path(public_dir)
+        self.today = today or date.today().isoformat()
+        self.fingerprint = fingerprint
+        self.force = force
+        self.changed_on: dict[str, str] = {}
+        self.rendered = 0
+        self.skipped = 0
+        self.written = 0
+        self.unchanged = 0
+
+    def _row(self, path: str):
+        return self.conn.execute(
+            "SELECT input_hash, content_hash, changed_on FROM regen_manifest WHERE path = ?",
+            (path,),
+        ).fetchone()
+
+    def _save(self, path, input_hash, content_hash, changed_on) -> None:
+        self.conn.execute(
+            """INSERT INTO regen_manifest (path, input_hash, content_hash, changed_on)
+               VALUES (?, ?, ?, ?)
+               ON CONFLICT(path) DO UPDATE SET input_hash = excluded.input_hash,
+                   content_hash = excluded.content_hash,
+                   changed_on = excluded.changed_on""",
+            (path, input_hash, content_hash, changed_on),
+        )
+
+    def _write_if_changed(self, target: Path, data: bytes) -> bool:
+        if target.exists() and target.read_bytes() == data:
+            self.unchanged += 1
+            return False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        self.written += 1
+        return True
+
+    def page(self, path: str, inputs, render: Callable[[str], str]) -> str:
+        """Ensure public/<path> is current. `render(freshness)` produces the
+        page text; it is called only if `inputs` changed since the last run or
+        the file is missing. Returns the page's changed_on date."""
+        target = self.public_dir / path
+        ih = inputs_hash([self.fingerprint, inputs])
+        row = self._row(path)
+        if row is not None and row[0] == ih and not self.force and target.exists():
+            self.skipped += 1
+            self.changed_on[path] = row[2]
+            return row[2]
+        # Same inputs (forced, or the file was lost) keep their old date; a
+        # real input change is dated today.
+        changed_on = row[2] if row is not None and row[0] == ih else self.today
+        data = render(changed_on).encode("utf-8")
+        self.rendered += 1
+        self._write_if_changed(target, data)
+        self._save(path, ih, _sha(data), changed_on)
+        self.changed_on[path] = changed_on
+        return changed_on
+
+    def file(self, path: str, text: str) -> bool:
+        """Write a cheap-to-build file (sitemap, pairings.js) only if its bytes
+        changed. Returns True when written."""
+        data = text.encode("utf-8")
+        written = self._write_if_changed(self.public_dir / path, data)
+        row = self._row(path)
+        changed_on = self.today if written or row is None else row[2]
+        self._save(path, "", _sha(data), changed_on)
+        self.changed_on[path] = changed_on
+        return written
+
+    def latest_change(self) -> str:
+        """Most recent changed_on among the pages seen this run."""
+        return max(self.changed_on.values(), default=self.today)
+
+    def stats(self) -> dict:
+        return {"rendered": self.rendered, "skipped": self.skipped,
+                "written": self.written, "unchanged": self.unchanged}
@@ -5,7 +5,10 @@ bottom-15% percentile (night 14+); user ceiling (anytime).
 Covenant: <=1 alert / 7 days, overridden only by a >=20% single-night drop.
 Reports observed history only — never forecasts.
 """
-from datetime import date
+from datetime import date, timedelta
+
+from server import fare_archive
+from server.watches import WINDOW_END_MAX_DAYS_OUT
 
 DROP_FACTOR = 0.88        # today <= 88% of trailing low  => drop trigger
 OVERRIDE_FACTOR = 0.80    # today <= 80% of trailing low  => covenant override
@@ -72,15 +75,24 @@ def nightly_best(conn, watch, observed_date: str):
 
 
 def series_for(conn, watch, before_date: str):
-    """Prior nightly bests [(observed_date, best_price)], oldest first."""
-    rows = conn.execute(
+    """Prior nightly bests [(observed_date, best_price)], oldest first.
+    Reads archived months too (fare_archive), from `window_start` less
+    WINDOW_END_MAX_DAYS_OUT on: no watch can be created that far ahead of a
+    departure, so no watch row in the window was observed earlier. The bound
+    is in the SQL as well as the ATTACH range, so archiving never changes the
+    answer; it just stops each night's read growing with the archive."""
+    since = (date.fromisoformat(watch["window_start"])
+             - timedelta(days=WINDOW_END_MAX_DAYS_OUT)).isoformat()
+    rows = fare_archive.query(
+        conn,
         """SELECT observed_date, MIN(total_price_usd)
-           FROM fare_observations
+           FROM {fare_observations}
            WHERE origin_iata=? AND dest_iata=? AND trip_nights=?
-             AND source='watch' AND observed_date < ?
+             AND source='watch' AND observed_date >= ? AND observed_date < ?
              AND departure_date >= ? AND departure_date <= ?
              AND total_price_usd IS NOT NULL
            GROUP BY observed_date ORDER BY observed_date""",
         (watch["origin_iata"], watch["dest_iata"], watch["trip_nights"],
-         before_date, watch["window_start"], watch["window_end"])).fetchall()
+         since, before_date, watch["window_start"], watch["window_end"]),
+        since=since, until=before_date)
     return [(r[0], r[1]) for r in rows]
@@ -6,6 +6,8 @@ Honesty rules: observed history only; always 'prices move, verify before booking
 from datetime import datetime
 from urllib.parse import quote
 
+from server.catalog import get_catalog
+
 CREAM = "#f5f3ee"; CARD = "#ffffff"; BORDER = "#ece9e1"
 INK = "#1a1a1f"; BODY = "#3a3a42"; MUTE = "#8a8a92"; ACCENT = "#a78bfa"
 GREEN = "#0f7d64"
@@ -18,11 +20,9 @@ def _fmt_date(iso):
 
 
 def _dest_name(conn, iata):
-    row = conn.execute(
-        "SELECT city, country, avg_daily_cost_usd FROM destinations WHERE iata=?",
-        (iata,)).fetchone()
-    if row:
-        return row[0], row[1], row[2]
+    d = get_catalog(conn).get(iata)
+    if d:
+        return d.city, d.country, d.avg_daily_cost_usd
     return iata, None, None
 
 
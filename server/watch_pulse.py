@@ -2,11 +2,10 @@
 Idempotent per (watch, day) via watch_events kind='pulse'."""
 import logging
 import os
-import sqlite3
 import time
 from datetime import date, datetime, timezone
 
-from server import email_client, watches, watch_brain, watch_emails
+from server import connections, email_client, watches, watch_brain, watch_emails
 
 log = logging.getLogger("watch_pulse")
 SLEEP_BETWEEN_SENDS = 0.4
@@ -69,8 +68,7 @@ def send_pulses(conn, base_url: str, today: date | None = None,
 def main() -> int:
     logging.basicConfig(level=logging.INFO)
     db_path = os.environ.get("DATABASE_PATH", "./teaser.dev.sqlite")
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
+    conn = connections.connect(db_path)
     try:
         send_pulses(conn, base_url=os.environ.get("BASE_URL", "https://dashaway.io"))
     finally:
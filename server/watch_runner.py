@@ -1,21 +1,27 @@
 """Nightly watch scan: one paced SearchDates request per distinct watched route.
 
 Spec rules honored here:
-- pacing between requests (politeness; shares the warmed IP with the refresh)
+- pacing between requests (politeness; shares the warmed IP with the refresh).
+  With FLI_BUDGET_PATH set, pacing comes from the host-wide request budget
+  (request_budget) instead of a private sleep, so this can overlap the refresh
+- no request at all when today's refresh already fetched a window covering the
+  watch's (server/fetch_cache.py); hit rates go in the summary
 - plausibility guard reused from price_refresh
-- ANY 429 aborts the entire night (never retry into a block) + ops alert
+- ANY 429 aborts the entire night (never retry into a block) + ops alert; with
+  the shared budget it also pauses every other fli job on the host
 - alerts via watch_brain decisions; covenant enforced via last_alert_at
 - ops summary email at the end of every run
 """
 import json
 import logging
 import os
-import sqlite3
 import time
 from datetime import date, datetime, timedelta, timezone
 
-from server import email_client, watches, watch_brain, watch_emails
+from server import (connections, email_client, fetch_cache, request_budget, watches,
+                    watch_brain, watch_emails)
 from server.price_refresh import _plausible
+from server.scan_engine import GovernedClient
 
 log = logging.getLogger("watch_runner")
 
@@ -38,13 +44,19 @@ def _ops_email(subject: str, body: str) -> None:
 
 
 def run(conn, fli=None, sleep_s: float = SLEEP_BETWEEN_CALLS,
-        today: date | None = None, base_url: str = "https://dashaway.io") -> dict:
+        today: date | None = None, base_url: str = "https://dashaway.io",
+        limiter=None) -> dict:
     today = today or date.today()
     observed = today.isoformat()
     fetched_at = datetime.now(timezone.utc).isoformat()
     if fli is None:
         from server.fli_client import FliClient
         fli = FliClient()
+    if limiter is not None:
+        # The shared budget paces every request (and a 429 here pauses the
+        # other jobs too); the private sleep would only double the spacing.
+        fli = GovernedClient(fli, limiter, is_rate_limit=_is_429)
+        sleep_s = 0
 
     active = watches.active_watches(conn)
     groups: dict[tuple, list[dict]] = {}
@@ -57,7 +69,8 @@ def run(conn, fli=None, sleep_s: float = SLEEP_BETWEEN_CALLS,
     tomorrow = today + timedelta(days=1)
     summary = {"watches": len(active), "routes": len(groups), "scanned": 0,
                "errors": 0, "alerts": 0, "obs_written": 0, "empty_routes": 0,
-               "expired": 0, "aborted_429": False}
+               "expired": 0, "aborted_429": False,
+               "cache_hits": 0, "cache_misses": 0}
 
     for i, ((origin, dest, ws, we, nights), members) in enumerate(groups.items()):
         # Windows age: a stored window_start that has slipped into the past is
@@ -74,21 +87,30 @@ def run(conn, fli=None, sleep_s: float = SLEEP_BETWEEN_CALLS,
             log.info("%s->%s window fully past; expired %d watch(es)",
                      origin, dest, len(members))
             continue
-        try:
-            results = fli.search_dates(origin, dest, search_start,
-                                       search_end, nights)
-        except Exception as e:
-            if _is_429(e):
-                summary["aborted_429"] = True
-                log.error("429 from Google on %s->%s; ABORTING the night", origin, dest)
-                _ops_email("WATCHES: 429 — night aborted",
-                           f"429 on {origin}->{dest} after {summary['scanned']} "
-                           f"routes. Job stopped to protect the IP. {e}")
-                break
-            summary["errors"] += 1
-            summary["scanned"] += 1
-            log.warning("%s->%s scan error (skipping route): %s", origin, dest, e)
-            continue
+        # Today's refresh (or an earlier watch group) may already have fetched
+        # a window covering this one: serve it from fare_observations.
+        results = fetch_cache.lookup(conn, origin, dest, nights, search_start,
+                                     search_end, observed)
+        from_cache = results is not None
+        if from_cache:
+            summary["cache_hits"] += 1
+        else:
+            summary["cache_misses"] += 1
+            try:
+                results = fli.search_dates(origin, dest, search_start,
+                                           search_end, nights)
+            except Exception as e:
+                if _is_429(e):
+                    summary["aborted_429"] = True
+                    log.error("429 from Google on %s->%s; ABORTING the night", origin, dest)
+                    _ops_email("WATCHES: 429 — night aborted",
+                               f"429 on {origin}->{dest} after {summary['scanned']} "
+                               f"routes. Job stopped to protect the IP. {e}")
+                    break
+                summary["errors"] += 1
+                summary["scanned"] += 1
+                log.warning("%s->%s scan error (skipping route): %s", origin, dest, e)
+                continue
 
         kept = [r for r in (results or []) if _plausible(r.total_price_usd)]
         for r in kept:
@@ -102,12 +124,15 @@ def run(conn, fli=None, sleep_s: float = SLEEP_BETWEEN_CALLS,
                  r.trip_nights, r.total_price_usd, r.stops,
                  json.dumps(r.carrier_codes) if r.carrier_codes else None,
                  observed, fetched_at))
-        conn.commit()
-        summary["scanned"] += 1
         summary["obs_written"] += len(kept)
-        if not kept:
-            summary["empty_routes"] += 1
-            log.warning("%s->%s returned EMPTY (possible soft-block)", origin, dest)
+        if not from_cache:
+            fetch_cache.record(conn, origin, dest, nights, search_start, search_end,
+                               observed, "watch", fetched_at, len(kept))
+            summary["scanned"] += 1
+            if not kept:
+                summary["empty_routes"] += 1
+                log.warning("%s->%s returned EMPTY (possible soft-block)", origin, dest)
+        conn.commit()
 
         for w in members:
             best = watch_brain.nightly_best(conn, w, observed)
@@ -134,11 +159,14 @@ def run(conn, fli=None, sleep_s: float = SLEEP_BETWEEN_CALLS,
             conn.commit()
             summary["alerts"] += 1
 
-        if i + 1 < len(groups) and sleep_s:
+        if i + 1 < len(groups) and sleep_s and not from_cache:
             time.sleep(sleep_s)
 
     runtime = time.monotonic() - t0
     summary["runtime_s"] = round(runtime)
+    looked_up = summary["cache_hits"] + summary["cache_misses"]
+    summary["cache_hit_rate"] = (round(summary["cache_hits"] / looked_up, 3)
+                                 if looked_up else None)
     tripwires = []
     if runtime > RUNTIME_TRIPWIRE_S:
         tripwires.append(f"runtime {runtime / 3600:.1f}h > 3h")
@@ -161,10 +189,9 @@ def main() -> int:
     logging.basicConfig(level=logging.INFO,
                         format="%(asctime)s %(name)s %(levelname)s %(message)s")
     db_path = os.environ.get("DATABASE_PATH", "./teaser.dev.sqlite")
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
+    conn = connections.connect(db_path)
     try:
-        run(conn)
+        run(conn, limiter=request_budget.from_env())
     finally:
         conn.close()
     return 0
@@ -48,3 +48,11 @@ def seeded_client_for_gate(client, temp_db_path):
     finally:
         conn.close()
     return client
+
+
+@pytest.fixture(autouse=True)
+def _close_pooled_connections():
+    """Each test gets its own DB file; drop the previous test's pooled connections."""
+    yield
+    from server import connections
+    connections.close_all()
@@ -112,3 +112,25 @@ def test_schema_ld_is_valid_json_and_carries_no_offers():
     # Breadcrumb reflects the 3-level hierarchy.
     bc = next(g for g in data["@graph"] if g["@type"] == "BreadcrumbList")
     assert [el["name"] for el in bc["itemListElement"]] == ["Home", "Nashville", "Trips under $1,000"]
+
+
+def test_bands_share_one_hub_build(conn):
+    from server import hubs
+    ctx = hubs.HubContext(conn)
+    assert budget_pages.published_bands(conn, "BNA", ctx=ctx) == [1000, 1500]
+    budget_pages.build_budget_page(conn, "BNA", 1000, ctx=ctx)
+    assert ctx.builds == 1
+
+
+def test_single_page_without_context_skips_the_cost_matrix(conn, monkeypatch):
+    from server import hubs
+    ctx = hubs.HubContext(conn)
+    expected = (budget_pages.published_bands(conn, "BNA", ctx=ctx),
+                budget_pages.build_budget_page(conn, "BNA", 1000, ctx=ctx))
+
+    def no_matrix(conn):
+        raise AssertionError("CostMatrix.load for a single page")
+
+    monkeypatch.setattr(hubs.CostMatrix, "load", no_matrix)
+    assert (budget_pages.published_bands(conn, "BNA"),
+            budget_pages.build_budget_page(conn, "BNA", 1000)) == expected
@@ -0,0 +1,54 @@
+"""Tests for the in-process destination catalog cache."""
+import sqlite3
+
+import pytest
+
+from server import catalog
+from server.migrations import init_schema
+
+
+@pytest.fixture
+def db(temp_db_path):
+    init_schema(temp_db_path)
+    conn = sqlite3.connect(temp_db_path)
+    conn.execute("INSERT INTO destinations VALUES ('MEX','Mexico City','Mexico','MX','LA','[\"food\",\"culture\"]',1,0,'[3,4,11]',60,2,'MXN',19.4,-99.1,NULL,3)")
+    conn.execute("INSERT INTO destinations VALUES ('LIS','Lisbon','Portugal','PT','EU','[\"food\"]',1,0,'[]',120,1,'EUR',38.7,-9.1,NULL,2)")
+    conn.commit()
+    yield conn
+    conn.close()
+    catalog.invalidate()
+
+
+def test_catalog_decodes_destinations(db):
+    cat = catalog.get_catalog(db)
+    assert len(cat) == 2 and "MEX" in cat
+    mex = cat.get("MEX")
+    assert mex.vibes == frozenset({"food", "culture"})
+    assert mex.vibes_list == ("food", "culture")
+    assert mex.best_months == (3, 4, 11)
+    assert mex.in_season(4) and not mex.in_season(5)
+    assert mex.avg_daily_cost_usd == 60
+    assert cat.get("LIS").month_mask == 0
+    assert cat.get("XXX") is None
+
+
+def test_catalog_is_cached_until_version_moves(db):
+    first = catalog.get_catalog(db)
+    assert catalog.get_catalog(db) is first
+    db.execute("UPDATE destinations SET avg_daily_cost_usd=75 WHERE iata='MEX'")
+    db.commit()
+    second = catalog.get_catalog(db)
+    assert second is not first
+    assert second.version > first.version
+    assert second.get("MEX").avg_daily_cost_usd == 75
+
+
+def test_catalog_sees_inserts_and_deletes(db):
+    catalog.get_catalog(db)
+    db.execute("DELETE FROM destinations WHERE iata='LIS'")
+    db.commit()
+    assert "LIS" not in catalog.get_catalog(db)
+
+
+def test_month_mask_ignores_junk():
+    assert catalog.month_mask([1, 12, 13, "x", 0]) == (1 | 1 << 11)
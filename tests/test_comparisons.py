@@ -77,3 +77,38 @@ def test_render_has_seo_breakdown_proof_and_breadcrumb_no_offers(conn):
     assert "Prices updated 2026-06-05." in html
     assert '"BreadcrumbList"' in html and "application/ld+json" in html
     assert "Offer" not in html and '"price"' not in html and "Product" not in html
+
+
+def test_discover_finds_robust_cheap_flight_dear_week_flips(conn):
+    flips = comparisons.discover_flips(conn)
+    # CHP vs ANC: flight dearer (400 > 250), week cheaper, 3/3. WOB only 2/3.
+    assert [(f["cheap_iata"], f["anchor_iata"]) for f in flips] == [("CHP", "ANC")]
+    f = flips[0]
+    assert (f["cheap_total"], f["anchor_total"], f["margin"]) == (750, 1160, 410)
+    assert (f["wins"], f["origins"], f["curated"]) == (3, 3, False)
+    assert comparisons.discover_flips(conn, min_robust=2)[1]["cheap_iata"] == "WOB"
+
+
+def test_discover_agrees_with_build_comparison(temp_db_path, monkeypatch):
+    import random
+    monkeypatch.setattr(comparisons, "MIN_ROBUST", 4)
+    init_schema(temp_db_path)
+    c = sqlite3.connect(temp_db_path)
+    rng = random.Random(7)
+    dests = [f"D{i:02d}" for i in range(15)]
+    for d in dests:
+        _dest(c, d, f"City {d}", rng.randint(40, 220))
+    for o in [f"O{i}" for i in range(6)]:
+        for d in dests:
+            if rng.random() < 0.85:
+                _ph(c, o, d, rng.randint(150, 1000))
+    c.commit()
+    found = {(f["cheap_iata"], f["anchor_iata"]) for f in comparisons.discover_flips(c)}
+    expected = set()
+    for cheap in dests:
+        for anchor in dests:
+            cmp = comparisons.build_comparison(c, cheap, anchor) if cheap != anchor else None
+            if cmp and cmp["cheap"]["airfare"] > cmp["anchor"]["airfare"]:
+                expected.add((cheap, anchor))
+    c.close()
+    assert found == expected and found
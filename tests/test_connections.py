@@ -0,0 +1,53 @@
+"""Tests for the shared connection layer (WAL + per-thread pool)."""
+import threading
+
+from server import connections
+from server.migrations import init_schema
+
+
+def test_connections_are_wal_with_busy_timeout(temp_db_path):
+    init_schema(temp_db_path)
+    with connections.connection(temp_db_path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == connections.BUSY_TIMEOUT_MS
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1   # NORMAL
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+
+
+def test_pool_reuses_per_thread_and_separates_threads(temp_db_path):
+    init_schema(temp_db_path)
+    with connections.connection(temp_db_path) as a:
+        pass
+    with connections.connection(temp_db_path) as b:
+        pass
+    assert a is b
+    other = []
+
+    def grab():
+        with connections.connection(temp_db_path) as c:
+            other.append(c)
+
+    t = threading.Thread(target=grab)
+    t.start()
+    t.join()
+    assert other[0] is not a
+
+
+def test_uncommitted_work_rolls_back_on_exit(temp_db_path):
+    init_schema(temp_db_path)
+    with connections.connection(temp_db_path) as conn:
+        conn.execute("INSERT INTO signups (email, created_at) VALUES ('x@y.z', 't')")
+    with connections.connection(temp_db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM signups").fetchone()[0] == 0
+
+
+def test_reader_not_blocked_by_open_writer(temp_db_path):
+    init_schema(temp_db_path)
+    writer = connections.connect(temp_db_path)
+    try:
+        writer.execute("INSERT INTO signups (email, created_at) VALUES ('x@y.z', 't')")
+        assert writer.in_transaction          # write lock held, not committed
+        with connections.connection(temp_db_path) as reader:
+            assert reader.execute("SELECT COUNT(*) FROM signups").fetchone()[0] == 0
+    finally:
+        writer.close()
@@ -0,0 +1,92 @@
+"""Tests for the origin x destination x nights cost matrix.
+
+The matrix replaces per-page SQL in the hubs, budget pages and comparisons, so
+every query here is checked against the number the old path computes.
+"""
+import random
+import sqlite3
+
+import pytest
+
+from server.migrations import init_schema
+from server.cost_matrix import CostMatrix
+from server import pairings
+
+
+def _dest(c, iata, daily):
+    c.execute(
+        "INSERT INTO destinations (iata, city, country, country_code, region, vibes, "
+        "passport_required, visa_required_us, best_months, avg_daily_cost_usd, "
+        "safety_tier, currency, lat, lng, base_catch, novelty_score) "
+        "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+        (iata, f"City {iata}", "Country", "CC", "LA", "[]", 1, 0, "[1]", daily, 2,
+         "USD", 0.0, 0.0, None, 3))
+
+
+def _ph(c, origin, dest, price, nights=7, day="2026-06-01"):
+    c.execute("INSERT INTO price_history (origin_iata, dest_iata, trip_nights, "
+              "cheapest_price_usd, observed_date, source) VALUES (?,?,?,?,?,'fli')",
+              (origin, dest, nights, price, day))
+
+
+ORIGINS = ["BNA", "ATL", "ORD", "DEN"]
+DESTS = [f"D{i:02d}" for i in range(12)]
+
+
+@pytest.fixture
+def conn(temp_db_path):
+    init_schema(temp_db_path)
+    c = sqlite3.connect(temp_db_path)
+    rng = random.Random(3)
+    for d in DESTS:
+        _dest(c, d, rng.randint(40, 200))
+    for o in ORIGINS:
+        for d in DESTS:
+            for nights in (5, 7):
+                if rng.random() < 0.8:
+                    for day in ("2026-06-01", "2026-06-02"):
+                        _ph(c, o, d, rng.randint(150, 900), nights, day)
+    _ph(c, "BNA", "NOPE", 99)          # priced but not in the catalog
+    c.commit()
+    yield c
+    c.close()
+
+
+def test_total_cost_matches_pairings(conn):
+    m = CostMatrix.load(conn)
+    for o in ORIGINS + ["XXX"]:
+        for d in DESTS + ["NOPE"]:
+            for nights in (5, 7, 10):
+                assert m.total_cost(o, d, nights) == pairings.total_cost(conn, o, d, nights)
+
+
+def test_ranked_and_counts(conn):
+    m = CostMatrix.load(conn)
+    ranked = m.ranked("BNA", 7)
+    expected = sorted(
+        ((d, pairings.total_cost(conn, "BNA", d, 7)) for d in DESTS
+         if pairings.total_cost(conn, "BNA", d, 7) is not None),
+        key=lambda t: (t[1], t[0]))
+    assert [(d, total) for d, _, total in ranked] == expected
+    assert "NOPE" not in [d for d, _, _ in ranked]
+    budgets = [500, 1000, 1500, 2500]
+    assert m.count_under("BNA", budgets, 7) == [
+        sum(1 for _, t in expected if t <= b) for b in budgets]
+    assert m.priced_count("BNA", 7) == len(expected)
+    assert m.ranked("XXX", 7) == [] and m.count_under("BNA", budgets, 10) == [0] * 4
+
+
+def test_wins_and_airfare_by_origin(conn):
+    m = CostMatrix.load(conn)
+    a, b = DESTS[0], DESTS[1]
+    by_a, by_b = m.airfare_by_origin(a, 7), m.airfare_by_origin(b, 7)
+    for o in ORIGINS:
+        floor = conn.execute(
+            "SELECT MIN(cheapest_price_usd) FROM price_history "
+            "WHERE origin_iata=? AND dest_iata=? AND trip_nights=7", (o, a)).fetchone()[0]
+        assert by_a.get(o) == floor
+    shared = set(by_a) & set(by_b)
+    wins = sum(1 for o in shared
+               if pairings.total_cost(conn, o, a, 7) < pairings.total_cost(conn, o, b, 7))
+    assert m.wins(a, b, 7) == (wins, len(shared))
+    assert m.wins(a, "NOPE", 7) == (0, 0)
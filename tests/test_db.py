@@ -140,3 +140,167 @@ def test_record_search_persists(temp_db_path):
         conn.close()
     assert json.loads(row[0]) == ["city", "food"]
     assert json.loads(row[1]) == ["MEX", "LIS"]
+
+
+def _best_fare_db(temp_db_path):
+    import sqlite3
+    init_schema(temp_db_path)
+    conn = sqlite3.connect(temp_db_path)
+    conn.execute("INSERT INTO airports VALUES ('BNA','Nashville','TN','Southeast',36.1,-86.7,12)")
+    conn.execute("INSERT INTO destinations VALUES ('MEX','Mexico City','Mexico','MX','LA','[\"city\"]',1,0,'[6]',60,2,'MXN',19.4,-99.1,NULL,3)")
+    conn.execute("INSERT INTO routes VALUES ('BNA','MEX','via DFW')")
+    for price, dep in [(450, '2026-06-01'), (342, '2026-07-08'), (399, '2026-06-15')]:
+        conn.execute("INSERT INTO price_snapshots (origin_iata,dest_iata,departure_date,return_date,trip_nights,total_price_usd,source,fetched_at) VALUES ('BNA','MEX',?,'x',7,?,'fli','t')",
+                     (dep, price))
+    conn.commit()
+    return conn
+
+
+def test_route_best_fares_tracks_snapshot_inserts_and_deletes(temp_db_path):
+    conn = _best_fare_db(temp_db_path)
+    try:
+        best = lambda: conn.execute(
+            "SELECT price_usd, departure_date FROM route_best_fares "
+            "WHERE origin_iata='BNA' AND dest_iata='MEX' AND trip_nights=7").fetchone()
+        card = lambda: [(c["cheapest_date_in_best_months"], c["route_catch_text"])
+                        for c in db.find_candidates(conn, "BNA", 1000, 7)]
+        assert best() == (342, "2026-07-08")
+        assert card() == [(False, "via DFW")]
+        conn.execute("DELETE FROM price_snapshots WHERE total_price_usd=342")
+        assert best() == (399, "2026-06-15")
+        assert card() == [(True, "via DFW")]      # re-picked; June is a best month
+        conn.execute("DELETE FROM price_snapshots")
+        assert best() is None
+    finally:
+        conn.close()
+
+
+def test_find_candidates_follows_destination_edits(temp_db_path):
+    """Hand edits to a destination show up on its cards straight away, with
+    the in-season flag computed against the edited best months."""
+    conn = _best_fare_db(temp_db_path)
+    try:
+        before = db.find_candidates(conn, "BNA", 1000, 7)[0]
+        assert (before["city"], before["novelty_score"],
+                before["cheapest_date_in_best_months"]) == ("Mexico City", 3, False)
+        conn.execute("UPDATE destinations SET best_months='[7]', novelty_score=5, "
+                     "city='CDMX' WHERE iata='MEX'")
+        conn.execute("UPDATE routes SET route_catch_text='nonstop' WHERE dest_iata='MEX'")
+        after = db.find_candidates(conn, "BNA", 1000, 7)[0]
+        assert after["departure_date"] == "2026-07-08"
+        assert (after["city"], after["novelty_score"], after["best_months"],
+                after["cheapest_date_in_best_months"], after["route_catch_text"]) == (
+            "CDMX", 5, [7], True, "nonstop")
+    finally:
+        conn.close()
+
+
+def test_rebuild_best_fares_matches_trigger_maintenance(temp_db_path):
+    conn = _best_fare_db(temp_db_path)
+    try:
+        before = conn.execute("SELECT * FROM route_best_fares").fetchall()
+        db.rebuild_best_fares(conn)
+        assert conn.execute("SELECT * FROM route_best_fares").fetchall() == before
+    finally:
+        conn.close()
+
+
+def test_session_seen_counts_track_record_search(initialized_db):
+    from server import connections
+    with connections.connection() as conn:
+        db.record_search(conn, "s1", "BNA", 500, 7, [], ["MEX", "LIS"])
+        db.record_search(conn, "s1", "BNA", 500, 7, [], ["MEX"])
+        db.record_search(conn, "s2", "BNA", 500, 7, [], ["LIS"])
+        conn.commit()
+        assert db.session_seen_counts(conn, "s1") == {"MEX": 2, "LIS": 1}
+        assert db.session_seen_counts(conn, "s2") == {"LIS": 1}
+        assert db.session_seen_counts(conn, "nobody") == {}
+
+
+def test_init_schema_backfills_session_seen(initialized_db):
+    import sqlite3
+    from server import connections
+    conn = sqlite3.connect(initialized_db)
+    conn.execute(
+        "INSERT INTO searches (session_id, origin_iata, budget_usd, trip_nights, "
+        "result_iatas, created_at) VALUES ('old', 'BNA', 500, 7, '[\"MEX\",\"BOG\"]', 'x')")
+    conn.execute(
+        "INSERT INTO searches (session_id, origin_iata, budget_usd, trip_nights, "
+        "result_iatas, created_at) VALUES ('old', 'BNA', 500, 7, '[\"MEX\"]', 'x')")
+    conn.commit()
+    conn.close()
+    init_schema(initialized_db)
+    with connections.connection() as conn:
+        assert db.session_seen_counts(conn, "old") == {"MEX": 2, "BOG": 1}
+
+
+def _floor(conn, origin="BNA", dest="MEX", nights=7):
+    return conn.execute(
+        "SELECT floor_usd, floor_date, last_observed, trailing_since, trailing_7d_min "
+        "FROM route_floor WHERE origin_iata=? AND dest_iata=? AND trip_nights=?",
+        (origin, dest, nights)).fetchone()
+
+
+def _history(conn, price, day, source="fli", dest="MEX"):
+    conn.execute(
+        "INSERT OR REPLACE INTO price_history (origin_iata, dest_iata, trip_nights, "
+        "cheapest_price_usd, observed_date, source) VALUES ('BNA', ?, 7, ?, ?, ?)",
+        (dest, price, day, source))
+
+
+def test_route_floor_tracks_price_history_upserts(initialized_db):
+    import sqlite3
+    conn = sqlite3.connect(initialized_db)
+    try:
+        _history(conn, 400, "2026-05-01")
+        assert _floor(conn) == (400, "2026-05-01", "2026-05-01", "2026-04-25", 400)
+        _history(conn, 300, "2026-05-03")
+        _history(conn, 450, "2026-05-12")
+        # The floor stays; the trailing window slides past both older days.
+        assert _floor(conn) == (300, "2026-05-03", "2026-05-12", "2026-05-06", 450)
+        _history(conn, 300, "2026-05-10")
+        assert _floor(conn)[:2] == (300, "2026-05-03")   # ties keep the earliest day
+        # Re-observing the floor's own day at a higher price re-picks the floor.
+        _history(conn, 500, "2026-05-03")
+        assert _floor(conn) == (300, "2026-05-10", "2026-05-12", "2026-05-06", 300)
+        # A late-arriving older day lowers the floor but not the trailing min.
+        _history(conn, 250, "2026-04-20", source="watch")
+        assert _floor(conn) == (250, "2026-04-20", "2026-05-12", "2026-05-06", 300)
+        conn.execute("DELETE FROM price_history WHERE observed_date >= '2026-05-10'")
+        assert _floor(conn) == (250, "2026-04-20", "2026-05-03", "2026-04-27", 400)
+        conn.execute("DELETE FROM price_history")
+        assert _floor(conn) is None
+    finally:
+        conn.close()
+
+
+def test_rebuild_route_floor_matches_trigger_maintenance(initialized_db):
+    import sqlite3
+    conn = sqlite3.connect(initialized_db)
+    try:
+        for i, price in enumerate([520, 480, 610, 480, 455, 700, 530, 640, 500]):
+            _history(conn, price, f"2026-06-{i + 1:02d}")
+            _history(conn, price + 30, f"2026-06-{i + 3:02d}", dest="LIS")
+        before = conn.execute("SELECT * FROM route_floor ORDER BY dest_iata").fetchall()
+        db.rebuild_route_floor(conn)
+        assert conn.execute("SELECT * FROM route_floor ORDER BY dest_iata").fetchall() == before
+        assert conn.execute(
+            "SELECT dest_iata, MIN(cheapest_price_usd) FROM price_history GROUP BY dest_iata "
+            "ORDER BY dest_iata").fetchall() == [(d, f) for _, d, _, f, *_ in before]
+    finally:
+        conn.close()
+
+
+def test_init_schema_backfills_route_floor(initialized_db):
+    import sqlite3
+    conn = sqlite3.connect(initialized_db)
+    _history(conn, 410, "2026-06-01")
+    conn.execute("DELETE FROM route_floor")
+    conn.commit()
+    conn.close()
+    init_schema(initialized_db)
+    conn = sqlite3.connect(initialized_db)
+    try:
+        assert _floor(conn) == (410, "2026-06-01", "2026-06-01", "2026-05-26", 410)
+    finally:
+        conn.close()
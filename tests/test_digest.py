@@ -105,6 +105,68 @@ def test_deal_fires_once_history_is_deep_and_price_drops(conn):
     assert deals["CUN"]["pct"] == 20  # 800 is 20% under the 1000 normal
 
 
+def test_route_baseline_tracks_history_and_matches_recompute(conn):
+    import random
+    rng = random.Random(5)
+    this_week = {"MDE": 471, "LAS": 259, "CTG": 409, "SJU": 176, "SOF": 785}
+    dests = list(this_week)
+    for i in range(7, 60):      # two months of noisy history, some days missing
+        day = (AS_OF - datetime.timedelta(days=i)).isoformat()
+        for d in dests:
+            if rng.random() < 0.8:
+                _ph(conn, d, this_week[d] + rng.randint(-20, 40), day)
+    for d in ("CTG", "SJU"):    # this week's fares dropped for two routes
+        for day in WEEK:
+            conn.execute("UPDATE price_history SET cheapest_price_usd = 120 "
+                         "WHERE dest_iata = ? AND observed_date = ?", (d, day))
+    conn.execute("DELETE FROM route_baseline")
+    db.rebuild_route_baseline(conn)   # UPDATEs above bypass the triggers
+    conn.commit()
+    window = (AS_OF - datetime.timedelta(days=digest.DEAL_WINDOW_DAYS)).isoformat()
+    for d in dests:
+        row = conn.execute("SELECT as_of, median_usd, obs_days, recent_min FROM route_baseline "
+                           "WHERE origin_iata='BNA' AND trip_nights=7 AND dest_iata=?",
+                           (d,)).fetchone()
+        assert row[0] == AS_OF.isoformat()
+        assert row[1:] == digest._route_baseline(conn, "BNA", d, 7, window, WEEK[-1],
+                                                 AS_OF.isoformat())
+    deals = digest.detect_deals(conn, "BNA", AS_OF)
+    assert {d["iata"] for d in deals} == {"CTG", "SJU"}
+    # A back-dated digest reads around the stored baselines: no drop yet.
+    earlier = digest.detect_deals(conn, "BNA", AS_OF - datetime.timedelta(days=7))
+    assert "CTG" not in {d["iata"] for d in earlier}
+    # A new night's row moves the baseline forward incrementally.
+    _ph(conn, "CTG", 130, (AS_OF + datetime.timedelta(days=1)).isoformat())
+    nxt = AS_OF + datetime.timedelta(days=1)
+    assert conn.execute("SELECT as_of, recent_min FROM route_baseline "
+                        "WHERE dest_iata='CTG'").fetchone() == (nxt.isoformat(), 120)
+    assert "CTG" in {d["iata"] for d in digest.detect_deals(conn, "BNA", nxt)}
+    conn.execute("DELETE FROM price_history WHERE observed_date = ?", (nxt.isoformat(),))
+    assert conn.execute("SELECT as_of FROM route_baseline "
+                        "WHERE dest_iata='CTG'").fetchone() == (AS_OF.isoformat(),)
+
+
+def test_route_baseline_windows_match_the_digest_constants(conn):
+    """The triggers and db.rebuild_route_baseline spell the windows out in SQL;
+    fares either side of each edge catch them drifting from the constants."""
+    def ago(days):
+        return (AS_OF - datetime.timedelta(days=days)).isoformat()
+    edges = ((digest.DEAL_WINDOW_DAYS + 1, 10), (digest.DEAL_WINDOW_DAYS, 900),
+             (digest.DEAL_RECENT_DAYS, 20), (digest.DEAL_RECENT_DAYS - 1, 800), (0, 850))
+    for days, price in edges:
+        _ph(conn, "MDE", price, ago(days), origin="ATL")
+    expected = digest._route_baseline(conn, "ATL", "MDE", 7, ago(digest.DEAL_WINDOW_DAYS),
+                                      ago(digest.DEAL_RECENT_DAYS - 1), AS_OF.isoformat())
+    assert expected == (825, 4, 800)
+    sql = ("SELECT median_usd, obs_days, recent_min FROM route_baseline "
+           "WHERE origin_iata='ATL' AND dest_iata='MDE' AND trip_nights=7")
+    assert conn.execute(sql).fetchone() == expected       # via the insert trigger
+    conn.execute("DELETE FROM price_history WHERE origin_iata='ATL' AND cheapest_price_usd=10")
+    assert conn.execute(sql).fetchone() == expected       # via the delete trigger
+    db.rebuild_route_baseline(conn)
+    assert conn.execute(sql).fetchone() == expected
+
+
 def test_compose_returns_subject_html_text(conn):
     em = digest.compose_city_email(conn, "Nashville", as_of=AS_OF, week_index=0)
     assert em["subject"] == "This week's cheapest trips from Nashville"
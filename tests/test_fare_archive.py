@@ -0,0 +1,165 @@
+"""Tests for the month-partitioned fare archive."""
+import sqlite3
+from datetime import date
+
+import pytest
+
+from server import connections, fare_archive, watch_brain
+from server.migrations import init_schema
+
+WATCH = {"origin_iata": "BNA", "dest_iata": "PLS", "trip_nights": 7,
+         "window_start": "2026-11-01", "window_end": "2027-01-31"}
+
+
+@pytest.fixture
+def conn(temp_db_path, tmp_path, monkeypatch):
+    monkeypatch.setenv("FARE_ARCHIVE_DIR", str(tmp_path / "archive"))
+    init_schema(temp_db_path)
+    c = connections.connect(temp_db_path)
+    # One watch observation on the 10th of each month, Jan..Jun 2026.
+    for month in range(1, 7):
+        for dep, price in (("2026-12-09", 400 + month), ("2026-11-04", 500)):
+            c.execute(
+                "INSERT INTO fare_observations (origin_iata, dest_iata, departure_date, "
+                "return_date, trip_nights, total_price_usd, source, observed_date, fetched_at) "
+                "VALUES ('BNA','PLS',?,NULL,7,?,'watch',?,'t')",
+                (dep, price, f"2026-{month:02d}-10"))
+    c.commit()
+    yield c
+    c.close()
+
+
+def _main_months(conn):
+    return [r[0] for r in conn.execute(
+        "SELECT DISTINCT substr(observed_date, 1, 7) FROM main.fare_observations ORDER BY 1")]
+
+
+def test_archive_moves_and_seals_old_months(conn, tmp_path):
+    summary = fare_archive.archive_months(conn, today=date(2026, 6, 20))
+    assert summary == {"months": ["2026-01", "2026-02", "2026-03", "2026-04"], "rows": 8,
+                       "intervals": 8}
+    assert _main_months(conn) == ["2026-05", "2026-06"]
+    path = tmp_path / "archive" / "fares-2026-02.sqlite"
+    assert (path.stat().st_mode & 0o222) == 0
+    rows = conn.execute("SELECT month, rows, sealed FROM fare_archive_months "
+                        "ORDER BY month").fetchall()
+    assert [tuple(r) for r in rows][0] == ("2026-01", 2, 1)
+    # Idempotent: nothing left to move.
+    assert fare_archive.archive_months(conn, today=date(2026, 6, 20))["rows"] == 0
+
+
+def test_series_for_is_unchanged_by_archiving(conn, monkeypatch):
+    before = watch_brain.series_for(conn, WATCH, "2026-07-01")
+    fare_archive.archive_months(conn, today=date(2026, 6, 20))
+    assert watch_brain.series_for(conn, WATCH, "2026-07-01") == before
+    assert [p for _, p in before] == [401, 402, 403, 404, 405, 406]
+    # Batches smaller than the archive give the same, still ordered, answer.
+    monkeypatch.setattr(fare_archive, "MAX_ATTACHED", 1)
+    assert watch_brain.series_for(conn, WATCH, "2026-07-01") == before
+
+
+def test_series_for_attaches_only_months_the_window_can_reach(conn, monkeypatch):
+    # Departures from 2026-12-01 can't have a watch row observed before
+    # 2026-02-04 (WINDOW_END_MAX_DAYS_OUT), so January is never read.
+    watch = dict(WATCH, window_start="2026-12-01")
+    before = watch_brain.series_for(conn, watch, "2026-07-01")
+    fare_archive.archive_months(conn, today=date(2026, 6, 20))
+    attached = []
+    real = fare_archive.partitions
+
+    def spy(*args):
+        parts = real(*args)
+        attached.extend(parts)
+        return parts
+
+    monkeypatch.setattr(fare_archive, "partitions", spy)
+    assert watch_brain.series_for(conn, watch, "2026-07-01") == before
+    assert [m for m, _ in attached] == ["2026-02", "2026-03", "2026-04"]
+    assert [d for d, _ in before] == ["2026-02-10", "2026-03-10", "2026-04-10",
+                                      "2026-05-10", "2026-06-10"]
+
+
+def test_query_attaches_only_months_in_range(conn):
+    fare_archive.archive_months(conn, today=date(2026, 6, 20))
+    assert [m for m, _ in fare_archive.partitions(conn, "2026-03-15", "2026-04-02")] == [
+        "2026-03", "2026-04"]
+    rows = fare_archive.query(
+        conn, "SELECT observed_date FROM {fare_observations} "
+              "WHERE observed_date >= ? GROUP BY observed_date ORDER BY 1",
+        ("2026-03-15",), since="2026-03-15")
+    assert [r[0] for r in rows] == ["2026-04-10", "2026-05-10", "2026-06-10"]
+    assert [r[1] for r in conn.execute("PRAGMA database_list")] == ["main"]   # detached
+
+
+def test_partitions_attach_read_only(conn):
+    fare_archive.archive_months(conn, today=date(2026, 6, 20))
+    (_, path), = fare_archive.partitions(conn, "2026-01-01", "2026-01-31")
+    conn.execute("ATTACH DATABASE ? AS probe", (f"file:{path}?mode=ro",))
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM probe.fare_observations")
+    finally:
+        conn.execute("DETACH DATABASE probe")
+
+
+def test_half_finished_move_is_rebuilt(conn, tmp_path):
+    stale = tmp_path / "archive" / "fares-2026-01.sqlite"
+    stale.parent.mkdir(parents=True)
+    stale.write_bytes(b"")                      # crashed before its manifest row
+    summary = fare_archive.archive_months(conn, today=date(2026, 2, 5), hot_months=1)
+    assert summary == {"months": ["2026-01"], "rows": 2, "intervals": 2}
+    assert len(fare_archive.query(conn, "SELECT * FROM {fare_observations}",
+                                  since="2026-01-01", until="2026-01-31")) == 12
+
+
+def _daily(conn, day, fares, source="fli", dest="LIS"):
+    for dep, price in fares.items():
+        conn.execute(
+            "INSERT INTO fare_observations (origin_iata, dest_iata, departure_date, "
+            "return_date, trip_nights, total_price_usd, source, observed_date, fetched_at) "
+            "VALUES ('BNA',?,?,NULL,7,?,?,?,?)",
+            (dest, dep, price, source, day, f"{day}T07:00:00"))
+
+
+def _all_rows(conn, sql_table):
+    return sorted(tuple(r)[1:] for r in fare_archive.query(
+        conn, f"SELECT * FROM {sql_table} WHERE dest_iata = 'LIS'",
+        since="2026-03-01", until="2026-03-31"))
+
+
+def test_partition_is_run_length_encoded_and_lossless(conn):
+    # 20 March scans of two dates. A holds its price except one change on the
+    # 8th; B vanishes on the 12th only, then returns at the same price.
+    for day in range(1, 21):
+        fares = {"2026-05-01": 300 if day < 8 else 280}
+        if day != 12:
+            fares["2026-05-02"] = 350
+        _daily(conn, f"2026-03-{day:02d}", fares)
+    conn.commit()
+    before = _all_rows(conn, "{fare_observations}")
+    assert len(before) == 39
+
+    summary = fare_archive.archive_months(conn, today=date(2026, 6, 20))
+    assert "2026-03" in summary["months"]
+    assert _all_rows(conn, "{fare_observations}") == before
+    (_, path), = fare_archive.partitions(conn, "2026-03-01", "2026-03-31")
+    arch = sqlite3.connect(path)
+    try:
+        intervals = arch.execute(
+            "SELECT departure_date, total_price_usd, valid_from, valid_to "
+            "FROM fare_intervals WHERE dest_iata = 'LIS' ORDER BY 1, 3").fetchall()
+    finally:
+        arch.close()
+    assert intervals == [
+        ("2026-05-01", 300, "2026-03-01", "2026-03-07"),
+        ("2026-05-01", 280, "2026-03-08", "2026-03-20"),
+        ("2026-05-02", 350, "2026-03-01", "2026-03-11"),
+        ("2026-05-02", 350, "2026-03-13", "2026-03-20"),
+    ]
+
+    # "Price as observed on day X" through the compatibility view.
+    on_day = fare_archive.query(
+        conn, "SELECT departure_date, total_price_usd FROM {fare_observations} "
+              "WHERE dest_iata = 'LIS' AND observed_date = ? ORDER BY 1",
+        ("2026-03-12",), since="2026-03-12", until="2026-03-12")
+    assert [tuple(r) for r in on_day] == [("2026-05-01", 280)]
@@ -0,0 +1,188 @@
+"""Tests for the batched refresh writer."""
+import sqlite3
+from datetime import date
+
+import pytest
+
+from server.fare_writer import FareWriter
+from server.fli_client import FliClient
+from server.migrations import init_schema
+
+
+@pytest.fixture
+def db(temp_db_path):
+    init_schema(temp_db_path)
+    conn = sqlite3.connect(temp_db_path)
+    conn.execute("INSERT INTO airports VALUES ('BNA','Nashville','TN','SE',36.1,-86.7,12)")
+    for iata in ("MEX", "LIS", "BOG"):
+        conn.execute("INSERT INTO destinations VALUES (?,?,'C','CC','LA','[]',1,0,'[]',60,2,'USD',0,0,NULL,3)",
+                     (iata, f"City {iata}"))
+    conn.commit()
+    conn.close()
+    return temp_db_path
+
+
+def _surface(dest, nights=7):
+    return FliClient(mock=True).search_dates("BNA", dest, date(2026, 6, 1), date(2026, 8, 30), nights)
+
+
+def _count(db_path, table):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_writer_commits_every_batch(db):
+    writer = FareWriter(db, batch_routes=2)
+    try:
+        writer.write_route("BNA", "MEX", 7, _surface("MEX"), "t")
+        assert _count(db, "price_history") == 0       # still in the open batch
+        writer.write_route("BNA", "LIS", 7, _surface("LIS"), "t")
+        assert _count(db, "price_history") == 2       # batch of 2 committed
+        writer.write_route("BNA", "BOG", 7, _surface("BOG"), "t")
+    finally:
+        writer.close()                                # flushes the tail
+    assert _count(db, "price_history") == 3
+    assert writer.commits == 2
+
+
+def test_other_writers_proceed_between_write_route_calls(db):
+    # The open batch lives in memory: nothing holds SQLite's write lock while
+    # the scan is off fetching the next route.
+    writer = FareWriter(db, batch_routes=3)
+    other = sqlite3.connect(db, timeout=0)
+    try:
+        writer.write_route("BNA", "MEX", 7, _surface("MEX"), "t")
+        other.execute("INSERT INTO signups (email, created_at) VALUES ('a@x.com', 't')")
+        other.commit()
+        writer.write_route("BNA", "LIS", 7, _surface("LIS"), "t")
+        writer.write_route("BNA", "BOG", 7, _surface("BOG"), "t")   # flushes
+        other.execute("INSERT INTO signups (email, created_at) VALUES ('b@x.com', 't')")
+        other.commit()
+    finally:
+        other.close()
+        writer.close()
+    assert _count(db, "price_history") == 3
+    assert _count(db, "signups") == 2
+
+
+def test_writer_writes_all_three_tables_and_reports_rate(db):
+    surface = _surface("MEX")
+    with FareWriter(db) as writer:
+        n = writer.write_route("BNA", "MEX", 7, surface, "t")
+    assert n == len(surface)
+    assert _count(db, "price_snapshots") == len(surface)
+    assert _count(db, "fare_observations") == len(surface)
+    stats = writer.stats()
+    assert stats["rows_written"] == 2 * len(surface) + 1
+    assert stats["routes_written"] == 1
+    assert stats["rows_per_sec"] is None or stats["rows_per_sec"] > 0
+
+
+def test_writer_replaces_route_snapshots(db):
+    with FareWriter(db) as writer:
+        writer.write_route("BNA", "MEX", 7, _surface("MEX"), "t1")
+        writer.write_route("BNA", "MEX", 7, _surface("MEX")[:3], "t2")
+    assert _count(db, "price_snapshots") == 3
+
+
+def test_ledger_row_commits_with_the_batch(db):
+    from server import connections, refresh_runs
+    conn = connections.connect(db)
+    try:
+        run_id = refresh_runs.start_run(conn, date.today())
+        writer = FareWriter(db, batch_routes=5, run_id=run_id)
+        writer.write_route("BNA", "MEX", 7, _surface("MEX"), "t")
+        writer.mark_route("BNA", "LIS", 7, "empty", "t")
+        assert refresh_runs.completed_on(conn, date.today()) == set()   # open batch
+        writer.close()
+        assert refresh_runs.completed_on(conn, date.today()) == {
+            ("BNA", "MEX", 7), ("BNA", "LIS", 7)}
+    finally:
+        conn.close()
+
+
+def _hold_write_lock(db_path, writer):
+    """Another connection holding the write lock, and a writer that won't wait."""
+    writer._conn.execute("PRAGMA busy_timeout = 0")
+    other = sqlite3.connect(db_path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    return other
+
+
+def test_failed_flush_keeps_every_route_in_the_batch(db):
+    from server import connections, refresh_runs
+    conn = connections.connect(db)
+    try:
+        run_id = refresh_runs.start_run(conn, date.today())
+        writer = FareWriter(db, batch_routes=2, run_id=run_id)
+        other = _hold_write_lock(db, writer)
+        writer.write_route("BNA", "MEX", 7, _surface("MEX"), "t")   # another worker's
+        writer.write_route("BNA", "LIS", 7, _surface("LIS"), "t")   # flush fails: no raise
+        assert writer.stats()["routes_written"] == 0
+        assert writer.stats()["snapshots_changed"] == 0
+        other.rollback()
+        other.close()
+        writer.mark_route("BNA", "BOG", 7, "empty", "t")              # retried, lands
+        assert writer.stats()["routes_written"] == 2
+        assert _count(db, "price_history") == 2
+        assert refresh_runs.completed_on(conn, date.today()) == {
+            ("BNA", "MEX", 7), ("BNA", "LIS", 7), ("BNA", "BOG", 7)}
+        writer.close()
+    finally:
+        conn.close()
+
+
+def test_close_raises_when_the_tail_never_commits(db):
+    from server import connections, refresh_runs
+    conn = connections.connect(db)
+    try:
+        run_id = refresh_runs.start_run(conn, date.today())
+        writer = FareWriter(db, batch_routes=5, run_id=run_id)
+        writer.write_route("BNA", "MEX", 7, _surface("MEX"), "t")
+        writer.write_route("BNA", "LIS", 7, _surface("LIS"), "t")
+        other = _hold_write_lock(db, writer)
+        with pytest.raises(sqlite3.OperationalError):
+            writer.close()
+        other.rollback()
+        other.close()
+        # Nothing was ledgered, so --resume scans both routes again.
+        assert refresh_runs.completed_on(conn, date.today()) == set()
+        assert writer.stats()["routes_written"] == 0
+    finally:
+        conn.close()
+
+
+def test_writer_only_touches_changed_snapshots(db):
+    from dataclasses import replace
+    surface = _surface("MEX")
+    with FareWriter(db) as writer:
+        writer.write_route("BNA", "MEX", 7, surface, "t1")
+    conn = sqlite3.connect(db)
+    ids = dict(conn.execute("SELECT departure_date, id FROM price_snapshots").fetchall())
+    conn.close()
+
+    moved = replace(surface[1], total_price_usd=surface[1].total_price_usd + 40)
+    tonight = [surface[0], moved] + surface[3:]          # surface[2] vanished
+    with FareWriter(db) as writer:
+        writer.write_route("BNA", "MEX", 7, tonight, "t2")
+    stats = writer.stats()
+    assert stats["snapshots_changed"] == 1
+    assert stats["snapshots_unchanged"] == len(surface) - 2
+    assert stats["snapshots_deleted"] == 1
+
+    conn = sqlite3.connect(db)
+    try:
+        rows = {d: (i, price, fetched) for d, i, price, fetched in conn.execute(
+            "SELECT departure_date, id, total_price_usd, fetched_at FROM price_snapshots")}
+        best = conn.execute("SELECT price_usd FROM route_best_fares "
+                            "WHERE dest_iata='MEX' AND trip_nights=7").fetchone()[0]
+    finally:
+        conn.close()
+    assert surface[2].departure_date not in rows
+    assert rows[moved.departure_date] == (ids[moved.departure_date], moved.total_price_usd, "t2")
+    assert rows[surface[0].departure_date] == (ids[surface[0].departure_date],
+                                               surface[0].total_price_usd, "t1")
+    assert best == min(r.total_price_usd for r in tonight)
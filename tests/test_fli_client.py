@@ -41,3 +41,72 @@ def test_mock_can_simulate_empty_response():
         trip_nights=7,
     )
     assert results == []
+
+
+def _queries(dests, nights=7):
+    return [("BNA", d, date(2026, 6, 1), date(2026, 8, 30), nights) for d in dests]
+
+
+def test_async_mock_matches_sync_mock():
+    import asyncio
+    from server.fli_client import AsyncFliClient
+
+    async def _run():
+        async with AsyncFliClient(mock=True, latency_s=(0, 0)) as client:
+            return await client.search_dates("BNA", "LIS", date(2026, 6, 1),
+                                              date(2026, 8, 30), 7)
+
+    sync = FliClient(mock=True).search_dates("BNA", "LIS", date(2026, 6, 1),
+                                             date(2026, 8, 30), 7)
+    assert asyncio.run(_run()) == sync
+
+
+def test_async_search_many_caps_concurrency_and_keeps_order():
+    import asyncio
+    from server.fli_client import AsyncFliClient
+
+    dests = ["LIS", "MEX", "BOG", "LIM", "CUN", "SJO", "PTY", "SCL", "EZE", "GRU"]
+    in_flight = peak = 0
+
+    async def _run():
+        client = AsyncFliClient(mock=True, concurrency=8, latency_s=(0.01, 0.02))
+        inner = client.search_dates
+
+        async def counted(*q):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            try:
+                return await inner(*q)
+            finally:
+                in_flight -= 1
+
+        client.search_dates = counted
+        try:
+            return await client.search_many(_queries(dests), concurrency=3)
+        finally:
+            client.close()
+
+    out = asyncio.run(_run())
+    assert [q[1] for q, _, _ in out] == dests
+    assert all(err is None and res for _, res, err in out)
+    assert peak == 3
+
+
+def test_async_search_many_reports_errors_per_query():
+    import asyncio
+    from server.fli_client import AsyncFliClient, FliError
+
+    class _FailLima(FliClient):
+        def search_dates(self, origin, destination, *args):
+            if destination == "LIM":
+                raise FliError("boom")
+            return super().search_dates(origin, destination, *args)
+
+    async def _run():
+        async with AsyncFliClient(client=_FailLima(mock=True), concurrency=2) as client:
+            return await client.search_many(_queries(["LIS", "LIM", "MEX"]))
+
+    out = asyncio.run(_run())
+    assert isinstance(out[1][2], FliError)
+    assert out[0][1] and out[2][1]
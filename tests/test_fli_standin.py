@@ -0,0 +1,81 @@
+"""Tests for the local fli stand-in used by scripts/bench_scan.py."""
+from datetime import date
+
+import pytest
+
+from server.fli_client import FliError
+from scripts.fli_standin import LatencyModel, StandInFli
+from server.price_refresh import _is_rate_limit_error
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def _search(fli, dest="LIS"):
+    return fli.search_dates("BNA", dest, date(2026, 6, 1), date(2026, 8, 30), 7)
+
+
+def test_surface_is_daily_sorted_and_seeded():
+    a = _search(StandInFli(seed=3, clock=_FakeClock()))
+    b = _search(StandInFli(seed=3, clock=_FakeClock()))
+    assert a == b
+    assert len(a) == 84                         # every departure day in the window
+    prices = [r.total_price_usd for r in a]
+    assert prices == sorted(prices)
+    assert a != _search(StandInFli(seed=4, clock=_FakeClock()))
+    assert a != _search(StandInFli(seed=3, day=1, clock=_FakeClock()))
+
+
+def test_latency_runs_on_the_clock():
+    clock = _FakeClock()
+    fli = StandInFli(latency=LatencyModel(median_s=1.0, sigma=0.0), clock=clock)
+    _search(fli)
+    _search(fli)
+    assert clock.now == pytest.approx(2.0)
+
+
+def test_burst_trips_429_block_then_soft_block():
+    clock = _FakeClock()
+    fli = StandInFli(latency=LatencyModel(median_s=0.1, sigma=0.0), google_rps=0.5,
+                     window_s=10, block_s=30, soft_block_s=20, clock=clock)
+    for _ in range(5):                          # 5 in 0.5s: exactly at the limit
+        assert _search(fli)
+    with pytest.raises(FliError) as err:
+        _search(fli)
+    assert _is_rate_limit_error(err.value)      # the refresh's detector sees it
+    clock.now += 25
+    with pytest.raises(FliError):               # still inside the block
+        _search(fli)
+    clock.now += 10
+    assert _search(fli) == []                   # block over, soft-block tail
+    clock.now += 30
+    assert _search(fli)
+    assert fli.stats() == {"requests": 9, "ok": 6, "rate_limited": 2, "soft_blocked": 1}
+
+
+def test_drop_in_for_refresh_all(tmp_path):
+    import sqlite3
+    from server.migrations import init_schema
+    from server.price_refresh import refresh_all
+    db = str(tmp_path / "t.sqlite")
+    init_schema(db)
+    conn = sqlite3.connect(db)
+    conn.execute("INSERT INTO airports VALUES ('BNA','Nashville','TN','SE',36.1,-86.7,12)")
+    conn.execute("INSERT INTO destinations VALUES ('LIS','Lisbon','C','CC','EU','[]',1,0,'[]',60,2,'EUR',0,0,NULL,3)")
+    conn.execute("INSERT INTO routes VALUES ('BNA','LIS',NULL)")
+    conn.commit()
+    conn.close()
+    clock = _FakeClock()
+    fli = StandInFli(clock=clock)
+    summary = refresh_all(db, fli, trip_lengths=[5, 7], sleep_seconds=2.0, workers=1,
+                          clock=clock, use_cache=False)
+    assert summary["routes_succeeded"] == 2
+    assert summary["snapshots_written"] > 2 * 80
@@ -0,0 +1,124 @@
+"""Tests for the /api/go candidate-pool cache."""
+import random
+import sqlite3
+
+import pytest
+
+from server import db
+from server import ranking as rankmod
+from server.go_cache import GoCache, band_ceiling
+from server.migrations import init_schema
+
+VIBES = ["beach", "city", "food", "history", "nature"]
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def conn(temp_db_path):
+    init_schema(temp_db_path)
+    c = sqlite3.connect(temp_db_path)
+    c.row_factory = sqlite3.Row
+    c.execute("INSERT INTO airports VALUES ('BNA','Nashville','TN','SE',36.1,-86.7,12)")
+    c.execute("INSERT INTO airports VALUES ('ATL','Atlanta','GA','SE',33.6,-84.4,10)")
+    rng = random.Random(3)
+    for i in range(30):
+        iata = f"D{i:02d}"
+        vibes = rng.sample(VIBES, rng.randint(1, 3))
+        c.execute(
+            "INSERT INTO destinations VALUES (?,?,'X','XX','LA',?,1,0,'[6,7]',60,2,'USD',0,0,NULL,?)",
+            (iata, iata, str(vibes).replace("'", '"'), rng.randint(1, 5)))
+        for origin in ("BNA", "ATL"):
+            c.execute(
+                "INSERT INTO price_snapshots (origin_iata,dest_iata,departure_date,return_date,"
+                "trip_nights,total_price_usd,stops,carrier_codes,source,fetched_at) "
+                "VALUES (?,?,?,?,7,?,NULL,NULL,'fli','2026-05-26T07:00')",
+                (origin, iata, rng.choice(["2026-06-01", "2026-09-01"]),
+                 "2026-06-08", rng.randint(100, 900)))
+    c.commit()
+    yield c
+    c.close()
+
+
+def _uncached(conn, query, session, k=8):
+    cands = db.find_candidates(conn, query.origin_iata, query.budget_usd, query.trip_nights)
+    ranked = rankmod.rank(
+        [rankmod.Candidate(c["iata"], c["price_usd"], c["vibes"], c["novelty_score"],
+                           c["cheapest_date_in_best_months"]) for c in cands],
+        query, session, k, require_vibe_overlap=True)
+    return [cands[i] for i, _ in ranked]
+
+
+def test_cached_results_match_uncached(conn):
+    cache = GoCache()
+    session = rankmod.SessionState(seen_count={"D01": 1, "D04": 2})
+    for budget in (100, 240, 333, 500, 512, 700, 1000):
+        for vibes in ([], ["beach"], ["city", "food"], ["ski"]):
+            q = rankmod.UserQuery("BNA", budget, 7, vibes)
+            assert cache.rank(conn, q, session, 8) == _uncached(conn, q, session)
+            # second time round is a hit and still identical
+            assert cache.rank(conn, q, session, 8) == _uncached(conn, q, session)
+    assert cache.hits > 0
+
+
+def test_budgets_in_one_band_share_a_pool(conn):
+    cache = GoCache()
+    assert band_ceiling(480) == band_ceiling(500)
+    cache.pool(conn, "BNA", 480, 7, [])
+    cache.pool(conn, "BNA", 500, 7, [])
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+
+def test_refresh_for_origin_invalidates_only_that_origin(conn):
+    clock = _Clock()
+    cache = GoCache(revalidate_s=5, clock=clock)
+    bna = cache.pool(conn, "BNA", 500, 7, [])
+    atl = cache.pool(conn, "ATL", 500, 7, [])
+    conn.execute("UPDATE price_snapshots SET total_price_usd = 50 "
+                 "WHERE origin_iata='BNA' AND dest_iata='D00'")
+    conn.commit()
+    # Inside the revalidation window the cached pool is served as-is.
+    assert cache.pool(conn, "BNA", 500, 7, []) is bna
+    clock.now = 6
+    fresh = cache.pool(conn, "BNA", 500, 7, [])
+    assert fresh is not bna
+    assert any(r["iata"] == "D00" and r["price_usd"] == 50 for r in fresh.rows)
+    assert cache.pool(conn, "ATL", 500, 7, []) is atl
+
+
+def test_catalog_and_route_edits_reach_cached_pools(conn):
+    clock = _Clock()
+    cache = GoCache(revalidate_s=5, clock=clock)
+    for origin in ("BNA", "ATL"):
+        cache.pool(conn, origin, 2000, 7, [])
+    conn.execute("UPDATE destinations SET city='Renamed', best_months='[1,2,3,4,5,6,7,8,9,10,11,12]' "
+                 "WHERE iata='D00'")
+    conn.commit()
+    clock.now = 6
+    for origin in ("BNA", "ATL"):
+        row = next(r for r in cache.pool(conn, origin, 2000, 7, []).rows if r["iata"] == "D00")
+        assert row["city"] == "Renamed" and row["cheapest_date_in_best_months"]
+    atl = cache.pool(conn, "ATL", 2000, 7, [])
+    conn.execute("INSERT INTO routes VALUES ('BNA','D00','nonstop')")
+    conn.commit()
+    clock.now = 12
+    row = next(r for r in cache.pool(conn, "BNA", 2000, 7, []).rows if r["iata"] == "D00")
+    assert row["route_catch_text"] == "nonstop"
+    assert cache.pool(conn, "ATL", 2000, 7, []) is atl
+
+
+def test_ttl_and_lru_bounds(conn):
+    clock = _Clock()
+    cache = GoCache(ttl_s=60, max_entries=2, clock=clock)
+    first = cache.pool(conn, "BNA", 500, 7, [])
+    clock.now = 61
+    assert cache.pool(conn, "BNA", 500, 7, []) is not first
+    cache.pool(conn, "BNA", 900, 7, [])
+    cache.pool(conn, "ATL", 500, 7, [])
+    assert cache.stats()["entries"] == 2
@@ -21,3 +21,16 @@ def test_healthz_reports_last_refresh_at(client):
     body = rv.get_json()
     # Null is valid when no refresh has happened yet
     assert "last_refresh_at" in body
+
+
+def test_healthz_last_refresh_falls_back_to_run_ledger(client, temp_db_path):
+    """A night that moved no fares leaves snapshot fetched_at untouched; the
+    finished run still counts as the last refresh."""
+    import sqlite3
+    conn = sqlite3.connect(temp_db_path)
+    conn.execute("INSERT INTO refresh_runs (run_date, started_at, finished_at, status) "
+                 "VALUES ('2026-06-10','2026-06-10T07:00:00','2026-06-10T09:00:00','ok')")
+    conn.commit()
+    conn.close()
+    body = client.get("/api/healthz").get_json()
+    assert body["last_refresh_at"] == "2026-06-10T09:00:00"
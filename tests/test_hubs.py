@@ -106,3 +106,39 @@ def test_long_haul_under_filters_overseas_below_benchmark(conn):
     hub = hubs.build_hub(conn, "BNA")
     # Sofia (overseas, $1100) beats the $1169 Vegas benchmark; LAS is domestic.
     assert [t["iata"] for t in hubs.long_haul_under(hub, 1169)] == ["SOF"]
+
+
+def test_hub_context_builds_each_hub_once(conn):
+    ctx = hubs.HubContext(conn)
+    first = ctx.hub("BNA")
+    assert ctx.hub("BNA") is first
+    assert first == hubs.build_hub(conn, "BNA")
+    ctx.hub("BNA", since="2026-01-01")
+    assert ctx.builds == 2
+
+
+def test_build_hub_since_matches_price_history_window(conn):
+    # Routes observed on different days: MDE's trailing window starts at the
+    # `since` below (route_floor answers), GUA's doesn't (price_history does),
+    # and LAS has nothing inside the window at all.
+    for price, day in [(300, "2026-06-02"), (520, "2026-06-05"), (499, "2026-06-08")]:
+        conn.execute("INSERT INTO price_history (origin_iata, dest_iata, trip_nights, "
+                     "cheapest_price_usd, observed_date, source) VALUES "
+                     "('BNA','MDE',7,?,?,'fli')", (price, day))
+    conn.execute("INSERT INTO price_history (origin_iata, dest_iata, trip_nights, "
+                 "cheapest_price_usd, observed_date, source) VALUES "
+                 "('BNA','GUA',7,410,'2026-06-04','fli')")
+    conn.execute("DELETE FROM price_history WHERE dest_iata='LAS'")
+    conn.execute("INSERT INTO price_history (origin_iata, dest_iata, trip_nights, "
+                 "cheapest_price_usd, observed_date, source) VALUES "
+                 "('BNA','LAS',7,259,'2026-05-20','fli')")
+    conn.commit()
+    since = "2026-06-02"
+    expected = dict(conn.execute(
+        "SELECT dest_iata, MIN(cheapest_price_usd) FROM price_history "
+        "WHERE origin_iata='BNA' AND trip_nights=7 AND observed_date >= ? "
+        "GROUP BY dest_iata", (since,)).fetchall())
+    hub = hubs.build_hub(conn, "BNA", since=since)
+    assert {t["iata"]: t["airfare_usd"] for t in hub["trips"]} == expected
+    assert "LAS" not in expected
+    assert expected["MDE"] == 300 and expected["GUA"] == 410
@@ -101,3 +101,58 @@ def test_init_schema_creates_v1_indexes(temp_db_path):
     assert "idx_snapshots_lookup" in indexes
     assert "idx_snapshots_dest" in indexes
     assert "idx_searches_session" in indexes
+
+
+def test_init_schema_dedupes_snapshots_before_route_date_key(temp_db_path):
+    """Pre-upsert databases may hold duplicate route/date snapshots; the newest
+    survives and the unique key goes on."""
+    init_schema(temp_db_path)
+    conn = sqlite3.connect(temp_db_path)
+    conn.execute("DROP INDEX idx_snapshots_route_date")
+    for price in (300, 280):
+        conn.execute("INSERT INTO price_snapshots (origin_iata, dest_iata, departure_date, "
+                     "return_date, trip_nights, total_price_usd, source, fetched_at) "
+                     "VALUES ('BNA','MEX','2026-07-01','2026-07-08',7,?,'fli','t')", (price,))
+    conn.commit()
+    conn.close()
+
+    init_schema(temp_db_path)
+    conn = sqlite3.connect(temp_db_path)
+    try:
+        rows = conn.execute("SELECT total_price_usd FROM price_snapshots").fetchall()
+        unique = conn.execute("SELECT \"unique\" FROM pragma_index_list('price_snapshots') "
+                              "WHERE name='idx_snapshots_route_date'").fetchone()
+    finally:
+        conn.close()
+    assert rows == [(280,)]
+    assert unique == (1,)
+
+
+def test_init_schema_reshapes_old_route_best_fares(temp_db_path):
+    """Databases from before route_best_fares dropped its copied destination
+    fields get the new table, refilled from price_snapshots."""
+    init_schema(temp_db_path)
+    conn = sqlite3.connect(temp_db_path)
+    for trigger in ("trg_snapshots_best_ins", "trg_snapshots_best_del",
+                    "trg_snapshots_best_upd"):
+        conn.execute(f"DROP TRIGGER {trigger}")
+    conn.execute("DROP TABLE route_best_fares")
+    conn.execute("CREATE TABLE route_best_fares (origin_iata TEXT, dest_iata TEXT, "
+                 "trip_nights INTEGER, price_usd INTEGER, departure_date TEXT, "
+                 "return_date TEXT, in_best_months INTEGER, city TEXT)")
+    conn.execute("INSERT INTO price_snapshots (origin_iata, dest_iata, departure_date, "
+                 "return_date, trip_nights, total_price_usd, source, fetched_at) "
+                 "VALUES ('BNA','MEX','2026-07-01','2026-07-08',7,300,'fli','t')")
+    conn.commit()
+    conn.close()
+
+    init_schema(temp_db_path)
+    conn = sqlite3.connect(temp_db_path)
+    try:
+        cols = [r[1] for r in conn.execute("PRAGMA table_info(route_best_fares)")]
+        rows = conn.execute("SELECT dest_iata, price_usd FROM route_best_fares").fetchall()
+    finally:
+        conn.close()
+    assert "city" not in cols
+    assert rows == [("MEX", 300)]
+
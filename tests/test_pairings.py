@@ -91,6 +91,29 @@ def test_verify_marks_true_false_and_unknown(conn):
     assert conn.execute("SELECT verified, margin_usd FROM city_pairings WHERE origin_iata='YYY'").fetchone() == (0, None)
 
 
+def test_verify_totals_match_total_cost(conn):
+    # 5-night fares for BNA; a leg with a fare but no catalog row (QQQ) and an
+    # origin with no fares at all (CCC) are unknown, as total_cost() says.
+    _fare(conn, "BNA", "MDE", 455, nights=5)
+    _fare(conn, "BNA", "LAS", 240, nights=5)
+    _fare(conn, "DDD", "QQQ", 120)
+    _fare(conn, "DDD", "MDE", 471)
+    for origin, cheap, anchor, nights in [("BNA", "MDE", "LAS", 5),
+                                          ("CCC", "MDE", "LAS", 7),
+                                          ("DDD", "QQQ", "MDE", 7)]:
+        conn.execute("INSERT INTO city_pairings (origin_iata, cheap_iata, anchor_iata, "
+                     "trip_nights, verified) VALUES (?,?,?,?,0)",
+                     (origin, cheap, anchor, nights))
+    assert pairings.verify_all(conn) == {"verified": 1, "broken": 0, "unknown": 2}
+    rows = conn.execute(
+        "SELECT origin_iata, cheap_iata, anchor_iata, trip_nights, cheap_total_usd, "
+        "anchor_total_usd FROM city_pairings ORDER BY origin_iata").fetchall()
+    for origin, cheap, anchor, nights, cheap_total, anchor_total in rows:
+        assert cheap_total == pairings.total_cost(conn, origin, cheap, nights)
+        assert anchor_total == pairings.total_cost(conn, origin, anchor, nights)
+    assert rows[0][4:] == (455 + 5 * 50, 240 + 5 * 130)
+
+
 def test_get_headline_gated_on_verified(conn):
     pairings.seed_pairings(conn)
     # Before verification, nothing is served — even with a real pairing row.
@@ -120,6 +143,34 @@ def test_at_risk_flags_broken_and_thin_not_healthy(conn):
     assert {f["origin"]: f["reason"] for f in flagged} == {"BBB": "thin_margin", "CCC": "broken"}
 
 
+def test_recommend_replacements_ranks_robust_surprising_pairs(conn):
+    # From RRR, 7 nights, fares over 06-01..06-10 (week = 7 x daily):
+    for iata, daily in [("AAA", 50), ("BBB", 150), ("CCC", 40), ("DDD", 45),
+                        ("EEE", 60), ("FFF", 200)]:
+        _dest(conn, iata, f"City {iata}", daily)
+    conn.execute("UPDATE destinations SET novelty_score=5 WHERE iata='CCC'")
+    for day in range(1, 11):
+        d = f"2026-06-{day:02d}"
+        _fare(conn, "RRR", "AAA", 600, day=d)   # 950 all in
+        _fare(conn, "RRR", "BBB", 200, day=d)   # 1250: cheap flight, dear week
+        _fare(conn, "RRR", "CCC", 650, day=d)   # 930, novel
+        _fare(conn, "RRR", "EEE", 150, day=d)   # 570 but cheaper to fly: no surprise
+        if day >= 5:
+            _fare(conn, "RRR", "DDD", 900, day=d)
+    _fare(conn, "RRR", "DDD", 500, day="2026-06-01")   # floor 815, this week 1215
+    _fare(conn, "RRR", "FFF", 100, day="2026-05-01")   # nothing this week
+    conn.commit()
+    recs = pairings.recommend_replacements(conn, "RRR")
+    # DDD vs BBB has the fattest all-time margin but only $35 this week; CCC's
+    # novelty lifts it over AAA; CCC vs AAA is too thin ($20).
+    assert [(r["cheap_iata"], r["anchor_iata"]) for r in recs] == [("CCC", "BBB"), ("AAA", "BBB")]
+    assert recs[0] == {"cheap_iata": "CCC", "anchor_iata": "BBB", "cheap_total_usd": 930,
+                       "anchor_total_usd": 1250, "margin_usd": 320,
+                       "recent_margin_usd": 320, "score": 352.0}
+    assert pairings.recommend_replacements(conn, "RRR", k=1) == recs[:1]
+    assert pairings.recommend_replacements(conn, "NOPE") == []
+
+
 def test_pairing_alert_noop_when_nothing_at_risk():
     # Empty risk list must never send — no recipient lookup, no network.
     assert send_pairing_alert([]) is None
@@ -154,3 +205,18 @@ def test_pairing_alert_sends_with_recipient(monkeypatch):
     assert sent["to"] == ["ops@example.com"]
     assert "1 pairing claim(s)" in sent["subject"]
     assert "BNA: MDE vs LAS" in sent["text"]
+
+
+def test_pairing_alert_lists_replacements(monkeypatch):
+    monkeypatch.setenv("RESEND_API_KEY", "k")
+    monkeypatch.setenv("RESEND_FROM", "from@example.com")
+    sent = {}
+
+    import resend
+    monkeypatch.setattr(resend.Emails, "send", lambda payload: sent.update(payload))
+    flagged = [{"origin": "BNA", "cheap_iata": "MDE", "anchor_iata": "LAS",
+                "margin_usd": -10, "reason": "broken",
+                "replacements": [{"cheap_iata": "BOG", "anchor_iata": "HNL",
+                                  "margin_usd": 420, "recent_margin_usd": 380}]}]
+    send_pairing_alert(flagged, to_email="ops@example.com")
+    assert "try BOG vs HNL: margin $420, this week $380" in sent["text"]
@@ -195,3 +195,169 @@ def test_refresh_route_does_not_retry_on_non_rate_limit_error(seeded_db):
             start_date=date(2026, 6, 1), end_date=date(2026, 8, 30),
             rate_limit_backoff=0,
         )
+
+
+class _FakeClock:
+    """Injectable clock: sleep() advances time instantly (thread-safe)."""
+
+    def __init__(self):
+        import threading
+        self.now = 0.0
+        self.slept = 0.0
+        self._lock = threading.Lock()
+
+    def monotonic(self):
+        with self._lock:
+            return self.now
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.now += seconds
+            self.slept += seconds
+
+
+def _add_destinations(db_path, iatas):
+    conn = sqlite3.connect(db_path)
+    for i, iata in enumerate(iatas):
+        conn.execute("INSERT INTO destinations VALUES (?,?,'C','CC','LA','[]',1,0,'[]',60,2,'USD',0,0,NULL,3)",
+                     (iata, f"City {i}"))
+        conn.execute("INSERT INTO routes VALUES ('BNA',?,NULL)", (iata,))
+    conn.commit()
+    conn.close()
+
+
+def test_refresh_all_concurrent_workers_cover_every_route(seeded_db):
+    _add_destinations(seeded_db, ["LIS", "BOG", "LIM", "CUN"])
+    clock = _FakeClock()
+    summary = refresh_all(seeded_db, FliClient(mock=True), trip_lengths=[5, 7, 10],
+                          sleep_seconds=2.0, workers=4, clock=clock)
+    assert summary["routes_attempted"] == 15
+    assert summary["routes_succeeded"] == 15
+    conn = sqlite3.connect(seeded_db)
+    try:
+        n = conn.execute("SELECT COUNT(DISTINCT dest_iata || trip_nights) FROM price_history").fetchone()[0]
+    finally:
+        conn.close()
+    assert n == 15
+    # 15 calls through a 0.5 req/s bucket: the first is free, the rest spaced
+    # >= 2s apart (workers sleeping concurrently can only push the fake clock on).
+    assert clock.now >= 28.0
+
+
+def test_token_bucket_paces_requests():
+    from server.scan_engine import TokenBucket
+    clock = _FakeClock()
+    bucket = TokenBucket(rate=0.5, clock=clock)
+    for _ in range(4):
+        bucket.acquire()
+    assert clock.now == pytest.approx(6.0)
+
+
+def test_token_bucket_slow_down_halves_rate_and_pauses():
+    from server.scan_engine import TokenBucket
+    clock = _FakeClock()
+    bucket = TokenBucket(rate=1.0, clock=clock, cooldown_s=60)
+    bucket.acquire()
+    bucket.slow_down()
+    assert bucket.rate == 0.5
+    bucket.acquire()                      # waits out the cooldown first
+    assert clock.now >= 60
+    for _ in range(20):
+        bucket.recover()
+    assert bucket.rate == 1.0             # creeps back, never past the ceiling
+
+
+def test_refresh_all_draws_from_shared_budget(seeded_db, tmp_path):
+    from server.request_budget import SharedTokenBucket
+    clock = _FakeClock()
+    shared = SharedTokenBucket(str(tmp_path / "budget.sqlite"), rate=1.0, clock=clock)
+    try:
+        fli = _RateLimitOnceClient(FliClient(mock=True))
+        summary = refresh_all(seeded_db, fli, trip_lengths=[7], sleep_seconds=0,
+                              workers=1, clock=clock, limiter=shared)
+        assert summary["routes_succeeded"] == 1
+        assert summary["rate_limit_slowdowns"] == 1
+        assert shared.state()["slowdowns_total"] == 1
+    finally:
+        shared.close()
+
+
+def test_refresh_all_slows_down_on_rate_limit(seeded_db):
+    clock = _FakeClock()
+    fli = _RateLimitOnceClient(FliClient(mock=True))
+    summary = refresh_all(seeded_db, fli, trip_lengths=[7], sleep_seconds=2.0,
+                          workers=2, clock=clock)
+    assert summary["routes_succeeded"] == 1
+    assert summary["rate_limit_slowdowns"] == 1
+    assert fli.calls == 2
+    assert clock.slept >= 60              # the retry waited on the shared cooldown
+
+
+def test_refresh_all_max_requests_scans_only_top_routes(seeded_db):
+    _add_destinations(seeded_db, ["LIS", "BOG", "LIM", "CUN"])
+    summary = refresh_all(seeded_db, FliClient(mock=True), trip_lengths=[7],
+                          sleep_seconds=0, max_requests=2)
+    assert summary["routes_total"] == 5
+    assert summary["routes_attempted"] == 2
+    assert summary["routes_succeeded"] == 2
+
+
+class _FailForDestClient:
+    """Test double: fails every call to one destination."""
+
+    def __init__(self, real_client, bad_dest):
+        self._real = real_client
+        self.bad_dest = bad_dest
+        self.calls = []
+
+    def search_dates(self, origin, dest, *args, **kwargs):
+        self.calls.append(dest)
+        if dest == self.bad_dest:
+            from server.fli_client import FliError
+            raise FliError("fli call failed: bad gateway 502")
+        return self._real.search_dates(origin, dest, *args, **kwargs)
+
+
+def test_refresh_all_records_run_ledger(seeded_db):
+    _add_destinations(seeded_db, ["LIS", "BOG"])
+    fli = _FailForDestClient(FliClient(mock=True), "BOG")
+    summary = refresh_all(seeded_db, fli, trip_lengths=[7], sleep_seconds=0)
+    conn = sqlite3.connect(seeded_db)
+    try:
+        status = dict(conn.execute(
+            "SELECT dest_iata, status FROM refresh_run_routes WHERE run_id=?",
+            (summary["run_id"],)).fetchall())
+        run = conn.execute("SELECT status, finished_at FROM refresh_runs WHERE id=?",
+                           (summary["run_id"],)).fetchone()
+    finally:
+        conn.close()
+    assert status == {"MEX": "ok", "LIS": "ok", "BOG": "failed"}
+    assert run[0] == "done" and run[1]
+
+
+def test_refresh_all_resume_skips_routes_done_today(seeded_db):
+    _add_destinations(seeded_db, ["LIS", "BOG", "LIM"])
+    first = _FailForDestClient(FliClient(mock=True), "BOG")
+    refresh_all(seeded_db, first, trip_lengths=[7], sleep_seconds=0)
+
+    again = _FailForDestClient(FliClient(mock=True), None)
+    summary = refresh_all(seeded_db, again, trip_lengths=[7], sleep_seconds=0, resume=True)
+    assert again.calls == ["BOG"]            # only the failed route is retried
+    assert summary["routes_skipped_resume"] == 3
+    assert summary["routes_succeeded"] == 1
+
+    # Without --resume (or the fetch cache) every route is scanned again.
+    full = _FailForDestClient(FliClient(mock=True), None)
+    refresh_all(seeded_db, full, trip_lengths=[7], sleep_seconds=0, use_cache=False)
+    assert full.calls == ["BOG", "LIM", "LIS", "MEX"]
+
+
+def test_refresh_rerun_is_served_from_fetch_cache(seeded_db):
+    _add_destinations(seeded_db, ["LIS"])
+    first = refresh_all(seeded_db, FliClient(mock=True), trip_lengths=[7], sleep_seconds=0)
+    assert first["cache_misses"] == 2 and first["cache_hits"] == 0
+    again = _FailForDestClient(FliClient(mock=True), None)
+    summary = refresh_all(seeded_db, again, trip_lengths=[7], sleep_seconds=0)
+    assert again.calls == []
+    assert summary["cache_hits"] == 2 and summary["cache_hit_rate"] == 1.0
+    assert summary["snapshots_written"] == first["snapshots_written"]
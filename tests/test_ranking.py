@@ -74,3 +74,74 @@ def test_score_novelty_bonus_rewards_unknown():
     novel = score(make_candidate(novelty_score=5), make_query(), empty_session())
     assert cliche is not None and novel is not None
     assert novel > cliche
+
+
+def _random_pool(rng, n):
+    vibes = ["beach", "city", "food", "history", "nature", "nightlife", "off-grid"]
+    return [
+        make_candidate(
+            iata=f"D{i:02d}",
+            price_usd=rng.randint(50, 900),
+            vibes=rng.sample(vibes, rng.randint(0, 4)),
+            novelty_score=rng.randint(1, 5),
+            cheapest_date_in_best_months=rng.random() < 0.5,
+        )
+        for i in range(n)
+    ]
+
+
+def test_score_batch_matches_score_exactly():
+    import random
+
+    import numpy as np
+
+    from server.ranking import score_batch, vibe_mask, vibe_vocabulary
+
+    rng = random.Random(7)
+    for _ in range(50):
+        cands = _random_pool(rng, 40)
+        q = make_query(budget_usd=rng.choice([300, 500, 750]),
+                       vibes=rng.sample(["beach", "city", "food", "ski"], rng.randint(0, 2)))
+        session = SessionState(seen_count={c.iata: rng.randint(0, 3) for c in cands[:10]})
+        vocab = vibe_vocabulary(q.vibes, *(c.vibes for c in cands))
+        got = score_batch(
+            [c.price_usd for c in cands], [c.novelty_score for c in cands],
+            [vibe_mask(c.vibes, vocab) for c in cands],
+            [c.cheapest_date_in_best_months for c in cands],
+            [session.seen_count.get(c.iata, 0) for c in cands],
+            q.budget_usd, vibe_mask(q.vibes, vocab), has_query_vibes=bool(q.vibes),
+        )
+        for c, g in zip(cands, got):
+            want = score(c, q, session)
+            if want is None:
+                assert np.isnan(g)
+            else:
+                assert g == want
+
+
+def test_rank_and_rank_columns_match_sorted_score_loop():
+    import random
+
+    from server.ranking import CandidateColumns, rank, rank_columns
+
+    rng = random.Random(11)
+    for _ in range(30):
+        cands = _random_pool(rng, 30)
+        q = make_query(budget_usd=500, vibes=rng.sample(["beach", "city"], rng.randint(0, 1)))
+        session = SessionState(seen_count={"D01": 1, "D02": 2})
+        expected = []
+        for i, c in enumerate(cands):
+            s = score(c, q, session)
+            if s is None or (q.vibes and not set(q.vibes) & set(c.vibes)):
+                continue
+            expected.append((s, i))
+        expected.sort(key=lambda x: (-x[0], -cands[x[1]].novelty_score, cands[x[1]].price_usd))
+        want = [(i, s) for s, i in expected[:8]]
+        assert rank(cands, q, session, k=8, require_vibe_overlap=True) == want
+        assert rank_columns(CandidateColumns.from_candidates(cands), q, session, k=8,
+                            require_vibe_overlap=True) == want
+
+
+def test_rank_empty_pool():
+    from server.ranking import rank
+    assert rank([], make_query(), empty_session(), k=8) == []
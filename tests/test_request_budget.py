@@ -0,0 +1,122 @@
+"""Tests for the cross-process request budget."""
+import threading
+
+import pytest
+
+from server.request_budget import SharedTokenBucket, from_env
+
+
+class _FakeClock:
+    """Shared by both buckets, standing in for the host's CLOCK_MONOTONIC."""
+
+    def __init__(self):
+        self.now = 0.0
+        self._lock = threading.Lock()
+
+    def monotonic(self):
+        with self._lock:
+            return self.now
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.now += seconds
+
+
+@pytest.fixture
+def budget_path(tmp_path):
+    return str(tmp_path / "fli-budget.sqlite")
+
+
+def test_two_jobs_share_one_rate(budget_path):
+    clock = _FakeClock()
+    refresh = SharedTokenBucket(budget_path, rate=0.5, clock=clock)
+    watches = SharedTokenBucket(budget_path, rate=0.5, clock=clock)
+    try:
+        starts = []
+        for bucket in (refresh, watches, refresh, watches, refresh):
+            bucket.acquire()
+            starts.append(clock.monotonic())
+    finally:
+        refresh.close()
+        watches.close()
+    # One token per 2s in aggregate, whichever job asks.
+    assert starts == [0.0, 2.0, 4.0, 6.0, 8.0]
+
+
+def test_429_in_one_job_pauses_the_other(budget_path):
+    clock = _FakeClock()
+    refresh = SharedTokenBucket(budget_path, rate=1.0, clock=clock, cooldown_s=60)
+    watches = SharedTokenBucket(budget_path, rate=1.0, clock=clock, cooldown_s=60)
+    try:
+        watches.acquire()
+        watches.slow_down()
+        refresh.acquire()
+        assert clock.monotonic() >= 60.0
+        state = refresh.state()
+        assert state["rate"] == pytest.approx(0.5)
+        assert state["slowdowns_total"] == 1
+        assert (watches.slowdowns, refresh.slowdowns) == (1, 0)
+        refresh.recover()
+        assert watches.state()["rate"] == pytest.approx(0.55)
+    finally:
+        refresh.close()
+        watches.close()
+
+
+def test_clock_reset_after_reboot_rebases_the_bucket(budget_path):
+    # State saved 30 days into uptime, mid-pause; the host then reboots and
+    # CLOCK_MONOTONIC starts again near zero.
+    before = _FakeClock()
+    before.now = 30 * 86400.0
+    bucket = SharedTokenBucket(budget_path, rate=0.5, clock=before, cooldown_s=60)
+    bucket.acquire()
+    bucket.slow_down()
+    bucket.close()
+
+    after = _FakeClock()
+    after.now = 5.0
+    bucket = SharedTokenBucket(budget_path, rate=0.5, clock=after, cooldown_s=60)
+    try:
+        bucket.acquire()
+        # At most the one cooldown plus a token's refill, not 30 days.
+        assert after.monotonic() <= 5.0 + 60 + 1 / 0.25
+        bucket.acquire()
+        assert after.monotonic() <= 5.0 + 60 + 2 / 0.25
+    finally:
+        bucket.close()
+
+
+def test_clock_reset_is_caught_in_acquire(budget_path):
+    clock = _FakeClock()
+    clock.now = 10000.0
+    other = SharedTokenBucket(budget_path, rate=1.0, clock=clock)
+    other.acquire()
+    clock.now = 3.0        # another process already rebooted the clock
+    try:
+        other.acquire()
+        assert clock.monotonic() <= 4.0
+    finally:
+        other.close()
+
+
+def test_latest_config_sets_the_ceiling(budget_path):
+    first = SharedTokenBucket(budget_path, rate=1.0, clock=_FakeClock())
+    second = SharedTokenBucket(budget_path, rate=0.25, clock=_FakeClock())
+    try:
+        assert first.state()["max_rate"] == 0.25
+        assert first.state()["rate"] == 0.25
+    finally:
+        first.close()
+        second.close()
+
+
+def test_from_env(budget_path, monkeypatch):
+    monkeypatch.delenv("FLI_BUDGET_PATH", raising=False)
+    assert from_env() is None
+    monkeypatch.setenv("FLI_BUDGET_PATH", budget_path)
+    monkeypatch.setenv("FLI_MAX_RATE", "0.2")
+    bucket = from_env()
+    try:
+        assert bucket.state()["max_rate"] == 0.2
+    finally:
+        bucket.close()
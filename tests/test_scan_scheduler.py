@@ -0,0 +1,111 @@
+"""Tests for the volatility-aware scan scheduler."""
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+from server import scan_scheduler as sched
+from server.migrations import init_schema
+
+AS_OF = date(2026, 6, 10)
+
+
+def _state(last, vol=0.1, curated=False):
+    return sched.RouteState(last_scanned=last, volatility=vol, curated=curated)
+
+
+def test_never_scanned_then_overdue_then_value():
+    states = {
+        ("BNA", "A", 7): _state("2026-06-09", vol=0.30),   # fresh but volatile
+        ("BNA", "B", 7): _state(None),                      # never scanned
+        ("BNA", "C", 7): _state("2026-06-01", vol=0.01),   # overdue (9 days)
+        ("BNA", "D", 7): _state("2026-06-07", vol=0.01),   # stable, 3 days
+    }
+    order = sched.rank_tasks(list(states), states, AS_OF)
+    assert [t[1] for t in order] == ["B", "C", "A", "D"]
+
+
+def test_curated_routes_outrank_equal_peers():
+    states = {
+        ("BNA", "A", 7): _state("2026-06-08"),
+        ("BNA", "MDE", 7): _state("2026-06-08", curated=True),
+    }
+    assert sched.rank_tasks(list(states), states, AS_OF)[0][1] == "MDE"
+
+
+def test_stable_route_is_not_starved():
+    # Floor keeps a flat route gaining value with age.
+    stale = sched.priority(_state("2026-06-05", vol=0.0), AS_OF)
+    fresh = sched.priority(_state("2026-06-09", vol=0.0), AS_OF)
+    assert stale < fresh
+
+
+def test_curated_routes_cover_pairing_legs_and_comparisons():
+    keys = sched.curated_routes({"BNA", "SEA"})
+    assert ("BNA", "MDE", 7) in keys and ("BNA", "LAS", 7) in keys
+    assert ("SEA", "MEX", 7) in keys          # comparison dest from any origin
+
+
+@pytest.fixture
+def archive_db(temp_db_path):
+    """Two routes, 10 days: MEX swings +/-30%, LIS never moves."""
+    init_schema(temp_db_path)
+    conn = sqlite3.connect(temp_db_path)
+    conn.execute("INSERT INTO airports VALUES ('BNA','Nashville','TN','SE',36.1,-86.7,12)")
+    for iata in ("MEX", "LIS"):
+        conn.execute("INSERT INTO destinations VALUES (?,?,'C','CC','LA','[]',1,0,'[]',60,2,'USD',0,0,NULL,3)",
+                     (iata, iata))
+        conn.execute("INSERT INTO routes VALUES ('BNA',?,NULL)", (iata,))
+    for i in range(10):
+        day = (AS_OF - timedelta(days=10 - i)).isoformat()
+        for dest, price in (("MEX", 300 if i % 2 else 400), ("LIS", 600)):
+            conn.execute(
+                "INSERT INTO price_history (origin_iata, dest_iata, trip_nights, "
+                "cheapest_price_usd, observed_date, source) VALUES ('BNA',?,7,?,?,'fli')",
+                (dest, price, day))
+            conn.execute(
+                "INSERT INTO fare_observations (origin_iata, dest_iata, departure_date, "
+                "return_date, trip_nights, total_price_usd, observed_date, fetched_at) "
+                "VALUES ('BNA',?,'2026-07-01','2026-07-08',7,?,?,'x')",
+                (dest, price, day))
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_route_states_read_volatility_and_last_scan(archive_db):
+    tasks = [("BNA", "LIS", 7), ("BNA", "MEX", 7)]
+    states = sched.route_states(archive_db, tasks, AS_OF)
+    assert states[("BNA", "LIS", 7)].volatility == 0
+    assert states[("BNA", "MEX", 7)].volatility > 0.1
+    assert states[("BNA", "MEX", 7)].last_scanned == (AS_OF - timedelta(days=1)).isoformat()
+    assert sched.plan(archive_db, tasks, budget=1, as_of=AS_OF) == [("BNA", "MEX", 7)]
+
+
+def test_route_states_count_empty_and_failed_scans(archive_db):
+    """A route that never returns fares still has a last scan: the ledger's."""
+    archive_db.execute("INSERT INTO routes VALUES ('BNA','CUN',NULL)")
+    archive_db.execute(
+        "INSERT INTO refresh_runs (id, run_date, started_at, status) "
+        "VALUES (1, ?, 'x', 'done')", ((AS_OF - timedelta(days=2)).isoformat(),))
+    archive_db.execute(
+        "INSERT INTO refresh_run_routes (run_id, origin_iata, dest_iata, trip_nights, "
+        "status, rows, finished_at) VALUES (1,'BNA','CUN',7,'failed',0,'x')")
+    archive_db.execute(
+        "INSERT INTO fetch_log (origin_iata, dest_iata, trip_nights, window_start, "
+        "window_end, observed_date, source, fetched_at, results) "
+        "VALUES ('BNA','LIS',7,'2026-07-01','2026-07-31',?,'fli','x',0)", (AS_OF.isoformat(),))
+    tasks = [("BNA", "CUN", 7), ("BNA", "LIS", 7)]
+    states = sched.route_states(archive_db, tasks, AS_OF)
+    assert states[("BNA", "CUN", 7)].last_scanned == (AS_OF - timedelta(days=2)).isoformat()
+    assert states[("BNA", "LIS", 7)].last_scanned == AS_OF.isoformat()
+    assert sched.priority(states[("BNA", "CUN", 7)], AS_OF)[0] != 0
+
+
+def test_simulation_favours_volatile_routes(archive_db):
+    smart = sched.simulate(archive_db, budget=1)
+    rotate = sched.simulate(archive_db, budget=1, strategy="oldest")
+    assert smart["requests"] == rotate["requests"] == 9
+    assert smart["full_scan_requests"] == 18
+    assert smart["fresh_pct"] > rotate["fresh_pct"]
+    assert sched.simulate(archive_db, budget=2)["fresh_pct"] == 100.0
@@ -0,0 +1,80 @@
+"""Tests for the incremental static-regen manifest."""
+import sqlite3
+
+import pytest
+
+from server.migrations import init_schema
+from server.static_manifest import Manifest
+
+
+@pytest.fixture
+def conn(temp_db_path):
+    init_schema(temp_db_path)
+    c = sqlite3.connect(temp_db_path)
+    yield c
+    c.close()
+
+
+def _render(calls):
+    def render(fresh):
+        calls.append(fresh)
+        return f"<p>{fresh}</p>"
+    return render
+
+
+def test_unchanged_inputs_skip_render_and_write(conn, tmp_path):
+    calls = []
+    m = Manifest(conn, tmp_path, today="2026-05-01")
+    assert m.page("a/index.html", {"x": 1}, _render(calls)) == "2026-05-01"
+    assert (tmp_path / "a/index.html").read_text() == "<p>2026-05-01</p>"
+
+    m2 = Manifest(conn, tmp_path, today="2026-05-02")
+    assert m2.page("a/index.html", {"x": 1}, _render(calls)) == "2026-05-01"
+    assert calls == ["2026-05-01"]
+    assert m2.stats() == {"rendered": 0, "skipped": 1, "written": 0, "unchanged": 0}
+
+
+def test_changed_inputs_rerender_with_new_date(conn, tmp_path):
+    calls = []
+    Manifest(conn, tmp_path, today="2026-05-01").page("a/index.html", {"x": 1}, _render(calls))
+    m = Manifest(conn, tmp_path, today="2026-05-03")
+    assert m.page("a/index.html", {"x": 2}, _render(calls)) == "2026-05-03"
+    assert (tmp_path / "a/index.html").read_text() == "<p>2026-05-03</p>"
+
+
+def test_missing_file_is_restored_with_its_old_date(conn, tmp_path):
+    calls = []
+    Manifest(conn, tmp_path, today="2026-05-01").page("a/index.html", {"x": 1}, _render(calls))
+    (tmp_path / "a/index.html").unlink()
+    m = Manifest(conn, tmp_path, today="2026-05-04")
+    assert m.page("a/index.html", {"x": 1}, _render(calls)) == "2026-05-01"
+    assert (tmp_path / "a/index.html").read_text() == "<p>2026-05-01</p>"
+
+
+def test_force_rerenders_but_writes_only_changed_bytes(conn, tmp_path):
+    calls = []
+    Manifest(conn, tmp_path, today="2026-05-01").page("a/index.html", {"x": 1}, _render(calls))
+    m = Manifest(conn, tmp_path, today="2026-05-02", force=True)
+    m.page("a/index.html", {"x": 1}, _render(calls))
+    assert m.stats()["rendered"] == 1
+    assert m.stats()["written"] == 0
+
+
+def test_file_writes_only_on_change(conn, tmp_path):
+    m = Manifest(conn, tmp_path, today="2026-05-01")
+    assert m.file("sitemap.xml", "a") is True
+    assert m.file("sitemap.xml", "a") is False
+    m2 = Manifest(conn, tmp_path, today="2026-05-02")
+    assert m2.file("sitemap.xml", "a") is False
+    assert m2.changed_on["sitemap.xml"] == "2026-05-01"
+    assert m2.file("sitemap.xml", "b") is True
+    assert m2.latest_change() == "2026-05-02"
+
+
+def test_renderer_fingerprint_change_rerenders(conn, tmp_path):
+    calls = []
+    Manifest(conn, tmp_path, today="2026-05-01", fingerprint="v1").page(
+        "a/index.html", {"x": 1}, _render(calls))
+    m = Manifest(conn, tmp_path, today="2026-05-02", fingerprint="v2")
+    m.page("a/index.html", {"x": 1}, _render(calls))
+    assert m.stats()["rendered"] == 1
@@ -185,3 +185,56 @@ def test_fully_past_window_expires_watch(conn):
     assert summary["expired"] == 1 and summary["errors"] == 0
     assert conn.execute("SELECT status FROM watches WHERE id=?",
                         (w["id"],)).fetchone()[0] == "expired"
+
+
+def test_watch_served_from_todays_refresh_fetch(conn):
+    _watch(conn)
+    # The 07:00 refresh fetched BNA->PLS 7n over a window covering the watch.
+    conn.execute("INSERT INTO fetch_log VALUES ('BNA','PLS',7,'2026-06-10','2027-03-01',"
+                 "'2026-06-10','fli','x',2)")
+    for dep, ret, price in (("2026-12-09", "2026-12-16", 330), ("2026-08-01", "2026-08-08", 200)):
+        conn.execute("INSERT INTO fare_observations (origin_iata,dest_iata,departure_date,"
+                     "return_date,trip_nights,total_price_usd,source,observed_date,fetched_at) "
+                     "VALUES ('BNA','PLS',?,?,7,?,'fli','2026-06-10','x')", (dep, ret, price))
+    conn.commit()
+    fli = FakeFli([FakeResult("2026-12-09", "2026-12-16", 999)])
+    with patch.object(watch_runner.email_client, "send_digest_email"):
+        summary = watch_runner.run(conn, fli=fli, sleep_s=0,
+                                   today=date(2026, 6, 10), base_url="http://x")
+    assert fli.calls == []
+    assert summary["cache_hits"] == 1 and summary["cache_hit_rate"] == 1.0
+    assert summary["scanned"] == 0
+    # only the in-window fare is copied in as the watch's observation
+    assert [tuple(r) for r in conn.execute(
+        "SELECT departure_date, total_price_usd FROM fare_observations WHERE source='watch'")] \
+        == [("2026-12-09", 330)]
+
+
+def test_refresh_fetch_from_another_day_is_not_reused(conn):
+    _watch(conn)
+    conn.execute("INSERT INTO fetch_log VALUES ('BNA','PLS',7,'2026-06-09','2027-03-01',"
+                 "'2026-06-09','fli','x',2)")
+    conn.commit()
+    fli = FakeFli([FakeResult("2026-12-09", "2026-12-16", 325)])
+    with patch.object(watch_runner.email_client, "send_digest_email"):
+        summary = watch_runner.run(conn, fli=fli, sleep_s=0,
+                                   today=date(2026, 6, 10), base_url="http://x")
+    assert len(fli.calls) == 1
+    assert summary["cache_misses"] == 1 and summary["cache_hits"] == 0
+    assert conn.execute("SELECT source FROM fetch_log WHERE observed_date='2026-06-10'"
+                        ).fetchone()[0] == "watch"
+
+
+def test_429_with_shared_budget_pauses_other_jobs(conn, tmp_path):
+    from server.request_budget import SharedTokenBucket
+    _watch(conn)
+    limiter = SharedTokenBucket(str(tmp_path / "budget.sqlite"), rate=1.0)
+    try:
+        fli = FakeFli(raises=RuntimeError("HTTP 429 rate-limited"))
+        with patch.object(watch_runner.email_client, "send_digest_email"):
+            summary = watch_runner.run(conn, fli=fli, today=date(2026, 6, 10),
+                                       base_url="http://x", limiter=limiter)
+        assert summary["aborted_429"] is True          # still aborts the night
+        assert limiter.state()["slowdowns_total"] == 1  # and cools down everyone
+    finally:
+        limiter.close()